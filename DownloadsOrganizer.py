@@ -1,48 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
 import os
-import shutil
-import time
-import re
 from datetime import datetime
 from pathlib import Path
+import queue
 import subprocess
 import sys
 import threading
+import time
 
-CONFIG_FILENAME = "organizer_config.json"
-LOG_FILENAME_APP_PREFIX = "Рекомендации_по_очистке_app"
-
-QUARANTINE_DIR_NAME = "_НА ПРОВЕРКУ (потенциальный мусор)"
-
-DEFAULT_SETTINGS = {
-    "downloads_dir_name": "Downloads",
-    "archive_dir_name": "Downloads_Archive",
-    "days_older_to_archive": 7,
-    "folders_to_ignore": ["Важные_Проекты_Не_Трогать"],
-}
-
-ARCHIVE_GENERAL_OLD_SUBDIR = "01_Общий_архив_старше_недели"
-ARCHIVE_SPECIFIC_ARCHIVES_OLD_SUBDIR = "02_Архивы_программ_старше_недели"
-ARCHIVED_OLD_FOLDERS_SUBDIR = "04_Архив_Старых_Папок"
-
-JUNK_KEYWORDS = ["старая_версия", "old_version", "backup", "резервная_копия", "temp", "tmpfile"]
-JUNK_EXTENSIONS = [".tmp", ".log", ".bak", "._gstmp", ".crdownload"]
-
-FILE_TYPE_CATEGORIES = {
-    "01_Изображения": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp", ".heic", ".avif", ".tiff", ".tif"],
-    "02_Видео": [".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".wmv", ".mpeg", ".mpg"],
-    "03_Аудио": [".mp3", ".wav", ".aac", ".flac", ".ogg", ".wma", ".m4a"],
-    "04_Документы": [".pdf", ".doc", ".docx", ".txt", ".odt", ".rtf", ".csv", ".xls", ".xlsx", ".ppt", ".pptx", ".epub", ".djvu", ".md"],
-    "05_Архивы_и_образы": [".zip", ".rar", ".tar", ".gz", ".7z", ".bz2", ".iso", ".img", ".dmg"],
-    "06_Программы_и_установщики": [".exe", ".msi", ".bat", ".sh", ".jar", ".apk", ".app"],
-    "07_Шрифты": [".ttf", ".otf", ".woff", ".woff2"],
-    "08_Торренты": [".torrent"],
-    "09_Проекты_и_код": [".py", ".js", ".html", ".css", ".cpp", ".java", ".psd", ".ai", ".fig", ".sketch", ".xd", ".ipynb", ".json", ".xml", ".yml", ".yaml"],
-    "10_Другое": []
-}
-PROGRAM_ARCHIVE_EXTENSIONS = FILE_TYPE_CATEGORIES["05_Архивы_и_образы"]
+from organizer_logic import (
+    CONFIG_FILENAME, LOG_FILENAME_APP_PREFIX, QUARANTINE_DIR_NAME, DEFAULT_SETTINGS,
+    load_settings_logic, save_settings_logic, get_downloads_path_logic, get_junk_reason_logic,
+    list_quarantine_logic, delete_quarantine_items_logic, restore_quarantine_items_logic,
+    ensure_dir_exists_logic, run_organization_logic, perform_rollback_logic, new_run_budget_logic,
+    build_reclaim_report_logic, purge_reclaim_entries_logic, RECLAIM_PURGEABLE_KINDS,
+)
+from organizer_budget import STOP_REASON_NAMES
+from organizer_metrics import RunMetrics, get_metrics_path_logic
+
+LOG_PUMP_INTERVAL_MS = 100
+LOG_VIEW_MAX_LINES = 5000
+LOG_PUMP_MAX_ITEMS = 20000
+QUARANTINE_PAGE_SIZE = 500
+PROGRESS_UPDATE_INTERVAL_S = 0.1
+BULK_ERROR_REPORT_LIMIT = 20
+RECLAIM_DEFAULT_TOP = 10
+RECLAIM_KIND_NAMES = {"quarantine": "Карантин", "archive": "Архив", "category": "Категория"}
+RECLAIM_SORT_NAMES = {"bytes": "по размеру", "age": "по возрасту"}
 
 
 class DownloadsOrganizerApp:
@@ -52,8 +37,22 @@ class DownloadsOrganizerApp:
         self.root.geometry("800x700")
 
         self.settings = DEFAULT_SETTINGS.copy()
-        self.recommendations_log_entries = []
+        self.watch_stop_event = None
+        self.run_cancel_event = None
+        self.operation_thread = None
+        self.closing = False
+        self.log_queue = queue.Queue()
         self.file_log_path = None
+        self.file_log = None
+        self.metrics_path = None
+        self.file_log_lock = threading.Lock()
+        self.quarantine_rows = {}
+        self.quarantine_all_rows = []
+        self.quarantine_visible_limit = QUARANTINE_PAGE_SIZE
+        self.quarantine_loading = False
+        self.quarantine_reload_requested = False
+        self.reclaim_entries = []
+        self.reclaim_loading = False
 
         style = ttk.Style()
         style.configure("TButton", padding=5, font=('Arial', 10))
@@ -66,22 +65,28 @@ class DownloadsOrganizerApp:
 
         self.main_tab = ttk.Frame(self.notebook)
         self.quarantine_tab = ttk.Frame(self.notebook)
+        self.reclaim_tab = ttk.Frame(self.notebook)
 
         self.notebook.add(self.main_tab, text="Главная")
         self.notebook.add(self.quarantine_tab, text="Карантин")
+        self.notebook.add(self.reclaim_tab, text="Освобождение места")
 
         self.setup_main_tab()
         self.setup_quarantine_tab()
+        self.setup_reclaim_tab()
 
         self.load_config()
         self.refresh_quarantine_list()
+        self.refresh_reclaim_report()
+        self.root.after(LOG_PUMP_INTERVAL_MS, self._drain_log_queue)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.gui_log("Приложение Органайзер Загрузок запущено.")
         self.gui_log(f"Текущая папка загрузок: {self.get_downloads_path()}")
         self.gui_log(f"Папка карантина: {self.get_downloads_path() / QUARANTINE_DIR_NAME}")
 
     def get_downloads_path(self):
-        return Path.home() / self.settings.get("downloads_dir_name", "Downloads")
+        return get_downloads_path_logic(self.settings)
 
     def setup_main_tab(self):
         main_frame = ttk.Frame(self.main_tab)
@@ -128,6 +133,20 @@ class DownloadsOrganizerApp:
         self.run_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
         self.rollback_button = ttk.Button(actions_frame, text="Сбросить организацию", command=self.perform_rollback_thread)
         self.rollback_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
+        self.dry_run_button = ttk.Button(actions_frame, text="Пробный запуск", command=self.run_dry_run_thread)
+        self.dry_run_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
+        self.cancel_button = ttk.Button(actions_frame, text="Отменить", command=self.cancel_operation, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
+        self.watch_button = ttk.Button(actions_frame, text="Следить за Загрузками", command=self.toggle_watch)
+        self.watch_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
+
+        progress_frame = ttk.Frame(main_frame, padding=0)
+        progress_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(progress_frame, variable=self.progress_var, maximum=1, mode="determinate")
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_frame, text="", width=40)
+        self.progress_label.pack(side=tk.LEFT)
 
         log_frame = ttk.LabelFrame(main_frame, text="Лог операций", padding=10)
         log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -147,16 +166,18 @@ class DownloadsOrganizerApp:
         tree_frame = ttk.Frame(q_frame)
         tree_frame.pack(fill=tk.BOTH, expand=True)
 
-        columns = ("filename", "reason", "date")
+        columns = ("filename", "reason", "origin", "date")
         self.quarantine_tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
         self.quarantine_tree.heading("filename", text="Имя файла")
         self.quarantine_tree.heading("reason", text="Причина")
+        self.quarantine_tree.heading("origin", text="Откуда")
         self.quarantine_tree.heading("date", text="Дата изменения")
         self.quarantine_tree.column("filename", width=300)
         self.quarantine_tree.column("reason", width=200)
+        self.quarantine_tree.column("origin", width=150)
         self.quarantine_tree.column("date", width=150)
         
-        self.quarantine_tree["displaycolumns"] = ("filename", "reason", "date")
+        self.quarantine_tree["displaycolumns"] = ("filename", "reason", "origin", "date")
 
         self.quarantine_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
@@ -164,6 +185,14 @@ class DownloadsOrganizerApp:
         scrollbar_q.pack(side=tk.RIGHT, fill=tk.Y)
         self.quarantine_tree.config(yscrollcommand=scrollbar_q.set)
 
+        progress_frame = ttk.Frame(q_frame, padding=0)
+        progress_frame.pack(fill=tk.X, pady=(10, 0))
+        self.q_progress_var = tk.DoubleVar(value=0)
+        self.q_progress_bar = ttk.Progressbar(progress_frame, variable=self.q_progress_var, maximum=1, mode="determinate")
+        self.q_progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.q_progress_label = ttk.Label(progress_frame, text="", width=24)
+        self.q_progress_label.pack(side=tk.LEFT)
+
         button_frame = ttk.Frame(q_frame)
         button_frame.pack(fill=tk.X, pady=10)
 
@@ -179,50 +208,74 @@ class DownloadsOrganizerApp:
         self.q_refresh_button = ttk.Button(button_frame, text="🔄 Обновить список", command=self.refresh_quarantine_list)
         self.q_refresh_button.pack(side=tk.LEFT, padx=5, expand=True)
 
-    def get_junk_reason(self, file_path):
-        filename = file_path.name
-        file_ext_lower = file_path.suffix.lower()
+        self.q_more_button = ttk.Button(button_frame, text="Показать ещё", command=self.show_more_quarantine, state=tk.DISABLED)
+        self.q_more_button.pack(side=tk.LEFT, padx=5, expand=True)
 
-        if file_ext_lower in JUNK_EXTENSIONS:
-            return f"Расширение ({file_ext_lower})"
-        
-        keyword_found = next((k for k in JUNK_KEYWORDS if k.lower() in filename.lower()), None)
-        if keyword_found:
-            return f"Ключевое слово ('{keyword_found}')"
-        
-        if is_windows_duplicate_name_logic(filename):
-            try:
-                base_name_match = re.match(r"(.+)\s\(\d+\)", file_path.stem)
-                if base_name_match:
-                    base_name = base_name_match.group(1) + file_path.suffix
-                    if (file_path.parent / base_name).exists():
-                        return "Дубликат Windows"
-                    else:
-                        return "Возможный дубликат (оригинал не найден)"
-            except (AttributeError, IndexError):
-                 return "Дубликат Windows (ошибка разбора имени)"
-
-        return "Неизвестно"
+    def get_junk_reason(self, file_path):
+        return get_junk_reason_logic(file_path)
         
     def refresh_quarantine_list(self):
-        for item in self.quarantine_tree.get_children():
-            self.quarantine_tree.delete(item)
-
-        quarantine_path = self.get_downloads_path() / QUARANTINE_DIR_NAME
-        if not quarantine_path.exists():
-            self.notebook.tab(self.quarantine_tab, text="Карантин (0)")
+        # The folder is listed in a background thread; rows are diffed in on the Tk thread when it is done.
+        if self.quarantine_loading:
+            self.quarantine_reload_requested = True
             return
+        self.quarantine_loading = True
+        self.q_refresh_button.config(state=tk.DISABLED)
+        thread = threading.Thread(target=self._load_quarantine_worker, args=(dict(self.settings),), daemon=True)
+        thread.start()
 
-        files_in_quarantine = list(quarantine_path.iterdir())
-        self.notebook.tab(self.quarantine_tab, text=f"Карантин ({len(files_in_quarantine)})")
+    def _load_quarantine_worker(self, settings):
+        rows = None
+        try:
+            downloads_path = get_downloads_path_logic(settings)
+            quarantine_entries = sorted(list_quarantine_logic(settings), key=lambda entry: entry.path.name.lower())
+            rows = [(str(entry.path), (entry.path.name, entry.reason, self._format_origin(entry.original_path, downloads_path),
+                                       datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M:%S')))
+                    for entry in quarantine_entries]
+        except Exception as e:
+            self.gui_log(f"Ошибка чтения карантина: {e}", to_file_too=False)
+        self.run_on_ui_thread(lambda: self._apply_quarantine_rows(rows))
 
-        for item_path in files_in_quarantine:
-            try:
-                mod_time = datetime.fromtimestamp(item_path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-                reason = self.get_junk_reason(item_path)
-                self.quarantine_tree.insert("", tk.END, iid=str(item_path), values=(item_path.name, reason, mod_time))
-            except FileNotFoundError:
-                continue
+    @staticmethod
+    def _format_origin(original_path, downloads_path):
+        if original_path is None:
+            return ""
+        try:
+            return str(original_path.parent.relative_to(downloads_path.parent))
+        except ValueError:
+            return str(original_path.parent)
+
+    def _apply_quarantine_rows(self, rows):
+        self.quarantine_loading = False
+        self.q_refresh_button.config(state=tk.NORMAL)
+        if rows is not None:
+            self.quarantine_all_rows = rows
+            self.notebook.tab(self.quarantine_tab, text=f"Карантин ({len(rows)})")
+            self._sync_quarantine_tree()
+        if self.quarantine_reload_requested:
+            self.quarantine_reload_requested = False
+            self.refresh_quarantine_list()
+
+    def _sync_quarantine_tree(self):
+        visible_rows = dict(self.quarantine_all_rows[:self.quarantine_visible_limit])
+        stale_ids = [item_id for item_id in self.quarantine_rows if item_id not in visible_rows]
+        if stale_ids:
+            self.quarantine_tree.delete(*stale_ids)
+        for index, (item_id, values) in enumerate(visible_rows.items()):
+            current_values = self.quarantine_rows.get(item_id)
+            if current_values is None:
+                self.quarantine_tree.insert("", index, iid=item_id, values=values)
+            elif current_values != values:
+                self.quarantine_tree.item(item_id, values=values)
+        self.quarantine_rows = visible_rows
+
+        hidden_count = len(self.quarantine_all_rows) - len(visible_rows)
+        self.q_more_button.config(text=f"Показать ещё ({hidden_count})" if hidden_count else "Показать ещё",
+                                  state=tk.NORMAL if hidden_count else tk.DISABLED)
+
+    def show_more_quarantine(self):
+        self.quarantine_visible_limit += QUARANTINE_PAGE_SIZE
+        self._sync_quarantine_tree()
 
     def restore_selected_quarantine(self):
         selected_items = self.quarantine_tree.selection()
@@ -230,14 +283,7 @@ class DownloadsOrganizerApp:
             messagebox.showinfo("Нет выбора", "Выберите файлы для восстановления.")
             return
 
-        downloads_path = self.get_downloads_path()
-        for item_id in selected_items:
-            source_path = Path(item_id)
-            if source_path.exists():
-                move_item_safely_logic(source_path, downloads_path, self.gui_log_action, "ВОССТАНОВЛЕНИЕ ИЗ КАРАНТИНА")
-        
-        self.refresh_quarantine_list()
-        self.gui_log("Восстановление из карантина завершено.", to_file_too=False)
+        self._start_bulk_quarantine_operation("Восстановление", restore_quarantine_items_logic, selected_items)
 
     def delete_selected_quarantine(self):
         selected_items = self.quarantine_tree.selection()
@@ -250,19 +296,53 @@ class DownloadsOrganizerApp:
                                    "Это действие необратимо."):
             return
 
-        for item_id in selected_items:
-            file_path = Path(item_id)
-            try:
-                if file_path.is_dir():
-                    shutil.rmtree(file_path)
-                else:
-                    file_path.unlink()
-                self.gui_log_action("УДАЛЕНИЕ ИЗ КАРАНТИНА", file_path.name)
-            except Exception as e:
-                self.gui_log_action("ОШИБКА УДАЛЕНИЯ", file_path.name, reason=str(e))
-                messagebox.showerror("Ошибка удаления", f"Не удалось удалить {file_path.name}:\n{e}")
+        self._start_bulk_quarantine_operation("Удаление", delete_quarantine_items_logic, selected_items)
+
+    def _set_quarantine_buttons_state(self, state):
+        for button in (self.q_restore_button, self.q_delete_button):
+            button.config(state=state)
+
+    def _start_bulk_quarantine_operation(self, operation_name, bulk_logic, selected_items):
+        self._set_quarantine_buttons_state(tk.DISABLED)
+        self._update_quarantine_progress(operation_name, 0, len(selected_items))
+        thread = threading.Thread(target=self._bulk_quarantine_worker, daemon=True,
+                                  args=(operation_name, bulk_logic, [Path(item_id) for item_id in selected_items], dict(self.settings)))
+        thread.start()
+
+    def _bulk_quarantine_worker(self, operation_name, bulk_logic, item_paths, settings):
+        last_update = [0.0]
+
+        def progress_callback(done_count, total):
+            now = time.monotonic()
+            if done_count == total or now - last_update[0] >= PROGRESS_UPDATE_INTERVAL_S:
+                last_update[0] = now
+                self.run_on_ui_thread(lambda: self._update_quarantine_progress(operation_name, done_count, total))
+
+        try:
+            result = bulk_logic(settings, item_paths, self.gui_log_action, progress_callback)
+        except Exception as e:
+            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+            result = None
+        self.run_on_ui_thread(lambda: self._finish_bulk_quarantine_operation(operation_name, result, len(item_paths)))
+
+    def _update_quarantine_progress(self, operation_name, done_count, total):
+        self.q_progress_var.set(done_count / total if total else 1)
+        self.q_progress_label.config(text=f"{operation_name}: {done_count} из {total}")
 
+    def _finish_bulk_quarantine_operation(self, operation_name, result, total):
+        self._set_quarantine_buttons_state(tk.NORMAL)
         self.refresh_quarantine_list()
+        self.refresh_reclaim_report()
+        if result is None:
+            return
+        self.gui_log(f"{operation_name} (карантин) завершено: {result.done} из {total}.", to_file_too=False)
+        self._update_quarantine_progress(operation_name, result.done, total)
+        if result.errors:
+            lines = [f"{name}: {error}" for name, error in result.errors[:BULK_ERROR_REPORT_LIMIT]]
+            if len(result.errors) > BULK_ERROR_REPORT_LIMIT:
+                lines.append(f"... и ещё {len(result.errors) - BULK_ERROR_REPORT_LIMIT}")
+            messagebox.showerror(f"{operation_name}: ошибки",
+                                 f"Не удалось обработать {len(result.errors)} из {total}:\n" + "\n".join(lines))
 
     def open_quarantine_folder(self):
         q_path = self.get_downloads_path() / QUARANTINE_DIR_NAME
@@ -280,18 +360,209 @@ class DownloadsOrganizerApp:
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось открыть папку:\n{e}")
 
+    def setup_reclaim_tab(self):
+        r_frame = ttk.Frame(self.reclaim_tab, padding=10)
+        r_frame.pack(fill=tk.BOTH, expand=True)
+
+        r_label = ttk.Label(r_frame, text="Что занимает место в карантине, архиве и категориях. Удалить можно только строки карантина и архива.",
+                            wraplength=700)
+        r_label.pack(fill=tk.X, pady=(0, 10))
+
+        tree_frame = ttk.Frame(r_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+
+        columns = ("kind", "path", "size", "files", "date")
+        self.reclaim_tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        self.reclaim_tree.heading("kind", text="Где")
+        self.reclaim_tree.heading("path", text="Папка или файл")
+        self.reclaim_tree.heading("size", text="Размер")
+        self.reclaim_tree.heading("files", text="Файлов")
+        self.reclaim_tree.heading("date", text="Самый новый файл")
+        self.reclaim_tree.column("kind", width=90)
+        self.reclaim_tree.column("path", width=330)
+        self.reclaim_tree.column("size", width=90, anchor=tk.E)
+        self.reclaim_tree.column("files", width=70, anchor=tk.E)
+        self.reclaim_tree.column("date", width=130)
+        self.reclaim_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar_r = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.reclaim_tree.yview)
+        scrollbar_r.pack(side=tk.RIGHT, fill=tk.Y)
+        self.reclaim_tree.config(yscrollcommand=scrollbar_r.set)
+
+        progress_frame = ttk.Frame(r_frame, padding=0)
+        progress_frame.pack(fill=tk.X, pady=(10, 0))
+        self.r_progress_var = tk.DoubleVar(value=0)
+        self.r_progress_bar = ttk.Progressbar(progress_frame, variable=self.r_progress_var, maximum=1, mode="determinate")
+        self.r_progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.r_progress_label = ttk.Label(progress_frame, text="", width=32)
+        self.r_progress_label.pack(side=tk.LEFT)
+
+        button_frame = ttk.Frame(r_frame)
+        button_frame.pack(fill=tk.X, pady=10)
+
+        ttk.Label(button_frame, text="Порядок:").pack(side=tk.LEFT)
+        self.r_sort_var = tk.StringVar(value=RECLAIM_SORT_NAMES["bytes"])
+        r_sort_combo = ttk.Combobox(button_frame, textvariable=self.r_sort_var, values=list(RECLAIM_SORT_NAMES.values()),
+                                    state="readonly", width=12)
+        r_sort_combo.pack(side=tk.LEFT, padx=5)
+        r_sort_combo.bind("<<ComboboxSelected>>", lambda event: self.refresh_reclaim_report())
+
+        self.r_refresh_button = ttk.Button(button_frame, text="🔄 Обновить отчёт", command=self.refresh_reclaim_report)
+        self.r_refresh_button.pack(side=tk.LEFT, padx=5, expand=True)
+
+        ttk.Label(button_frame, text="N:").pack(side=tk.LEFT)
+        self.r_top_var = tk.IntVar(value=RECLAIM_DEFAULT_TOP)
+        ttk.Spinbox(button_frame, from_=1, to=1000, textvariable=self.r_top_var, width=5).pack(side=tk.LEFT, padx=5)
+
+        self.r_purge_button = ttk.Button(button_frame, text="🧹 Удалить топ N", command=self.purge_top_reclaim)
+        self.r_purge_button.pack(side=tk.LEFT, padx=5, expand=True)
+
+    @staticmethod
+    def _format_size(size_bytes):
+        for unit in ("Б", "КБ", "МБ", "ГБ", "ТБ"):
+            if size_bytes < 1024 or unit == "ТБ":
+                return f"{size_bytes:.0f} {unit}" if unit == "Б" else f"{size_bytes:.1f} {unit}"
+            size_bytes /= 1024
+
+    def _reclaim_sort_key(self):
+        return next((key for key, name in RECLAIM_SORT_NAMES.items() if name == self.r_sort_var.get()), "bytes")
+
+    def refresh_reclaim_report(self):
+        # Sizes come from the size index, so a refresh only lists the folders that changed since the last one.
+        if self.reclaim_loading:
+            return
+        self.reclaim_loading = True
+        self.r_refresh_button.config(state=tk.DISABLED)
+        thread = threading.Thread(target=self._load_reclaim_worker, args=(dict(self.settings), self._reclaim_sort_key()), daemon=True)
+        thread.start()
+
+    def _load_reclaim_worker(self, settings, sort_by):
+        entries = None
+        try:
+            entries = build_reclaim_report_logic(settings, sort_by=sort_by)
+        except Exception as e:
+            self.gui_log(f"Ошибка построения отчёта о месте: {e}", to_file_too=False)
+        self.run_on_ui_thread(lambda: self._apply_reclaim_entries(entries))
+
+    def _apply_reclaim_entries(self, entries):
+        self.reclaim_loading = False
+        self.r_refresh_button.config(state=tk.NORMAL)
+        if entries is None:
+            return
+        self.reclaim_entries = entries
+        downloads_path = self.get_downloads_path()
+        self.reclaim_tree.delete(*self.reclaim_tree.get_children())
+        for entry in entries:
+            try:
+                shown_path = str(entry.path.relative_to(downloads_path))
+            except ValueError:
+                shown_path = str(entry.path)
+            self.reclaim_tree.insert("", tk.END, values=(
+                RECLAIM_KIND_NAMES.get(entry.kind, entry.kind), shown_path, self._format_size(entry.bytes), entry.files,
+                datetime.fromtimestamp(entry.newest_mtime).strftime('%Y-%m-%d %H:%M')))
+        reclaimable_bytes = sum(entry.bytes for entry in entries if entry.kind in RECLAIM_PURGEABLE_KINDS)
+        self.r_progress_label.config(text=f"Можно освободить: {self._format_size(reclaimable_bytes)}")
+        self.notebook.tab(self.reclaim_tab, text=f"Освобождение места ({self._format_size(reclaimable_bytes)})")
+
+    def purge_top_reclaim(self):
+        try:
+            top_count = int(self.r_top_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Ошибка", "N должно быть целым числом.")
+            return
+        entries = [entry for entry in self.reclaim_entries if entry.kind in RECLAIM_PURGEABLE_KINDS][:max(0, top_count)]
+        if not entries:
+            messagebox.showinfo("Нечего удалять", "Обновите отчёт: в нём нет строк карантина или архива.")
+            return
+        if not messagebox.askyesno("Подтверждение удаления",
+                                   f"НАВСЕГДА удалить {len(entries)} первых строк отчёта "
+                                   f"({self._format_size(sum(entry.bytes for entry in entries))})?\nЭто действие необратимо."):
+            return
+
+        self.r_purge_button.config(state=tk.DISABLED)
+        self._update_reclaim_progress(0, len(entries))
+        thread = threading.Thread(target=self._purge_reclaim_worker, args=(entries, dict(self.settings)), daemon=True)
+        thread.start()
+
+    def _purge_reclaim_worker(self, entries, settings):
+        last_update = [0.0]
+
+        def progress_callback(done_count, total):
+            now = time.monotonic()
+            if done_count == total or now - last_update[0] >= PROGRESS_UPDATE_INTERVAL_S:
+                last_update[0] = now
+                self.run_on_ui_thread(lambda: self._update_reclaim_progress(done_count, total))
+
+        try:
+            result = purge_reclaim_entries_logic(settings, entries, self.gui_log_action, progress_callback)
+        except Exception as e:
+            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+            result = None
+        self.run_on_ui_thread(lambda: self._finish_reclaim_purge(result))
+
+    def _update_reclaim_progress(self, done_count, total):
+        self.r_progress_var.set(done_count / total if total else 1)
+        self.r_progress_label.config(text=f"Удаление: {done_count} из {total}")
+
+    def _finish_reclaim_purge(self, result):
+        self.r_purge_button.config(state=tk.NORMAL)
+        self.refresh_reclaim_report()
+        self.refresh_quarantine_list()
+        if result is None:
+            return
+        self.gui_log(f"Освобождение места завершено: удалено {result.done}.", to_file_too=False)
+        if result.errors:
+            lines = [f"{name}: {error}" for name, error in result.errors[:BULK_ERROR_REPORT_LIMIT]]
+            if len(result.errors) > BULK_ERROR_REPORT_LIMIT:
+                lines.append(f"... и ещё {len(result.errors) - BULK_ERROR_REPORT_LIMIT}")
+            messagebox.showerror("Освобождение места: ошибки", f"Не удалось удалить {len(result.errors)}:\n" + "\n".join(lines))
+
     def gui_log(self, message, to_file_too=True):
+        # Safe to call from any thread: the widget is only touched by _drain_log_queue on the Tk thread.
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         full_message = f"[{timestamp}] {message}"
-        
+        self.log_queue.put(full_message)
+
+        if to_file_too:
+            with self.file_log_lock:
+                if self.file_log is not None:
+                    self.file_log.write(full_message + "\n")
+
+    def run_on_ui_thread(self, callback):
+        self.log_queue.put(callback)
+
+    def _drain_log_queue(self):
+        # Everything queued is handled in one tick, so the queue cannot outgrow the producers; callbacks run inline
+        # after the lines queued before them. A tick handles at most LOG_PUMP_MAX_ITEMS and then yields to Tk.
+        lines = []
+        handled_count = 0
+        try:
+            while handled_count < LOG_PUMP_MAX_ITEMS:
+                try:
+                    item = self.log_queue.get_nowait()
+                except queue.Empty:
+                    break
+                handled_count += 1
+                if callable(item):
+                    if lines:
+                        self._append_log_lines(lines[-LOG_VIEW_MAX_LINES:])
+                        lines = []
+                    item()
+                else:
+                    lines.append(item)
+            if lines:
+                self._append_log_lines(lines[-LOG_VIEW_MAX_LINES:])
+        finally:
+            self.root.after(1 if handled_count >= LOG_PUMP_MAX_ITEMS else LOG_PUMP_INTERVAL_MS, self._drain_log_queue)
+
+    def _append_log_lines(self, lines):
         self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, full_message + "\n")
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+        if line_count > LOG_VIEW_MAX_LINES:
+            self.log_text.delete("1.0", f"{line_count - LOG_VIEW_MAX_LINES + 1}.0")
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks()
-
-        if to_file_too:
-            self.recommendations_log_entries.append(full_message)
 
     def add_to_ignore_list(self):
         folder_name = self.ignore_entry_var.get().strip()
@@ -307,8 +578,7 @@ class DownloadsOrganizerApp:
     def load_config(self):
         try:
             if Path(CONFIG_FILENAME).exists():
-                with open(CONFIG_FILENAME, 'r', encoding='utf-8') as f:
-                    self.settings.update(json.load(f))
+                self.settings = load_settings_logic(CONFIG_FILENAME)
                 self.gui_log(f"Настройки загружены из {CONFIG_FILENAME}", to_file_too=False)
             else:
                  self.gui_log(f"Файл {CONFIG_FILENAME} не найден, используются значения по умолчанию.", to_file_too=False)
@@ -327,66 +597,208 @@ class DownloadsOrganizerApp:
             self.settings["days_older_to_archive"] = int(self.days_var.get())
             self.settings["folders_to_ignore"] = list(self.ignore_listbox.get(0, tk.END))
             
-            with open(CONFIG_FILENAME, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, indent=4, ensure_ascii=False)
+            save_settings_logic(self.settings, CONFIG_FILENAME)
             self.gui_log(f"Настройки сохранены в {CONFIG_FILENAME}", to_file_too=False)
             messagebox.showinfo("Успех", "Настройки сохранены.")
         except Exception as e:
             messagebox.showerror("Ошибка сохранения", f"Не удалось сохранить настройки:\n{e}")
 
     def _prepare_for_operation(self, operation_name):
-        self.recommendations_log_entries = []
         archive_path = self.get_downloads_path() / self.settings["archive_dir_name"]
         ensure_dir_exists_logic(archive_path, self.gui_log_action)
         self.file_log_path = archive_path / f"{LOG_FILENAME_APP_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        self.metrics_path = get_metrics_path_logic(self.file_log_path)
+        self._update_run_progress(operation_name, 0, 0, None)
+        try:
+            with self.file_log_lock:
+                self.file_log = open(self.file_log_path, "w", encoding="utf-8")
+        except Exception as e:
+            self.file_log_path = None
+            self.gui_log(f"Ошибка записи лога: {e}", to_file_too=False)
         
         self.run_button.config(state=tk.DISABLED)
         self.rollback_button.config(state=tk.DISABLED)
-
-    def _finalize_operation(self, operation_name):
+        self.dry_run_button.config(state=tk.DISABLED)
+        self.watch_button.config(state=tk.DISABLED)
+
+    def _new_run_metrics(self, operation, operation_name):
+        last_update = [0.0]
+
+        def progress_callback(done_count, total, eta):
+            now = time.monotonic()
+            if now - last_update[0] >= PROGRESS_UPDATE_INTERVAL_S:
+                last_update[0] = now
+                self.run_on_ui_thread(lambda: self._update_run_progress(operation_name, done_count, total, eta))
+        return RunMetrics(operation, progress_callback)
+
+    @staticmethod
+    def _format_duration(seconds):
+        minutes, seconds = divmod(int(seconds + 0.5), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+    def _update_run_progress(self, operation_name, done_count, total, eta):
+        self.progress_var.set(done_count / total if total else 0)
+        text = f"{operation_name}: {done_count} из {total}" if total else ""
+        if eta is not None and done_count < total:
+            text += f", осталось ~{self._format_duration(eta)}"
+        self.progress_label.config(text=text)
+
+    def _save_run_metrics(self, metrics):
+        # Called on the worker thread once the logic has returned.
+        summary = metrics.finish().to_dict()
+        self.gui_log(f"Метрики: перемещений {summary['moves']}, {summary['bytes_moved'] / (1024 * 1024):.1f} МБ, "
+                     f"{summary['moves_per_second']} перемещений/с, ошибок {summary['errors']}, "
+                     f"время {summary['elapsed_s']} с")
+        if self.metrics_path is None:
+            return
+        try:
+            metrics.save(self.metrics_path)
+            self.gui_log(f"Метрики сохранены: \"{self.metrics_path}\"", to_file_too=False)
+        except Exception as e:
+            self.gui_log(f"Ошибка записи метрик: {e}", to_file_too=False)
+
+    def _start_operation_thread(self, worker, cancellable=False):
+        if cancellable:
+            self.run_cancel_event = threading.Event()
+            self.cancel_button.config(state=tk.NORMAL)
+        self.operation_thread = threading.Thread(target=worker)
+        self.operation_thread.start()
+
+    def cancel_operation(self):
+        # Cooperative: the worker finishes the move in progress, saves where it stopped and the next run resumes there.
+        if self.run_cancel_event is None or self.run_cancel_event.is_set():
+            return
+        self.run_cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.gui_log("Отмена: текущее перемещение будет завершено, затем операция остановится.")
+
+    def on_close(self):
+        if self.operation_thread is not None and self.operation_thread.is_alive():
+            # Closing mid-run cancels it; the window goes away once the worker has stopped cleanly.
+            self.closing = True
+            self.cancel_operation()
+            self.gui_log("Окно закроется после остановки текущей операции.", to_file_too=False)
+            return
+        if self.watch_stop_event is not None:
+            self.watch_stop_event.set()
+        self.root.destroy()
+
+    def _finalize_operation(self, operation_name, metrics=None):
+        self.run_cancel_event = None
+        self.operation_thread = None
+        self.cancel_button.config(state=tk.DISABLED)
+        if metrics is not None:
+            self._update_run_progress(operation_name, metrics.progress_done, metrics.progress_total, None)
         try:
-            log_file_path = self.file_log_path
-            if log_file_path and log_file_path.parent.exists():
-                with open(log_file_path, "w", encoding="utf-8") as f:
-                    f.write("\n".join(self.recommendations_log_entries))
-                self.gui_log(f"Файловый лог сохранен: \"{log_file_path}\"", to_file_too=False)
+            with self.file_log_lock:
+                file_log, self.file_log = self.file_log, None
+                if file_log is not None:
+                    file_log.close()
+                    self.gui_log(f"Файловый лог сохранен: \"{self.file_log_path}\"", to_file_too=False)
         except Exception as e:
             self.gui_log(f"Ошибка записи лога: {e}", to_file_too=False)
 
         self.gui_log(f"--- {operation_name} ЗАВЕРШЕН ---", to_file_too=False)
-        messagebox.showinfo(operation_name, f"{operation_name} завершен(а).")
-        self.run_button.config(state=tk.NORMAL)
-        self.rollback_button.config(state=tk.NORMAL)
+        if self.closing:
+            self.on_close()
+            return
+        if metrics is not None and metrics.stop_reason is not None:
+            messagebox.showinfo(operation_name, f"{operation_name} остановлен(а): {STOP_REASON_NAMES.get(metrics.stop_reason, metrics.stop_reason)}.\n"
+                                                "Следующий запуск продолжит с того же места.")
+        else:
+            messagebox.showinfo(operation_name, f"{operation_name} завершен(а).")
+        # A dry run may finish while the watcher is still running; organizing and rollback stay off then.
+        moves_state = tk.DISABLED if self.watch_stop_event is not None else tk.NORMAL
+        self.run_button.config(state=moves_state)
+        self.rollback_button.config(state=moves_state)
+        self.dry_run_button.config(state=tk.NORMAL)
+        self.watch_button.config(state=tk.NORMAL)
         self.refresh_quarantine_list()
+        self.refresh_reclaim_report()
 
     def run_organization_thread(self):
         if not messagebox.askyesno("Подтверждение", "Запустить организацию папки Загрузок?"):
             return
         
-        thread = threading.Thread(target=self._run_organization_worker)
-        thread.start()
+        self._prepare_for_operation("ОРГАНИЗАЦИЯ")
+        self._start_operation_thread(self._run_organization_worker, cancellable=True)
 
     def _run_organization_worker(self):
-        self._prepare_for_operation("ОРГАНИЗАЦИЯ")
+        metrics = self._new_run_metrics("organize", "ОРГАНИЗАЦИЯ")
+        try:
+            budget = new_run_budget_logic(self.settings, self.run_cancel_event)
+            run_organization_logic(self.settings, self.gui_log_action, metrics=metrics, budget=budget)
+        except Exception as e:
+            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+        self._save_run_metrics(metrics)
+        self.run_on_ui_thread(lambda: self._finalize_operation("ОРГАНИЗАЦИЯ", metrics))
+
+    def run_dry_run_thread(self):
+        self._prepare_for_operation("ПРОБНЫЙ ЗАПУСК")
+        self._start_operation_thread(self._run_dry_run_worker, cancellable=True)
+
+    def _run_dry_run_worker(self):
+        metrics = self._new_run_metrics("dry_run", "ПРОБНЫЙ ЗАПУСК")
+        try:
+            budget = new_run_budget_logic(self.settings, self.run_cancel_event)
+            plan = run_organization_logic(self.settings, self.gui_log_action, dry_run=True, metrics=metrics, budget=budget)
+            for plan_item in plan or []:
+                self.gui_log_action(f"ПЛАН ({plan_item.action})", plan_item.source, plan_item.destination, plan_item.reason)
+        except Exception as e:
+            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+        self._save_run_metrics(metrics)
+        self.run_on_ui_thread(lambda: self._finalize_operation("ПРОБНЫЙ ЗАПУСК", metrics))
+
+    def toggle_watch(self):
+        if self.watch_stop_event is not None:
+            self.watch_stop_event.set()
+            self._set_watch_stopped()
+            return
+
+        # Organizing or rolling back while watching would race the watcher: items a rollback returns to
+        # Downloads would be sorted again a moment later. Those buttons stay off until watching stops.
+        self.watch_stop_event = threading.Event()
+        self.watch_button.config(text="Остановить слежение")
+        self.run_button.config(state=tk.DISABLED)
+        self.rollback_button.config(state=tk.DISABLED)
+        thread = threading.Thread(target=self._watch_worker, args=(self.watch_stop_event,), daemon=True)
+        thread.start()
+
+    def _set_watch_stopped(self):
+        self.watch_stop_event = None
+        self.watch_button.config(text="Следить за Загрузками")
+        self.run_button.config(state=tk.NORMAL)
+        self.rollback_button.config(state=tk.NORMAL)
+
+    def _watch_worker(self, stop_event):
+        from organizer_watch import watch_downloads_logic
         try:
-            run_organization_logic(self.settings, self.gui_log_action)
+            watch_downloads_logic(self.settings, self.gui_log_action, stop_event)
         except Exception as e:
-            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", f"Ошибка: {e}")
-        self._finalize_operation("ОРГАНИЗАЦИЯ")
+            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+        finally:
+            # The watcher also returns on its own (Downloads missing); the button must not keep saying "stop".
+            self.run_on_ui_thread(lambda: self._on_watch_finished(stop_event))
+
+    def _on_watch_finished(self, stop_event):
+        if self.watch_stop_event is stop_event:
+            self._set_watch_stopped()
 
     def perform_rollback_thread(self):
         if not messagebox.askyesno("Подтверждение СБРОСА", "Вы уверены, что хотите сбросить всю организацию?"):
             return
-        thread = threading.Thread(target=self._perform_rollback_worker)
-        thread.start()
+        self._prepare_for_operation("СБРОС ОРГАНИЗАЦИИ")
+        self._start_operation_thread(self._perform_rollback_worker)
 
     def _perform_rollback_worker(self):
-        self._prepare_for_operation("СБРОС ОРГАНИЗАЦИИ")
+        metrics = self._new_run_metrics("rollback", "СБРОС ОРГАНИЗАЦИИ")
         try:
-            perform_rollback_logic(self.settings, self.gui_log_action)
+            perform_rollback_logic(self.settings, self.gui_log_action, all_runs=True, metrics=metrics)
         except Exception as e:
-            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", f"Ошибка: {e}")
-        self._finalize_operation("СБРОС ОРГАНИЗАЦИИ")
+            self.gui_log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+        self._save_run_metrics(metrics)
+        self.run_on_ui_thread(lambda: self._finalize_operation("СБРОС ОРГАНИЗАЦИИ", metrics))
 
     def gui_log_action(self, action_type, item_path_obj_or_name, destination_parent_path_obj=None, reason=""):
         item_name = item_path_obj_or_name.name if isinstance(item_path_obj_or_name, Path) else str(item_path_obj_or_name)
@@ -397,203 +809,6 @@ class DownloadsOrganizerApp:
             message += f" (Причина: {reason})"
         self.gui_log(message)
 
-def is_file_older_than_logic(file_path, days):
-    try:
-        return file_path.stat().st_mtime < (time.time() - (days * 24 * 60 * 60))
-    except FileNotFoundError:
-        return False
-
-def get_file_category_name_logic(file_path):
-    extension = file_path.suffix.lower()
-    if not extension: return "10_Другое"
-    for cat_name, exts_list in FILE_TYPE_CATEGORIES.items():
-        if extension in exts_list: return cat_name
-    return "10_Другое"
-    
-def is_windows_duplicate_name_logic(filename):
-    return bool(re.match(r"(.+)\s\(\d+\)(\.[^.]+)?$", filename))
-
-
-def ensure_dir_exists_logic(dir_path, log_callback):
-    try:
-        dir_path.mkdir(parents=True, exist_ok=True)
-    except Exception as e:
-        log_callback("ОШИБКА СОЗДАНИЯ ПАПКИ", dir_path.name, reason=f"{e}")
-
-def move_item_safely_logic(source_path, target_dir_path, log_callback, action_type="Перемещение", reason=""):
-    if not source_path.exists():
-        log_callback("ПРЕДУПРЕЖДЕНИЕ", source_path.name, reason="Исходный элемент не найден.")
-        return
-    
-    ensure_dir_exists_logic(target_dir_path, log_callback)
-    target_path = target_dir_path / source_path.name
-    
-    counter = 1
-    base_name = source_path.stem
-    suffix = source_path.suffix
-
-    while target_path.exists():
-        new_name = f"{base_name}_{counter}{suffix}"
-        target_path = target_dir_path / new_name
-        counter += 1
-        if counter > 100:
-            log_callback("ОШИБКА ПЕРЕМЕЩЕНИЯ", source_path.name, reason="Слишком много дубликатов.")
-            return
-
-    try:
-        shutil.move(str(source_path), str(target_path))
-        log_callback(action_type, source_path, target_dir_path, reason)
-    except Exception as e:
-        log_callback("ОШИБКА ПЕРЕМЕЩЕНИЯ", source_path.name, reason=f"{e}")
-
-def is_folder_content_old_logic(folder_to_check_path, days, ignored_folder_names_list, log_callback):
-    cutoff_time_ts = time.time() - (days * 24 * 60 * 60)
-    
-    if folder_to_check_path.name in ignored_folder_names_list:
-        return False
-
-    try:
-        for item in folder_to_check_path.rglob("*"):
-            
-            is_in_ignored_subfolder = any(part in ignored_folder_names_list for part in item.relative_to(folder_to_check_path).parts)
-            if is_in_ignored_subfolder:
-                continue
-            
-            if item.stat().st_mtime >= cutoff_time_ts:
-                log_callback("ИНФО (ПРОВЕРКА СТАРОСТИ)", folder_to_check_path.name, reason=f"Найден свежий элемент: {item.name}")
-                return False
-    except FileNotFoundError:
-        return True
-    
-    return True
-
-def run_organization_logic(current_settings, log_callback_gui):
-    downloads_path = Path.home() / current_settings["downloads_dir_name"]
-    archive_dir_name = current_settings["archive_dir_name"]
-    days_older = current_settings["days_older_to_archive"]
-    folders_to_ignore = current_settings["folders_to_ignore"]
-
-    if not downloads_path.is_dir():
-        log_callback_gui("КРИТИЧЕСКАЯ ОШИБКА", downloads_path.name, reason="Папка Загрузок не найдена.")
-        return
-
-    archive_base_path = downloads_path / archive_dir_name
-    quarantine_path = downloads_path / QUARANTINE_DIR_NAME
-    
-    archive_general_old_path = archive_base_path / ARCHIVE_GENERAL_OLD_SUBDIR
-    archive_specific_archives_old_path = archive_base_path / ARCHIVE_SPECIFIC_ARCHIVES_OLD_SUBDIR
-    archive_old_folders_path = archive_base_path / ARCHIVED_OLD_FOLDERS_SUBDIR
-    
-    ensure_dir_exists_logic(quarantine_path, log_callback_gui)
-    ensure_dir_exists_logic(archive_general_old_path, log_callback_gui)
-    ensure_dir_exists_logic(archive_specific_archives_old_path, log_callback_gui)
-    ensure_dir_exists_logic(archive_old_folders_path, log_callback_gui)
-
-    category_folder_names = list(FILE_TYPE_CATEGORIES.keys())
-    for cat_name in category_folder_names:
-        ensure_dir_exists_logic(downloads_path / cat_name, log_callback_gui)
-
-    folders_to_skip = folders_to_ignore + [archive_dir_name, QUARANTINE_DIR_NAME] + category_folder_names
-
-    log_callback_gui("ЭТАП 1", "Обработка элементов на верхнем уровне Загрузок")
-    for item_path in list(downloads_path.iterdir()):
-        if item_path.name in folders_to_skip:
-            continue
-
-        if item_path.is_file():
-            filename = item_path.name
-            file_ext_lower = item_path.suffix.lower()
-            
-            junk_reason = ""
-            if file_ext_lower in JUNK_EXTENSIONS:
-                junk_reason = f"расширение ({file_ext_lower})"
-            elif any(k.lower() in filename.lower() for k in JUNK_KEYWORDS):
-                keyword = next((k for k in JUNK_KEYWORDS if k.lower() in filename.lower()), "")
-                junk_reason = f"ключевое слово ('{keyword}')"
-            elif is_windows_duplicate_name_logic(filename):
-                junk_reason = "похож на дубликат Windows"
-
-            if junk_reason:
-                move_item_safely_logic(item_path, quarantine_path, log_callback_gui, "В КАРАНТИН", junk_reason)
-                continue
-
-            if is_file_older_than_logic(item_path, days_older):
-                dest_path = archive_specific_archives_old_path if file_ext_lower in PROGRAM_ARCHIVE_EXTENSIONS else archive_general_old_path
-                move_item_safely_logic(item_path, dest_path, log_callback_gui, "В АРХИВ (СТАРЫЙ)", f"старше {days_older} дней")
-                continue
-
-            category_name = get_file_category_name_logic(item_path)
-            move_item_safely_logic(item_path, downloads_path / category_name, log_callback_gui, "СОРТИРОВКА", f"категория '{category_name}'")
-
-        elif item_path.is_dir():
-             if is_folder_content_old_logic(item_path, days_older, folders_to_ignore, log_callback_gui):
-                move_item_safely_logic(item_path, archive_old_folders_path, log_callback_gui, "В АРХИВ (СТАРАЯ ПАПКА)", f"все содержимое старше {days_older} дней")
-
-    log_callback_gui("ЭТАП 2", "Проверка на старость файлов внутри папок категорий")
-    for category_name in category_folder_names:
-        category_path = downloads_path / category_name
-        if not category_path.is_dir(): continue
-
-        for item_in_category_path in list(category_path.iterdir()):
-            if item_in_category_path.is_file() and is_file_older_than_logic(item_in_category_path, days_older):
-                file_ext_lower = item_in_category_path.suffix.lower()
-                dest_path = archive_specific_archives_old_path if file_ext_lower in PROGRAM_ARCHIVE_EXTENSIONS else archive_general_old_path
-                move_item_safely_logic(item_in_category_path, dest_path, log_callback_gui, "В АРХИВ (ИЗ КАТЕГОРИИ)")
-
-def perform_rollback_logic(current_settings, log_callback_gui):
-    downloads_path = Path.home() / current_settings["downloads_dir_name"]
-    archive_base_path = downloads_path / current_settings["archive_dir_name"]
-    quarantine_path = downloads_path / QUARANTINE_DIR_NAME
-
-    log_callback_gui("СБРОС", "Начало операции сброса организации.")
-
-    if quarantine_path.is_dir():
-        log_callback_gui("СБРОС", quarantine_path.name, reason="Возврат содержимого.")
-        for item in list(quarantine_path.iterdir()):
-            move_item_safely_logic(item, downloads_path, log_callback_gui, "ВОЗВРАТ ИЗ КАРАНТИНА")
-        try:
-            quarantine_path.rmdir()
-            log_callback_gui("УДАЛЕНИЕ ПАПКИ", quarantine_path.name)
-        except OSError:
-            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", quarantine_path.name, reason="Папка не пуста, не удалена.")
-
-    if archive_base_path.is_dir():
-        log_callback_gui("СБРОС", archive_base_path.name, reason="Обработка папки архива.")
-        
-        archive_subfolders_to_empty = [
-            archive_base_path / ARCHIVE_GENERAL_OLD_SUBDIR,
-            archive_base_path / ARCHIVE_SPECIFIC_ARCHIVES_OLD_SUBDIR,
-            archive_base_path / ARCHIVED_OLD_FOLDERS_SUBDIR,
-        ]
-        
-        for archive_subfolder_path in archive_subfolders_to_empty:
-            if archive_subfolder_path.is_dir():
-                for item in list(archive_subfolder_path.iterdir()):
-                    move_item_safely_logic(item, downloads_path, log_callback_gui, "ВОЗВРАТ ИЗ АРХИВА")
-                try:
-                    archive_subfolder_path.rmdir()
-                    log_callback_gui("УДАЛЕНИЕ ПАПКИ", archive_subfolder_path.name)
-                except OSError:
-                    log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", archive_subfolder_path.name, "Не удалось удалить (возможно, не пуста).")
-        try:
-            archive_base_path.rmdir()
-            log_callback_gui("УДАЛЕНИЕ ПАПКИ", archive_base_path.name)
-        except OSError:
-            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", archive_base_path.name, "Не удалось удалить (возможно, не пуста).")
-
-    category_folder_names = list(FILE_TYPE_CATEGORIES.keys())
-    for cat_name in category_folder_names:
-        category_path = downloads_path / cat_name
-        if category_path.is_dir():
-            for item in list(category_path.iterdir()):
-                move_item_safely_logic(item, downloads_path, log_callback_gui, "ВОЗВРАТ ИЗ КАТЕГОРИИ")
-            try:
-                category_path.rmdir()
-                log_callback_gui("УДАЛЕНИЕ ПАПКИ", category_path.name)
-            except OSError:
-                log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", category_path.name, reason="Папка не пуста, не удалена.")
-
-    log_callback_gui("СБРОС", "Операция сброса организации завершена.")
 
 if __name__ == "__main__":
     root = tk.Tk()
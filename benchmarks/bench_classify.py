@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from organizer_logic import FILE_TYPE_CATEGORIES, JUNK_EXTENSIONS, JUNK_KEYWORDS, DEFAULT_RULES
+
+SYNTHETIC_SUFFIXES = [ext for exts in FILE_TYPE_CATEGORIES.values() for ext in exts] + JUNK_EXTENSIONS + [
+    ".tar.gz", ".unknown", ".PDF", ".JPG", ""]
+SYNTHETIC_WORDS = ["report", "photo", "invoice", "setup", "Отчёт", "scan", "draft", "final"] + JUNK_KEYWORDS
+
+
+def generate_names(count, seed):
+    rng = random.Random(seed)
+    names = []
+    for index in range(count):
+        stem = f"{rng.choice(SYNTHETIC_WORDS)}_{index}"
+        if rng.random() < 0.05:
+            stem += f" ({rng.randint(1, 9)})"
+        names.append(stem + rng.choice(SYNTHETIC_SUFFIXES))
+    return names
+
+
+# Прежний алгоритм: линейный поиск по спискам категорий и по ключевым словам.
+def classify_linear(filename):
+    extension = Path(filename).suffix.lower()
+    if extension in JUNK_EXTENSIONS:
+        return "junk"
+    if any(k.lower() in filename.lower() for k in JUNK_KEYWORDS):
+        next((k for k in JUNK_KEYWORDS if k.lower() in filename.lower()), "")
+        return "junk"
+    if re.match(r"(.+)\s\(\d+\)(\.[^.]+)?$", filename):
+        return "junk"
+    if not extension:
+        return "10_Другое"
+    for cat_name, exts_list in FILE_TYPE_CATEGORIES.items():
+        if extension in exts_list:
+            return cat_name
+    return "10_Другое"
+
+
+def classify_compiled(filename, rules=DEFAULT_RULES):
+    junk_extension, junk_keyword, category = rules.classify(filename)
+    if junk_extension or junk_keyword or rules.is_windows_duplicate(filename):
+        return "junk"
+    return category
+
+
+def time_classifier(classifier, names):
+    started = time.perf_counter()
+    results = [classifier(name) for name in names]
+    elapsed = time.perf_counter() - started
+    return results, {"seconds": round(elapsed, 3), "names_per_second": round(len(names) / elapsed)}
+
+
+def run_benchmark(count, seed):
+    names = generate_names(count, seed)
+    linear_results, linear_timing = time_classifier(classify_linear, names)
+    compiled_results, compiled_timing = time_classifier(classify_compiled, names)
+    mismatches = sum(1 for linear, compiled in zip(linear_results, compiled_results) if linear != compiled)
+    return {
+        "names": count,
+        "linear": linear_timing,
+        "compiled": compiled_timing,
+        "speedup": round(linear_timing["seconds"] / compiled_timing["seconds"], 2),
+        "mismatches": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость классификации имён файлов: прежний и компилированный вариант.")
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", type=Path, default=None, help="Сохранить результаты в JSON.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.names, args.seed)
+    for name in ("linear", "compiled"):
+        print(f"{name:<10} {results[name]['seconds']:>8.3f} s   {results[name]['names_per_second']:>10} имён/с")
+    print(f"{'speedup':<10} {results['speedup']:>8.2f}x")
+    print(f"{'mismatches':<10} {results['mismatches']:>8}")
+
+    if args.json_path:
+        args.json_path.write_text(json.dumps(results, indent=4, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
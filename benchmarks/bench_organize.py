@@ -0,0 +1,213 @@
+import argparse
+import builtins
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import organizer_move
+from organizer_logic import (
+    DEFAULT_SETTINGS, get_organization_context_logic, is_folder_content_old_logic, run_organization_logic,
+    perform_rollback_logic, list_quarantine_logic,
+)
+from synthetic_tree import generate_downloads_tree
+
+COUNTED_OS_FUNCTIONS = ["stat", "lstat", "listdir", "rename", "replace", "link", "unlink", "mkdir", "rmdir", "utime", "fsync"]
+
+
+class _CountingScandir:
+    def __init__(self, iterator, counts):
+        self._iterator = iterator
+        self._counts = counts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._iterator.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        dir_entry = next(self._iterator)
+        self._counts["scandir_entries"] += 1
+        return dir_entry
+
+    def close(self):
+        self._iterator.close()
+
+
+class SyscallCounter:
+    # Counts calls by wrapping the os functions the organizer goes through (pathlib and os.path call them too).
+    # DirEntry.stat() results are cached by scandir and are not counted separately.
+    def __init__(self):
+        self.counts = Counter()
+        self._originals = []
+
+    def _wrap(self, module, name, counter_name=None):
+        original = getattr(module, name)
+        counter_name = counter_name or name
+
+        def counting(*args, **kwargs):
+            self.counts[counter_name] += 1
+            return original(*args, **kwargs)
+        self._originals.append((module, name, original))
+        setattr(module, name, counting)
+
+    def __enter__(self):
+        for name in COUNTED_OS_FUNCTIONS:
+            self._wrap(os, name)
+        self._wrap(builtins, "open")
+        self._wrap(organizer_move, "_rename_noreplace_syscall", "renameat2")
+
+        original_scandir = os.scandir
+
+        def counting_scandir(*args, **kwargs):
+            self.counts["scandir"] += 1
+            return _CountingScandir(original_scandir(*args, **kwargs), self.counts)
+        self._originals.append((os, "scandir", original_scandir))
+        os.scandir = counting_scandir
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for module, name, original in reversed(self._originals):
+            setattr(module, name, original)
+        self._originals = []
+
+
+class CountingLog:
+    def __init__(self):
+        self.actions = 0
+        self.errors = 0
+
+    def __call__(self, action_type, item_path_obj_or_name, destination_parent_path_obj=None, reason=""):
+        self.actions += 1
+        if action_type.startswith(("ОШИБКА", "КРИТИЧЕСКАЯ")):
+            self.errors += 1
+
+
+def measure_stage(stage_function, track_memory):
+    log = CountingLog()
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with SyscallCounter() as counter:
+        stage_function(log)
+    elapsed = time.perf_counter() - started
+    result = {"seconds": round(elapsed, 4), "log_actions": log.actions, "log_errors": log.errors,
+              "syscalls": dict(sorted(counter.counts.items())), "syscalls_total": sum(counter.counts.values())}
+    if track_memory:
+        result["peak_memory_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return result
+
+
+def run_benchmark(args):
+    results = {
+        "params": {key: value for key, value in vars(args).items() if key not in ("json_path", "compare_path")},
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stages": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_home:
+        os.environ["HOME"] = tmp_home
+        os.environ["USERPROFILE"] = tmp_home
+        settings = dict(DEFAULT_SETTINGS, scan_threads=args.scan_threads, move_threads=args.move_threads,
+                        days_older_to_archive=args.days_older, content_dedup=not args.no_content_dedup)
+        downloads_path = Path(tmp_home) / settings["downloads_dir_name"]
+
+        started = time.perf_counter()
+        results["tree"] = generate_downloads_tree(
+            downloads_path, files=args.files, junk_ratio=args.junk_ratio, duplicate_ratio=args.duplicate_ratio,
+            old_ratio=args.old_ratio, old_folders=args.old_folders, fresh_folders=args.fresh_folders,
+            folder_depth=args.folder_depth, files_per_folder=args.files_per_folder, days_older=args.days_older, seed=args.seed)
+        results["tree"]["generate_seconds"] = round(time.perf_counter() - started, 3)
+
+        def age_check(log):
+            context = get_organization_context_logic(settings)
+            with os.scandir(downloads_path) as it:
+                folder_paths = [downloads_path / dir_entry.name for dir_entry in it if dir_entry.is_dir(follow_symlinks=False)]
+            for folder_path in folder_paths:
+                is_folder_content_old_logic(folder_path, context["days_older"], context["folders_to_ignore"], log)
+
+        stages = [
+            ("age_check", age_check),
+            ("dry_run", lambda log: run_organization_logic(settings, log, dry_run=True)),
+            ("organize", lambda log: run_organization_logic(settings, log)),
+            ("quarantine_list", lambda log: list_quarantine_logic(settings)),
+            ("rollback", lambda log: perform_rollback_logic(settings, log, all_runs=True)),
+        ]
+        for stage_name, stage_function in stages:
+            if args.stages and stage_name not in args.stages:
+                continue
+            results["stages"][stage_name] = measure_stage(stage_function, not args.no_memory)
+    return results
+
+
+def compare_results(results, baseline, max_regression):
+    regressions = []
+    for stage_name, stage in results["stages"].items():
+        baseline_stage = baseline.get("stages", {}).get(stage_name)
+        if not baseline_stage or not baseline_stage["seconds"]:
+            continue
+        ratio = stage["seconds"] / baseline_stage["seconds"]
+        syscall_ratio = stage["syscalls_total"] / max(1, baseline_stage["syscalls_total"])
+        print(f"{stage_name:<16} time x{ratio:>5.2f}   syscalls x{syscall_ratio:>5.2f}")
+        if ratio > max_regression or syscall_ratio > max_regression:
+            regressions.append(stage_name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер организации, отката и сканирования на синтетической папке Загрузок.")
+    parser.add_argument("--files", type=int, default=5000, help="Число файлов на верхнем уровне.")
+    parser.add_argument("--junk-ratio", type=float, default=0.05)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05, help="Доля копий вида 'имя (N).ext'.")
+    parser.add_argument("--old-ratio", type=float, default=0.3, help="Доля файлов старше days_older.")
+    parser.add_argument("--old-folders", type=int, default=50)
+    parser.add_argument("--fresh-folders", type=int, default=10)
+    parser.add_argument("--folder-depth", type=int, default=5)
+    parser.add_argument("--files-per-folder", type=int, default=20)
+    parser.add_argument("--days-older", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scan-threads", type=int, default=DEFAULT_SETTINGS["scan_threads"])
+    parser.add_argument("--move-threads", type=int, default=DEFAULT_SETTINGS["move_threads"])
+    parser.add_argument("--no-content-dedup", action="store_true")
+    parser.add_argument("--no-memory", action="store_true", help="Не включать tracemalloc (время точнее, без пика памяти).")
+    parser.add_argument("--stage", dest="stages", action="append", default=[], help="Запустить только этот этап (можно повторять).")
+    parser.add_argument("--json", dest="json_path", type=Path, default=None, help="Сохранить результаты в JSON.")
+    parser.add_argument("--compare", dest="compare_path", type=Path, default=None,
+                        help="Сравнить с сохранённым JSON и завершиться с кодом 1 при регрессии.")
+    parser.add_argument("--max-regression", type=float, default=1.25, help="Допустимое замедление относительно --compare.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print(f"tree: {results['tree']}")
+    for stage_name, stage in results["stages"].items():
+        memory = f"   peak {stage['peak_memory_kib']:>10.1f} KiB" if "peak_memory_kib" in stage else ""
+        print(f"{stage_name:<16} {stage['seconds']:>8.3f} s   syscalls {stage['syscalls_total']:>8}{memory}")
+
+    if args.json_path:
+        args.json_path.write_text(json.dumps(results, indent=4, ensure_ascii=False), encoding="utf-8")
+
+    if args.compare_path:
+        baseline = json.loads(args.compare_path.read_text(encoding="utf-8"))
+        regressions = compare_results(results, baseline, args.max_regression)
+        if regressions:
+            print(f"Регрессия: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
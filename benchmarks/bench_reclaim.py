@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from organizer_logic import DEFAULT_SETTINGS, run_organization_logic, build_reclaim_report_logic
+from bench_organize import CountingLog, SyscallCounter
+from synthetic_tree import generate_downloads_tree
+
+
+def measure_report(settings, rescan=False):
+    started = time.perf_counter()
+    with SyscallCounter() as counter:
+        entries = build_reclaim_report_logic(settings, rescan=rescan)
+    return {"seconds": round(time.perf_counter() - started, 4), "rows": len(entries), "scandir": counter.counts["scandir"],
+            "syscalls_total": sum(counter.counts.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Отчёт о месте после организации: первый, повторный из индекса размеров и после нового запуска.")
+    parser.add_argument("--files", type=int, default=20000, help="Число файлов на верхнем уровне.")
+    parser.add_argument("--old-folders", type=int, default=200)
+    parser.add_argument("--files-per-folder", type=int, default=20)
+    parser.add_argument("--new-files", type=int, default=500, help="Сколько файлов добавить перед вторым запуском.")
+    parser.add_argument("--archive-layout", default="flat")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-warm-scandirs", type=int, default=8,
+                        help="Сколько каталогов может перечитать повторный отчёт; код 1, если больше.")
+    parser.add_argument("--json", dest="json_path", type=Path, default=None, help="Сохранить результаты в JSON.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_home:
+        os.environ["HOME"] = tmp_home
+        os.environ["USERPROFILE"] = tmp_home
+        settings = dict(DEFAULT_SETTINGS, archive_layout=args.archive_layout)
+        downloads_path = Path(tmp_home) / settings["downloads_dir_name"]
+        generate_downloads_tree(downloads_path, files=args.files, old_folders=args.old_folders, fresh_folders=1,
+                                files_per_folder=args.files_per_folder, seed=args.seed)
+        run_organization_logic(settings, CountingLog())
+
+        results["cold"] = measure_report(settings)
+        results["warm"] = measure_report(settings)
+        results["rescan"] = measure_report(settings, rescan=True)
+
+        # A second run moves new files into categories and the archive; the size index follows the moves.
+        old_mtime = time.time() - 30 * 24 * 60 * 60
+        for number in range(args.new_files):
+            file_path = downloads_path / f"new_{number}.pdf"
+            file_path.write_bytes(b"%PDF-1.4\n" + bytes(number % 256) * 64)
+            if number % 2:
+                os.utime(file_path, (old_mtime, old_mtime))
+        run_organization_logic(settings, CountingLog())
+        results["after_run"] = measure_report(settings)
+
+    for name, result in results.items():
+        print(f"{name:<10} {result['seconds']:>8.4f} s   rows {result['rows']:>7}   scandir {result['scandir']:>6}   "
+              f"syscalls {result['syscalls_total']:>8}")
+
+    if args.json_path:
+        args.json_path.write_text(json.dumps(results, indent=4), encoding="utf-8")
+
+    slow = [name for name in ("warm", "after_run") if results[name]["scandir"] > args.max_warm_scandirs]
+    if slow:
+        print(f"Отчёт перечитал больше {args.max_warm_scandirs} каталогов: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
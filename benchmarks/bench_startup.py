@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+GUI_IMPORT_SNIPPET = "import DownloadsOrganizer"
+GUI_WINDOW_SNIPPET = (
+    "import tkinter as tk\n"
+    "import DownloadsOrganizer\n"
+    "root = tk.Tk()\n"
+    "DownloadsOrganizer.DownloadsOrganizerApp(root)\n"
+    "root.update()\n"
+    "root.destroy()\n"
+)
+TKINTER_CHECK_SNIPPET = "import sys, organizer_cli; print('tkinter' in sys.modules)"
+
+
+def time_command(command, env, cwd, runs):
+    timings_ms = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings_ms.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(timings_ms), 1), "min_ms": round(min(timings_ms), 1), "runs": runs}
+
+
+def run_benchmark(runs):
+    with tempfile.TemporaryDirectory() as tmp_home:
+        (Path(tmp_home) / "Downloads").mkdir()
+        config_path = Path(tmp_home) / "organizer_config.json"
+        config_path.write_text(json.dumps({"downloads_dir_name": "Downloads"}), encoding="utf-8")
+
+        env = dict(os.environ, HOME=tmp_home, USERPROFILE=tmp_home, PYTHONPATH=str(REPO_DIR))
+        results = {}
+
+        results["python_baseline"] = time_command([sys.executable, "-c", "pass"], env, tmp_home, runs)
+        results["cli_quarantine_list"] = time_command(
+            [sys.executable, str(REPO_DIR / "organizer_cli.py"), "quarantine", "list", "--config", str(config_path)],
+            env, tmp_home, runs)
+        results["gui_import"] = time_command([sys.executable, "-c", GUI_IMPORT_SNIPPET], env, tmp_home, runs)
+        if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+            results["gui_window"] = time_command([sys.executable, "-c", GUI_WINDOW_SNIPPET], env, tmp_home, runs)
+
+        check = subprocess.run([sys.executable, "-c", TKINTER_CHECK_SNIPPET], env=env, cwd=tmp_home,
+                               capture_output=True, text=True, check=True)
+        results["cli_imports_tkinter"] = check.stdout.strip() == "True"
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение времени запуска CLI и GUI.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", dest="json_path", type=Path, default=None, help="Сохранить результаты в JSON.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs)
+    for name, value in results.items():
+        if isinstance(value, dict):
+            print(f"{name:<22} median {value['median_ms']:>8.1f} ms   min {value['min_ms']:>8.1f} ms")
+        else:
+            print(f"{name:<22} {value}")
+
+    if args.json_path:
+        args.json_path.write_text(json.dumps(results, indent=4, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
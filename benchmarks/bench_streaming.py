@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from organizer_logic import DEFAULT_SETTINGS, run_organization_logic
+from organizer_stream import run_organization_streaming_logic
+from synthetic_tree import generate_downloads_tree
+
+MODES = {
+    "stream": run_organization_streaming_logic,
+    "regular": run_organization_logic,
+}
+
+
+def discard_log(action_type, item_path_obj_or_name, destination_parent_path_obj=None, reason=""):
+    pass
+
+
+def max_rss_kib():
+    # VmHWM belongs to this process image only; ru_maxrss on Linux also keeps the high-water mark of the parent
+    # that spawned us, which is the benchmark itself after generating the tree.
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, the others KiB.
+    return round(max_rss / 1024, 1) if sys.platform == "darwin" else max_rss
+
+
+def measure_in_this_process(mode, home, traced):
+    # Runs in a fresh process per measurement, so ru_maxrss is the peak of this one run only. tracemalloc keeps
+    # its own bookkeeping per allocation site and inflates RSS, so RSS and the traced peak come from separate runs.
+    os.environ["HOME"] = home
+    os.environ["USERPROFILE"] = home
+    settings = dict(DEFAULT_SETTINGS, scan_threads=1, move_threads=1)
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    MODES[mode](settings, discard_log)
+    elapsed = time.perf_counter() - started
+    if traced:
+        peak_traced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {"seconds": round(elapsed, 3), "peak_traced_kib": round(peak_traced / 1024, 1)}
+    return {"seconds": round(elapsed, 3), "max_rss_kib": max_rss_kib()}
+
+
+def measure_in_child(mode, files, seed):
+    result = {"files": files}
+    for traced in (False, True):
+        with tempfile.TemporaryDirectory() as tmp_home:
+            generate_downloads_tree(Path(tmp_home) / DEFAULT_SETTINGS["downloads_dir_name"], files=files,
+                                    old_folders=max(1, files // 1000), fresh_folders=max(1, files // 5000),
+                                    files_per_folder=5, file_size=16, seed=seed)
+            command = [sys.executable, __file__, "--measure", mode, "--home", tmp_home] + (["--traced"] if traced else [])
+            output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        result.update(json.loads(output))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Пик памяти потокового режима на маленькой и большой папке Загрузок; код 1, если он превышает потолок.")
+    parser.add_argument("--small", type=int, default=2000, help="Число файлов в маленькой папке.")
+    parser.add_argument("--large", type=int, default=20000, help="Число файлов в большой папке.")
+    parser.add_argument("--mode", dest="modes", action="append", choices=sorted(MODES), default=[],
+                        help="Режим для замера (по умолчанию stream и regular для сравнения).")
+    parser.add_argument("--max-peak-kib", type=float, default=2048,
+                        help="Потолок пика выделенной Python-памяти потокового режима на большой папке.")
+    parser.add_argument("--max-growth-kib", type=float, default=2048,
+                        help="Допустимый рост пика памяти и RSS потокового режима от маленькой папки к большой.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", type=Path, default=None, help="Сохранить результаты в JSON.")
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--home", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--traced", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_in_this_process(args.measure, args.home, args.traced)))
+        return
+
+    results = {}
+    for mode in args.modes or ["stream", "regular"]:
+        results[mode] = [measure_in_child(mode, files, args.seed) for files in (args.small, args.large)]
+        for result in results[mode]:
+            print(f"{mode:<8} files {result['files']:>8}   {result['seconds']:>8.3f} s   "
+                  f"peak {result['peak_traced_kib']:>10.1f} KiB   max RSS {result['max_rss_kib']} KiB")
+
+    if args.json_path:
+        args.json_path.write_text(json.dumps(results, indent=4), encoding="utf-8")
+
+    if "stream" in results:
+        small, large = results["stream"]
+        failures = []
+        if large["peak_traced_kib"] > args.max_peak_kib:
+            failures.append(f"пик {large['peak_traced_kib']} KiB больше потолка {args.max_peak_kib} KiB")
+        if large["peak_traced_kib"] - small["peak_traced_kib"] > args.max_growth_kib:
+            failures.append(f"пик вырос с {small['peak_traced_kib']} до {large['peak_traced_kib']} KiB")
+        if large["max_rss_kib"] is not None and large["max_rss_kib"] - small["max_rss_kib"] > args.max_growth_kib:
+            failures.append(f"RSS вырос с {small['max_rss_kib']} до {large['max_rss_kib']} KiB")
+        if failures:
+            print(f"Потоковый режим: {'; '.join(failures)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
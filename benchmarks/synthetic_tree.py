@@ -0,0 +1,82 @@
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from organizer_logic import FILE_TYPE_CATEGORIES
+
+DAY_SECONDS = 24 * 60 * 60
+UNKNOWN_EXTENSIONS = [".dat", ".bin", ".xyz", ""]
+JUNK_NAME_PARTS = [".tmp", ".log", ".bak", ".crdownload", "_backup", "_old_version", "_temp"]
+
+
+def _touch(file_path, size, mtime, rng):
+    with open(file_path, "wb") as f:
+        if size:
+            f.write(rng.getrandbits(size * 8).to_bytes(size, "little"))
+    os.utime(file_path, (mtime, mtime))
+
+
+def generate_downloads_tree(downloads_path, files=1000, junk_ratio=0.05, duplicate_ratio=0.05, old_ratio=0.3,
+                            old_folders=20, fresh_folders=5, folder_depth=4, files_per_folder=10,
+                            file_size=256, days_older=7, seed=1):
+    # Builds a reproducible Downloads tree: top-level files with a mix of extensions, junk names,
+    # " (N)" copies with identical content, files older than days_older, and nested folders that are
+    # either old all the way down or hide one fresh file at the deepest level.
+    rng = random.Random(seed)
+    downloads_path = Path(downloads_path)
+    downloads_path.mkdir(parents=True, exist_ok=True)
+    extensions = [ext for exts in FILE_TYPE_CATEGORIES.values() for ext in exts] + UNKNOWN_EXTENSIONS
+    now = time.time()
+    old_mtime = now - (days_older + 30) * DAY_SECONDS
+    stats = {"files": 0, "junk": 0, "duplicates": 0, "old_files": 0, "old_folders": 0, "fresh_folders": 0, "folder_files": 0}
+
+    originals = []
+    for index in range(files):
+        mtime = old_mtime if rng.random() < old_ratio else now - rng.uniform(0, days_older - 1) * DAY_SECONDS
+        roll = rng.random()
+        if roll < junk_ratio:
+            name = f"junk_{index}{rng.choice(JUNK_NAME_PARTS)}"
+            if not os.path.splitext(name)[1]:
+                name += ".txt"
+            stats["junk"] += 1
+        elif roll < junk_ratio + duplicate_ratio and originals:
+            original_path = rng.choice(originals)
+            copy_path = original_path.with_name(f"{original_path.stem} ({rng.randint(1, 9)}){original_path.suffix}")
+            if copy_path.exists():
+                continue
+            copy_path.write_bytes(original_path.read_bytes())
+            os.utime(copy_path, (mtime, mtime))
+            stats["duplicates"] += 1
+            stats["files"] += 1
+            continue
+        else:
+            name = f"file_{index}{rng.choice(extensions)}"
+            originals.append(downloads_path / name)
+        _touch(downloads_path / name, rng.randint(0, file_size), mtime, rng)
+        stats["files"] += 1
+        stats["old_files"] += mtime == old_mtime
+
+    for folder_index in range(old_folders + fresh_folders):
+        is_fresh = folder_index >= old_folders
+        folder_path = downloads_path / f"{'fresh' if is_fresh else 'old'}_folder_{folder_index}"
+        level_path = folder_path
+        for depth in range(folder_depth):
+            level_path = level_path / f"level_{depth}"
+            level_path.mkdir(parents=True, exist_ok=True)
+            for file_index in range(files_per_folder):
+                _touch(level_path / f"item_{file_index}.txt", rng.randint(0, file_size), old_mtime, rng)
+                stats["folder_files"] += 1
+        if is_fresh:
+            _touch(level_path / "fresh_item.txt", 1, now, rng)
+            stats["fresh_folders"] += 1
+        else:
+            stats["old_folders"] += 1
+        for dir_path, _, _ in os.walk(folder_path, topdown=False):
+            os.utime(dir_path, (old_mtime, old_mtime))
+
+    return stats
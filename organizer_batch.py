@@ -0,0 +1,189 @@
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from organizer_logic import (
+    LOG_FILENAME_APP_PREFIX, get_classification_rules_logic, get_downloads_path_logic, run_organization_logic,
+)
+from organizer_metrics import RunMetrics, get_metrics_path_logic
+
+DEFAULT_BATCH_WORKERS = 4
+ROOT_STATUS_OK = "ok"
+ROOT_STATUS_FAILED = "failed"
+
+
+def load_batch_config_logic(config_path):
+    # {"workers": 4, "as_owner": true, "defaults": {...}, "roots": ["/home/*/Downloads", {"path": "...", "settings": {...}}]}
+    with open(config_path, "r", encoding="utf-8") as f:
+        batch_config = json.load(f)
+    if not isinstance(batch_config.get("roots", []), list):
+        raise ValueError("'roots' должен быть списком")
+    return batch_config
+
+
+def expand_batch_roots_logic(root_specs):
+    # Expands glob patterns in order; a root matched again later takes that entry's overrides on top of the earlier ones.
+    roots = {}
+    for root_spec in root_specs:
+        if isinstance(root_spec, str):
+            root_spec = {"path": root_spec}
+        overrides = root_spec.get("settings", {})
+        pattern = os.path.expanduser(root_spec["path"])
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            root_path = Path(match).resolve()
+            roots.setdefault(root_path, {}).update(overrides)
+    return roots
+
+
+def get_root_settings_logic(base_settings, root_path, overrides):
+    # An absolute downloads_dir_name wins over Path.home(), so every helper that builds paths from it follows the root.
+    root_settings = dict(base_settings)
+    root_settings.update(overrides)
+    root_settings["downloads_dir_name"] = str(root_path)
+    return root_settings
+
+
+def _get_root_log_path(root_settings, log_dir, started_at):
+    timestamp = started_at.strftime('%Y%m%d_%H%M%S')
+    if log_dir is None:
+        archive_path = get_downloads_path_logic(root_settings) / root_settings["archive_dir_name"]
+        return archive_path / f"{LOG_FILENAME_APP_PREFIX}_{timestamp}.txt"
+    root_slug = str(get_downloads_path_logic(root_settings)).strip(os.sep).replace(os.sep, "_") or "root"
+    return Path(log_dir) / f"{LOG_FILENAME_APP_PREFIX}_{root_slug}_{timestamp}.txt"
+
+
+def _drop_privileges_to_owner(root_path):
+    # Runs the root under its owner so that new category and archive folders stay writable for the user.
+    if not hasattr(os, "geteuid") or os.geteuid() != 0:
+        return
+    st = os.stat(root_path)
+    if st.st_uid == 0:
+        return
+    os.setgroups([])
+    os.setgid(st.st_gid)
+    os.setuid(st.st_uid)
+
+
+def organize_root_logic(root_path, root_settings, log_dir=None, dry_run=False, as_owner=False):
+    # Runs in a pool process: everything that can go wrong for one root ends up in the returned summary.
+    started_at = datetime.now()
+    started = time.perf_counter()
+    result = {"root": str(root_path), "status": ROOT_STATUS_OK, "log": None, "metrics": None, "error": None}
+    try:
+        if as_owner:
+            _drop_privileges_to_owner(root_path)
+        if not Path(root_path).is_dir():
+            result.update(status=ROOT_STATUS_FAILED, error="Папка Загрузок не найдена.", elapsed_s=0.0)
+            return result
+        log_path = _get_root_log_path(root_settings, log_dir, started_at)
+        metrics = RunMetrics("dry_run" if dry_run else "organize")
+        log_lock = threading.Lock()
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "w", encoding="utf-8") as log_file:
+            def log_callback(action_type, item_path_obj_or_name, destination_parent_path_obj=None, reason=""):
+                item_name = item_path_obj_or_name.name if isinstance(item_path_obj_or_name, Path) else str(item_path_obj_or_name)
+                message = f"{action_type}: \"{item_name}\""
+                if destination_parent_path_obj:
+                    message += f" -> {destination_parent_path_obj.name}"
+                if reason:
+                    message += f" (Причина: {reason})"
+                with log_lock:
+                    log_file.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+
+            plan = run_organization_logic(root_settings, log_callback, dry_run=dry_run, metrics=metrics)
+        metrics.save(get_metrics_path_logic(log_path))
+        result.update(log=str(log_path), metrics=metrics.to_dict(), planned=len(plan) if plan is not None else None)
+        if plan is None:
+            result.update(status=ROOT_STATUS_FAILED, error="Папка Загрузок не найдена.")
+    except Exception as e:
+        result.update(status=ROOT_STATUS_FAILED, error=f"{type(e).__name__}: {e}")
+    result["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _new_batch_pool(workers, as_owner):
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    if not as_owner:
+        return ProcessPoolExecutor(max_workers=workers)
+    # A dropped user id cannot be raised again, so every root gets a fresh process.
+    try:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1)
+    except TypeError:
+        raise ValueError("Для запуска от имени владельцев нужен Python 3.11+ (max_tasks_per_child)") from None
+
+
+def run_batch_organization_logic(base_settings, roots, workers=DEFAULT_BATCH_WORKERS, log_dir=None, dry_run=False,
+                                 as_owner=False, result_callback=None):
+    # roots: {root_path: settings overrides}. Returns one summary dict; per-root results go to result_callback as they finish.
+    from concurrent.futures import as_completed
+    from concurrent.futures.process import BrokenProcessPool
+
+    started = time.perf_counter()
+    results = []
+
+    def finish_root(result):
+        results.append(result)
+        if result_callback is not None:
+            result_callback(result)
+
+    jobs = []
+    for root_path, overrides in roots.items():
+        root_settings = get_root_settings_logic(base_settings, root_path, overrides)
+        try:
+            get_classification_rules_logic(root_settings)
+        except ValueError as e:
+            finish_root({"root": str(root_path), "status": ROOT_STATUS_FAILED, "log": None, "metrics": None,
+                         "error": f"Ошибка настроек: {e}", "elapsed_s": 0.0})
+            continue
+        jobs.append((root_path, root_settings))
+
+    def failed_worker_result(root_path, error):
+        return {"root": str(root_path), "status": ROOT_STATUS_FAILED, "log": None, "metrics": None,
+                "error": f"Процесс обработки завершился аварийно: {error}", "elapsed_s": None}
+
+    broken_jobs = []
+    if jobs:
+        with _new_batch_pool(max(1, min(workers, len(jobs))), as_owner) as pool:
+            futures = {pool.submit(organize_root_logic, root_path, root_settings, log_dir, dry_run, as_owner): (root_path, root_settings)
+                       for root_path, root_settings in jobs}
+            for future in as_completed(futures):
+                try:
+                    finish_root(future.result())
+                except BrokenProcessPool:
+                    broken_jobs.append(futures[future])
+                except Exception as e:
+                    finish_root(failed_worker_result(futures[future][0], e))
+
+    # A worker that dies (killed, out of memory) breaks the pool and fails every root still pending in it.
+    # Those roots run again one per fresh process, so only the root that kills its process is reported as failed.
+    for root_path, root_settings in broken_jobs:
+        with _new_batch_pool(1, as_owner) as pool:
+            future = pool.submit(organize_root_logic, root_path, root_settings, log_dir, dry_run, as_owner)
+            try:
+                finish_root(future.result())
+            except Exception as e:
+                finish_root(failed_worker_result(root_path, e))
+
+    totals = {"moves": 0, "bytes_moved": 0, "errors": 0, "warnings": 0, "items_scanned": 0}
+    for result in results:
+        for counter_name in totals:
+            totals[counter_name] += (result["metrics"] or {}).get(counter_name, 0)
+    failed_roots = [result["root"] for result in results if result["status"] != ROOT_STATUS_OK]
+    summary = {
+        "roots": len(results),
+        "ok": len(results) - len(failed_roots),
+        "failed": len(failed_roots),
+        "failed_roots": failed_roots,
+        "workers": workers,
+        "dry_run": dry_run,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    summary.update(totals)
+    return summary
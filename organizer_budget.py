@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+RUN_CURSOR_FILENAME = ".organizer_run_cursor.json"
+RUN_CURSOR_FORMAT_VERSION = 1
+
+STOP_CANCELLED = "cancelled"
+STOP_MAX_SECONDS = "max_seconds"
+STOP_MAX_ITEMS = "max_items"
+
+STOP_REASON_NAMES = {
+    STOP_CANCELLED: "отменён пользователем",
+    STOP_MAX_SECONDS: "исчерпан лимит времени",
+    STOP_MAX_ITEMS: "исчерпан лимит элементов",
+}
+
+
+class RunBudget:
+    # Cooperative stop of an organize run: a cancel event (Cancel button, SIGINT/SIGTERM) and optional limits.
+    # max_seconds bounds the wall time of the whole run, max_items the number of planned moves; 0 means no limit.
+    # Work checks the budget between items, so a stop never interrupts a move halfway.
+    def __init__(self, cancel_event=None, max_seconds=0, max_items=0):
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.max_seconds = max_seconds or 0
+        self.max_items = max_items or 0
+        self.items_taken = 0
+        self.stop_reason = None
+        self._deadline = time.monotonic() + self.max_seconds if self.max_seconds else None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def take_item(self):
+        with self._lock:
+            self.items_taken += 1
+
+    def release_item(self):
+        # Gives back an item taken for work that turned out to need no move (a folder that is not old after all).
+        with self._lock:
+            self.items_taken -= 1
+
+    def check(self):
+        # Reason to stop right now (cancelled, out of time) or None; items already planned may still be moved.
+        if self.stop_reason in (STOP_CANCELLED, STOP_MAX_SECONDS):
+            return self.stop_reason
+        if self.cancel_event.is_set():
+            self.stop_reason = STOP_CANCELLED
+        elif self._deadline is not None and time.monotonic() >= self._deadline:
+            self.stop_reason = STOP_MAX_SECONDS
+        else:
+            return None
+        return self.stop_reason
+
+    def check_planning(self):
+        # Like check(), but also stops planning once max_items moves are planned.
+        reason = self.check()
+        if reason is None and self.max_items and self.items_taken >= self.max_items:
+            self.stop_reason = reason = STOP_MAX_ITEMS
+        return reason
+
+
+class RunCursor:
+    # Where a stopped run left off. resume_from is the first key the next run must look at again:
+    # the earliest item that was started but not finished, or the item planning stopped at.
+    # Without a cursor_path (dry runs) it only tracks the run in memory and save() writes nothing.
+    def __init__(self, cursor_path, downloads_path, resume_from=None):
+        self.cursor_path = Path(cursor_path) if cursor_path is not None else None
+        self.downloads_path = Path(downloads_path)
+        self.resume_from = resume_from
+        self._stop_key = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, cursor_path, downloads_path):
+        try:
+            with open(cursor_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != RUN_CURSOR_FORMAT_VERSION:
+                return cls(cursor_path, downloads_path)
+            stage, folder_name, name = data["resume_from"]
+            return cls(cursor_path, downloads_path, (int(stage), str(folder_name), str(name)))
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(cursor_path, downloads_path)
+
+    def key_for(self, item_path):
+        # Runs walk the top level of Downloads, then every category folder, both in name order; keys order
+        # items the same way, so "everything before the key is done" describes how far a run got.
+        if item_path.parent == self.downloads_path:
+            return (0, "", item_path.name)
+        return (1, item_path.parent.name, item_path.name)
+
+    def should_skip(self, key):
+        return self.resume_from is not None and key < self.resume_from
+
+    def begin(self, key):
+        with self._lock:
+            self._pending.add(key)
+
+    def done(self, key):
+        with self._lock:
+            self._pending.discard(key)
+
+    def stop_at(self, key):
+        with self._lock:
+            if self._stop_key is None or key < self._stop_key:
+                self._stop_key = key
+
+    def next_resume_key(self):
+        with self._lock:
+            keys = set(self._pending)
+            if self._stop_key is not None:
+                keys.add(self._stop_key)
+        return min(keys) if keys else None
+
+    def save(self):
+        # Writes the cursor if the run stopped early, removes it once a run got through everything.
+        resume_key = self.next_resume_key()
+        if self.cursor_path is None:
+            return resume_key
+        if resume_key is None:
+            try:
+                os.unlink(self.cursor_path)
+            except FileNotFoundError:
+                pass
+            return None
+        self.cursor_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cursor_path.with_name(self.cursor_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": RUN_CURSOR_FORMAT_VERSION, "resume_from": list(resume_key), "saved_at": round(time.time(), 3)},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.cursor_path)
+        return resume_key
@@ -0,0 +1,448 @@
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+from organizer_logic import (
+    DEFAULT_SETTINGS, ARCHIVE_LAYOUTS, load_settings_logic, get_downloads_path_logic, get_classification_rules_logic,
+    run_organization_logic, perform_rollback_logic, list_quarantine_logic, purge_quarantine_logic, restore_quarantine_items_logic,
+    execute_plan_logic, save_plan_logic, load_plan_logic, open_run_journal_logic, get_journal_path_logic,
+    new_volume_archiver_logic, get_volume_index_logic, migrate_archive_layout_logic, new_run_budget_logic,
+    build_reclaim_report_logic, purge_reclaim_entries_logic, RECLAIM_KINDS, RECLAIM_PURGEABLE_KINDS, RECLAIM_SORT_KEYS,
+)
+from organizer_volumes import extract_volume_item_logic
+from organizer_journal import read_journal_runs_logic
+from organizer_metrics import RunMetrics
+
+EXIT_OK = 0
+EXIT_ERRORS = 1
+EXIT_CONFIG_ERROR = 2
+
+
+class JsonLinesReporter:
+    def __init__(self, command, stream=None):
+        self.command = command
+        self.stream = stream if stream is not None else sys.stdout
+        self.started_at = time.time()
+        self.action_count = 0
+        self.error_count = 0
+        self.stream_flush_each_line = False
+
+    def emit(self, event, **fields):
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if self.stream_flush_each_line:
+            self.stream.flush()
+
+    def log_action(self, action_type, item_path_obj_or_name, destination_parent_path_obj=None, reason=""):
+        is_error = action_type.startswith("ОШИБКА") or action_type.startswith("КРИТИЧЕСКАЯ ОШИБКА")
+        self.action_count += 1
+        if is_error:
+            self.error_count += 1
+        self.emit(
+            "action",
+            action=action_type,
+            item=item_path_obj_or_name.name if isinstance(item_path_obj_or_name, Path) else str(item_path_obj_or_name),
+            path=str(item_path_obj_or_name) if isinstance(item_path_obj_or_name, Path) else None,
+            destination=str(destination_parent_path_obj) if destination_parent_path_obj else None,
+            reason=reason,
+            error=is_error,
+        )
+
+    def finish(self, **fields):
+        self.emit(
+            "summary",
+            command=self.command,
+            actions=self.action_count,
+            errors=self.error_count,
+            elapsed_s=round(time.time() - self.started_at, 3),
+            **fields,
+        )
+        self.stream.flush()
+        return EXIT_ERRORS if self.error_count else EXIT_OK
+
+
+def load_cli_settings(config_path):
+    if config_path is None:
+        return DEFAULT_SETTINGS.copy()
+    settings = load_settings_logic(config_path)
+    get_classification_rules_logic(settings)
+    return settings
+
+
+def report_metrics(reporter, args, metrics):
+    metrics.finish()
+    reporter.emit("metrics", **metrics.to_dict())
+    if args.metrics_path:
+        metrics.save(args.metrics_path)
+
+
+def set_stop_signal_handlers(stop_event):
+    for signal_name in ("SIGINT", "SIGTERM"):
+        if hasattr(signal, signal_name):
+            signal.signal(getattr(signal, signal_name), lambda signum, frame: stop_event.set())
+
+
+def cmd_organize(settings, reporter, args):
+    if args.max_seconds is not None:
+        settings["max_seconds"] = args.max_seconds
+    if args.max_items is not None:
+        settings["max_items"] = args.max_items
+    # SIGINT/SIGTERM finish the current move and stop; the next run resumes where this one left off.
+    budget = new_run_budget_logic(settings)
+    set_stop_signal_handlers(budget.cancel_event)
+    metrics = RunMetrics("dry_run" if args.dry_run else "organize")
+    if args.stream:
+        return cmd_organize_streaming(settings, reporter, args, metrics, budget)
+    plan = run_organization_logic(settings, reporter.log_action, dry_run=args.dry_run, metrics=metrics, budget=budget)
+    report_metrics(reporter, args, metrics)
+    if plan is None:
+        return reporter.finish(downloads=str(get_downloads_path_logic(settings)))
+
+    if args.dry_run:
+        for plan_item in plan:
+            reporter.emit("plan_item", source=str(plan_item.source), destination=str(plan_item.destination),
+                          action=plan_item.action, reason=plan_item.reason)
+    if args.save_plan:
+        save_plan_logic(plan, args.save_plan)
+    return reporter.finish(downloads=str(get_downloads_path_logic(settings)), planned=len(plan), dry_run=args.dry_run,
+                           stopped=metrics.stop_reason)
+
+
+def cmd_organize_streaming(settings, reporter, args, metrics, budget):
+    from organizer_stream import run_organization_streaming_logic
+
+    if args.save_plan:
+        reporter.emit("error", message="--save-plan нельзя совместить с --stream: план не хранится целиком.")
+        return EXIT_CONFIG_ERROR
+    planned_count = run_organization_streaming_logic(settings, reporter.log_action, dry_run=args.dry_run, metrics=metrics, budget=budget)
+    report_metrics(reporter, args, metrics)
+    if planned_count is None:
+        return reporter.finish(downloads=str(get_downloads_path_logic(settings)))
+    return reporter.finish(downloads=str(get_downloads_path_logic(settings)), planned=planned_count, dry_run=args.dry_run,
+                           stopped=metrics.stop_reason, stream=True)
+
+
+def cmd_apply_plan(settings, reporter, args):
+    plan = load_plan_logic(args.plan_path)
+    metrics = RunMetrics("apply_plan")
+    with open_run_journal_logic(settings) as journal:
+        metrics.run_id = journal.run_id
+        log_callback = metrics.wrap_log_callback(reporter.log_action)
+        archiver = new_volume_archiver_logic(settings, log_callback, journal, metrics)
+        try:
+            execute_plan_logic(plan, log_callback, journal=journal, metrics=metrics,
+                               verify_copy=settings.get("verify_copies", False), archiver=archiver)
+        finally:
+            if archiver is not None:
+                archiver.close()
+    report_metrics(reporter, args, metrics)
+    return reporter.finish(planned=len(plan))
+
+
+def cmd_rollback(settings, reporter, args):
+    metrics = RunMetrics("rollback")
+    reverted_run_ids = perform_rollback_logic(settings, reporter.log_action, run_id=args.run_id, up_to_run_id=args.up_to_run_id,
+                                              all_runs=args.all_runs, full_reset=args.full, metrics=metrics)
+    report_metrics(reporter, args, metrics)
+    return reporter.finish(downloads=str(get_downloads_path_logic(settings)), reverted_runs=reverted_run_ids)
+
+
+def cmd_history(settings, reporter, args):
+    runs = read_journal_runs_logic(get_journal_path_logic(settings), include_reverted=True)
+    reverted_run_ids = set(runs) - set(read_journal_runs_logic(get_journal_path_logic(settings)))
+    for run_id, run in runs.items():
+        reporter.emit("run", run_id=run_id, started=run["started"], finished=run["finished"],
+                      moves=len(run["moves"]), reverted=run_id in reverted_run_ids)
+    return reporter.finish(runs=len(runs))
+
+
+def cmd_quarantine_list(settings, reporter, args):
+    entries = list_quarantine_logic(settings)
+    for entry in entries:
+        reporter.emit("quarantine_item", name=entry.path.name, path=str(entry.path), reason=entry.reason, mtime=entry.mtime,
+                      original=str(entry.original_path) if entry.original_path else None, quarantined_at=entry.quarantined_at)
+    return reporter.finish(items=len(entries))
+
+
+def cmd_quarantine_purge(settings, reporter, args):
+    if not (args.all or args.older_than is not None or args.names):
+        reporter.emit("error", message="Укажите --all, --older-than или --name.")
+        return EXIT_CONFIG_ERROR
+    deleted_count = purge_quarantine_logic(
+        settings, reporter.log_action,
+        older_than_days=args.older_than,
+        names=set(args.names) if args.names else None,
+    )
+    return reporter.finish(deleted=deleted_count)
+
+
+def cmd_quarantine_restore(settings, reporter, args):
+    if not (args.all or args.names):
+        reporter.emit("error", message="Укажите --all или --name.")
+        return EXIT_CONFIG_ERROR
+    item_paths = [entry.path for entry in list_quarantine_logic(settings) if args.all or entry.path.name in args.names]
+    result = restore_quarantine_items_logic(settings, item_paths, reporter.log_action)
+    return reporter.finish(restored=result.done, failed=len(result.errors))
+
+
+def cmd_archive_list(settings, reporter, args):
+    volume_index = get_volume_index_logic(settings).load()
+    records = sorted(volume_index.records(), key=lambda record: (record.volume, record.key))
+    for record in records:
+        reporter.emit("archive_item", item=record.key, volume=record.volume, original=str(volume_index.original_path(record)),
+                      size=record.size, members=len(record.members), archived_at=record.archived_at, reason=record.reason)
+    return reporter.finish(items=len(records), volumes=len({record.volume for record in records}))
+
+
+def cmd_archive_extract(settings, reporter, args):
+    # Copies items out of their volumes; the volumes and the index stay as they are.
+    volume_index = get_volume_index_logic(settings).load()
+    extracted_count = 0
+    for key in args.items:
+        record = volume_index.get(key)
+        if record is None:
+            reporter.log_action("ОШИБКА РАСПАКОВКИ", key, reason="Элемент не найден в индексе томов.")
+            continue
+        target_path = args.target_dir / Path(record.original).name
+        try:
+            args.target_dir.mkdir(parents=True, exist_ok=True)
+            extract_volume_item_logic(volume_index, record, target_path)
+        except Exception as e:
+            reporter.log_action("ОШИБКА РАСПАКОВКИ", key, reason=f"{e}")
+            continue
+        extracted_count += 1
+        reporter.log_action("РАСПАКОВКА", target_path, args.target_dir, record.volume)
+    return reporter.finish(extracted=extracted_count)
+
+
+def cmd_archive_migrate_layout(settings, reporter, args):
+    if args.layout:
+        settings["archive_layout"] = args.layout
+    metrics = RunMetrics("migrate_archive")
+    moved_count = migrate_archive_layout_logic(settings, reporter.log_action, metrics)
+    report_metrics(reporter, args, metrics)
+    return reporter.finish(layout=settings.get("archive_layout"), moved=moved_count)
+
+
+def cmd_reclaim_report(settings, reporter, args):
+    entries = build_reclaim_report_logic(settings, tuple(args.kinds) or RECLAIM_KINDS, args.sort, rescan=args.rescan)
+    for entry in entries[:args.top] if args.top else entries:
+        reporter.emit("reclaim_entry", kind=entry.kind, path=str(entry.path), bytes=entry.bytes, files=entry.files,
+                      newest_mtime=entry.newest_mtime, purgeable=entry.kind in RECLAIM_PURGEABLE_KINDS)
+    return reporter.finish(entries=len(entries),
+                           reclaimable_bytes=sum(entry.bytes for entry in entries if entry.kind in RECLAIM_PURGEABLE_KINDS))
+
+
+def cmd_reclaim_purge(settings, reporter, args):
+    if args.top <= 0:
+        reporter.emit("error", message="Укажите --top N больше нуля.")
+        return EXIT_CONFIG_ERROR
+    entries = build_reclaim_report_logic(settings, tuple(args.kinds) or RECLAIM_PURGEABLE_KINDS, args.sort)
+    entries = [entry for entry in entries if entry.kind in RECLAIM_PURGEABLE_KINDS][:args.top]
+    result = purge_reclaim_entries_logic(settings, entries, reporter.log_action)
+    return reporter.finish(purged_entries=len(entries), deleted=result.done, failed=len(result.errors),
+                           purged_bytes=sum(entry.bytes for entry in entries))
+
+
+def cmd_batch(settings, reporter, args):
+    from organizer_batch import DEFAULT_BATCH_WORKERS, load_batch_config_logic, expand_batch_roots_logic, run_batch_organization_logic
+
+    batch_config = load_batch_config_logic(args.batch_config) if args.batch_config else {}
+    settings.update(batch_config.get("defaults", {}))
+    roots = expand_batch_roots_logic(batch_config.get("roots", []) + args.roots)
+    if not roots:
+        reporter.emit("error", message="Не найдено ни одной папки: укажите --root или roots в --batch-config.")
+        return EXIT_CONFIG_ERROR
+
+    workers = args.workers or batch_config.get("workers", DEFAULT_BATCH_WORKERS)
+    as_owner = args.as_owner or batch_config.get("as_owner", False)
+    reporter.stream_flush_each_line = True
+
+    def report_root(result):
+        reporter.emit("root", **result)
+        if result["metrics"]:
+            reporter.error_count += result["metrics"]["errors"]
+        if result["status"] != "ok":
+            reporter.error_count += 1
+
+    summary = run_batch_organization_logic(settings, roots, workers=workers, log_dir=args.log_dir, dry_run=args.dry_run,
+                                           as_owner=as_owner, result_callback=report_root)
+    # "errors" and "elapsed_s" of the summary line are the reporter's own: failed roots plus file errors, and wall time.
+    summary.pop("elapsed_s")
+    summary["file_errors"] = summary.pop("errors")
+    return reporter.finish(**summary)
+
+
+def cmd_watch(settings, reporter, args):
+    from organizer_watch import watch_downloads_logic
+
+    stop_event = threading.Event()
+    set_stop_signal_handlers(stop_event)
+    reporter.stream_flush_each_line = True
+    processed_count = watch_downloads_logic(settings, reporter.log_action, stop_event, debounce_seconds=args.debounce,
+                                            poll_interval=args.interval, force_polling=args.polling)
+    return reporter.finish(processed=processed_count)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", type=Path, default=None,
+                        help="Путь к organizer_config.json (по умолчанию — встроенные настройки).")
+    metrics_option = argparse.ArgumentParser(add_help=False)
+    metrics_option.add_argument("--metrics", dest="metrics_path", type=Path, default=None, metavar="PATH",
+                                help="Сохранить метрики запуска (этапы, время, перемещения, байты, ошибки) в JSON-файл.")
+
+    parser = argparse.ArgumentParser(prog="organizer_cli", description="Органайзер Загрузок без графического интерфейса.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    organize_parser = subparsers.add_parser("organize", parents=[common, metrics_option], help="Запустить организацию папки Загрузок.")
+    organize_parser.add_argument("--dry-run", action="store_true",
+                                 help="Только построить план перемещений, ничего не перемещая.")
+    organize_parser.add_argument("--save-plan", type=Path, default=None, metavar="PATH",
+                                 help="Сохранить план перемещений в JSON-файл.")
+    organize_parser.add_argument("--max-seconds", type=float, default=None, metavar="SECONDS",
+                                 help="Остановиться после указанного времени; следующий запуск продолжит с того же места.")
+    organize_parser.add_argument("--max-items", type=int, default=None, metavar="N",
+                                 help="Запланировать не больше N перемещений; следующий запуск продолжит с того же места.")
+    organize_parser.add_argument("--stream", action="store_true",
+                                 help="Потоковый режим для очень больших папок: память не растёт с числом файлов "
+                                      "(без поиска дубликатов по содержимому).")
+    organize_parser.set_defaults(handler=cmd_organize)
+
+    apply_plan_parser = subparsers.add_parser("apply-plan", parents=[common, metrics_option], help="Выполнить сохранённый план перемещений.")
+    apply_plan_parser.add_argument("plan_path", type=Path, metavar="PLAN")
+    apply_plan_parser.set_defaults(handler=cmd_apply_plan)
+
+    rollback_parser = subparsers.add_parser("rollback", parents=[common, metrics_option], help="Сбросить организацию.")
+    rollback_scope = rollback_parser.add_mutually_exclusive_group()
+    rollback_scope.add_argument("--run", dest="run_id", default=None, metavar="RUN_ID",
+                                help="Откатить только указанный запуск.")
+    rollback_scope.add_argument("--up-to", dest="up_to_run_id", default=None, metavar="RUN_ID",
+                                help="Откатить все запуски, начиная с указанного и до последнего.")
+    rollback_scope.add_argument("--all-runs", action="store_true", help="Откатить все запуски из журнала.")
+    rollback_scope.add_argument("--full", action="store_true",
+                                help="Старый режим: вернуть в Загрузки всё содержимое карантина, архива и категорий.")
+    rollback_parser.set_defaults(handler=cmd_rollback)
+
+    history_parser = subparsers.add_parser("history", parents=[common], help="Показать запуски из журнала перемещений.")
+    history_parser.set_defaults(handler=cmd_history)
+
+    batch_parser = subparsers.add_parser("batch", parents=[common],
+                                         help="Организовать несколько папок Загрузок параллельно в отдельных процессах.")
+    batch_parser.add_argument("--root", dest="roots", action="append", default=[], metavar="PATH_OR_GLOB",
+                              help="Папка Загрузок или шаблон, например '/home/*/Downloads' (можно повторять).")
+    batch_parser.add_argument("--batch-config", type=Path, default=None, metavar="PATH",
+                              help="JSON с ключами roots, defaults, workers и as_owner; у каждой папки могут быть свои settings.")
+    batch_parser.add_argument("--workers", type=int, default=None, help="Число процессов (по умолчанию 4).")
+    batch_parser.add_argument("--log-dir", type=Path, default=None, metavar="DIR",
+                              help="Куда писать логи и метрики папок (по умолчанию — в папку архива каждой из них).")
+    batch_parser.add_argument("--as-owner", action="store_true",
+                              help="При запуске от root обрабатывать каждую папку от имени её владельца.")
+    batch_parser.add_argument("--dry-run", action="store_true", help="Только построить планы, ничего не перемещая.")
+    batch_parser.set_defaults(handler=cmd_batch)
+
+    watch_parser = subparsers.add_parser("watch", parents=[common], help="Следить за папкой Загрузок и сразу раскладывать новые файлы.")
+    watch_parser.add_argument("--debounce", type=float, default=2.0, metavar="SECONDS",
+                              help="Сколько секунд файл должен оставаться без изменений перед обработкой.")
+    watch_parser.add_argument("--interval", type=float, default=5.0, metavar="SECONDS",
+                              help="Интервал опроса, если inotify недоступен.")
+    watch_parser.add_argument("--polling", action="store_true", help="Всегда использовать опрос вместо inotify.")
+    watch_parser.set_defaults(handler=cmd_watch)
+
+    quarantine_parser = subparsers.add_parser("quarantine", help="Работа с карантином.")
+    quarantine_subparsers = quarantine_parser.add_subparsers(dest="quarantine_command", required=True)
+
+    q_list_parser = quarantine_subparsers.add_parser("list", parents=[common], help="Показать содержимое карантина.")
+    q_list_parser.set_defaults(handler=cmd_quarantine_list)
+
+    q_purge_parser = quarantine_subparsers.add_parser("purge", parents=[common], help="Удалить элементы карантина.")
+    q_purge_parser.add_argument("--all", action="store_true", help="Удалить всё содержимое карантина.")
+    q_purge_parser.add_argument("--older-than", type=int, default=None, metavar="DAYS",
+                                help="Удалить только элементы, помещённые в карантин больше указанного числа дней назад.")
+    q_purge_parser.add_argument("--name", dest="names", action="append", default=[],
+                                help="Удалить элемент с этим именем (можно повторять).")
+    q_purge_parser.set_defaults(handler=cmd_quarantine_purge)
+
+    q_restore_parser = quarantine_subparsers.add_parser("restore", parents=[common],
+                                                        help="Вернуть элементы карантина туда, откуда они были перемещены.")
+    q_restore_parser.add_argument("--all", action="store_true", help="Вернуть всё содержимое карантина.")
+    q_restore_parser.add_argument("--name", dest="names", action="append", default=[],
+                                  help="Вернуть элемент с этим именем (можно повторять).")
+    q_restore_parser.set_defaults(handler=cmd_quarantine_restore)
+
+    archive_parser = subparsers.add_parser("archive", help="Работа со сжатыми томами архива.")
+    archive_subparsers = archive_parser.add_subparsers(dest="archive_command", required=True)
+
+    a_list_parser = archive_subparsers.add_parser("list", parents=[common], help="Показать элементы, упакованные в тома.")
+    a_list_parser.set_defaults(handler=cmd_archive_list)
+
+    a_extract_parser = archive_subparsers.add_parser("extract", parents=[common],
+                                                     help="Распаковать отдельные элементы, не трогая остальное содержимое тома.")
+    a_extract_parser.add_argument("--item", dest="items", action="append", required=True, metavar="KEY",
+                                  help="Ключ элемента из 'archive list' (можно повторять).")
+    a_extract_parser.add_argument("--to", dest="target_dir", type=Path, required=True, metavar="DIR",
+                                  help="Папка, куда распаковать.")
+    a_extract_parser.set_defaults(handler=cmd_archive_extract)
+
+    a_migrate_parser = archive_subparsers.add_parser("migrate-layout", parents=[common, metrics_option],
+                                                     help="Разложить старые плоские папки архива по подпапкам года и месяца.")
+    a_migrate_parser.add_argument("--layout", choices=ARCHIVE_LAYOUTS, default=None,
+                                  help="Раскладка (по умолчанию — archive_layout из конфига).")
+    a_migrate_parser.set_defaults(handler=cmd_archive_migrate_layout)
+
+    reclaim_parser = subparsers.add_parser("reclaim", help="Сколько места можно освободить и удаление самого крупного.")
+    reclaim_subparsers = reclaim_parser.add_subparsers(dest="reclaim_command", required=True)
+
+    r_report_parser = reclaim_subparsers.add_parser("report", parents=[common],
+                                                    help="Элементы карантина, папки архива и категории по размеру или возрасту.")
+    r_report_parser.add_argument("--kind", dest="kinds", action="append", choices=RECLAIM_KINDS, default=[],
+                                 help="Только строки этого вида (можно повторять).")
+    r_report_parser.add_argument("--sort", choices=RECLAIM_SORT_KEYS, default="bytes",
+                                 help="bytes — сначала самые большие, age — сначала самые старые.")
+    r_report_parser.add_argument("--top", type=int, default=0, metavar="N", help="Показать только первые N строк.")
+    r_report_parser.add_argument("--rescan", action="store_true", help="Пересчитать размеры заново, не доверяя индексу.")
+    r_report_parser.set_defaults(handler=cmd_reclaim_report)
+
+    r_purge_parser = reclaim_subparsers.add_parser("purge", parents=[common],
+                                                   help="Удалить первые N строк отчёта (только карантин и архив).")
+    r_purge_parser.add_argument("--top", type=int, required=True, metavar="N", help="Сколько строк удалить.")
+    r_purge_parser.add_argument("--kind", dest="kinds", action="append", choices=RECLAIM_PURGEABLE_KINDS, default=[],
+                                help="Только строки этого вида (можно повторять).")
+    r_purge_parser.add_argument("--sort", choices=RECLAIM_SORT_KEYS, default="bytes",
+                                help="bytes — удалить самые большие, age — самые старые.")
+    r_purge_parser.set_defaults(handler=cmd_reclaim_purge)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args.command
+    if args.command == "quarantine":
+        command = f"quarantine {args.quarantine_command}"
+    elif args.command == "archive":
+        command = f"archive {args.archive_command}"
+    elif args.command == "reclaim":
+        command = f"reclaim {args.reclaim_command}"
+    reporter = JsonLinesReporter(command)
+
+    try:
+        settings = load_cli_settings(args.config)
+    except Exception as e:
+        reporter.emit("error", message=f"Ошибка загрузки конфига: {e}", config=str(args.config))
+        return EXIT_CONFIG_ERROR
+
+    try:
+        return args.handler(settings, reporter, args)
+    except Exception as e:
+        reporter.log_action("КРИТИЧЕСКАЯ ОШИБКА", "", reason=f"Ошибка: {e}")
+        return reporter.finish()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
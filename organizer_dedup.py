@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+HASH_CACHE_FILENAME = ".organizer_hash_cache.json"
+PARTIAL_HASH_CHUNK = 64 * 1024
+FULL_HASH_CHUNK = 1024 * 1024
+
+
+def hash_cache_key(entry):
+    return f"{entry.dev}:{entry.inode}:{entry.size}:{entry.mtime!r}"
+
+
+class HashCache:
+    def __init__(self, cache_path):
+        self.cache_path = Path(cache_path)
+        self._hashes = {}
+        self._used_keys = set()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self._hashes = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._hashes = {}
+        return self
+
+    def save(self, prune_unused=True):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        used_hashes = self._hashes
+        if prune_unused:
+            used_hashes = {key: value for key, value in self._hashes.items() if key in self._used_keys}
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(used_hashes, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def get(self, entry, kind):
+        key = hash_cache_key(entry)
+        self._used_keys.add(key)
+        value = self._hashes.get(key, {}).get(kind)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def keep(self, entries):
+        # Marks entries as in use without looking them up, so save() keeps their values.
+        self._used_keys.update(hash_cache_key(entry) for entry in entries)
+
+    def put(self, entry, kind, value):
+        key = hash_cache_key(entry)
+        self._used_keys.add(key)
+        self._hashes.setdefault(key, {})[kind] = value
+
+
+def partial_hash_logic(file_path, size):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        digest.update(f.read(PARTIAL_HASH_CHUNK))
+        if size > 2 * PARTIAL_HASH_CHUNK:
+            f.seek(size - PARTIAL_HASH_CHUNK)
+            digest.update(f.read(PARTIAL_HASH_CHUNK))
+        elif size > PARTIAL_HASH_CHUNK:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def full_hash_logic(file_path):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(FULL_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cached_hashes(candidates, hash_cache, kind, hash_function, hash_threads, log_callback, budget=None):
+    hashes = {}
+    to_compute = []
+    for file_path, entry in candidates:
+        cached = hash_cache.get(entry, kind)
+        if cached is not None:
+            hashes[file_path] = cached
+        else:
+            to_compute.append((file_path, entry))
+
+    def compute(candidate):
+        # Once the run is stopped the remaining files are not read; what was hashed so far stays in the cache.
+        file_path, entry = candidate
+        if budget is not None and budget.check_planning() is not None:
+            return candidate, None
+        try:
+            return candidate, hash_function(file_path, entry)
+        except OSError as e:
+            log_callback("ОШИБКА ХЕШИРОВАНИЯ", file_path.name, reason=f"{e}")
+            return candidate, None
+
+    with ThreadPoolExecutor(max_workers=max(1, hash_threads)) as pool:
+        for (file_path, entry), value in pool.map(compute, to_compute):
+            if value is not None:
+                hash_cache.put(entry, kind, value)
+                hashes[file_path] = value
+    return hashes
+
+
+def _group_by(candidates, hashes):
+    groups = defaultdict(list)
+    for file_path, entry in candidates:
+        if file_path in hashes:
+            groups[hashes[file_path]].append((file_path, entry))
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_content_duplicates_logic(candidates, hash_cache, log_callback, hash_threads=1, preferred_originals=(), budget=None):
+    by_size = defaultdict(list)
+    for file_path, entry in candidates:
+        if entry.size > 0:
+            by_size[entry.size].append((file_path, entry))
+    size_groups = [group for group in by_size.values() if len(group) > 1]
+
+    partial_candidates = [candidate for group in size_groups for candidate in group]
+    partial_hashes = _cached_hashes(partial_candidates, hash_cache, "p",
+                                    lambda file_path, entry: partial_hash_logic(file_path, entry.size),
+                                    hash_threads, log_callback, budget)
+
+    duplicate_groups = []
+    full_candidates = []
+    for group in _group_by(partial_candidates, partial_hashes):
+        if group[0][1].size <= 2 * PARTIAL_HASH_CHUNK:
+            duplicate_groups.append(group)
+        else:
+            full_candidates.extend(group)
+
+    full_hashes = _cached_hashes(full_candidates, hash_cache, "f",
+                                 lambda file_path, entry: full_hash_logic(file_path),
+                                 hash_threads, log_callback, budget)
+    duplicate_groups.extend(_group_by(full_candidates, full_hashes))
+
+    preferred_originals = set(preferred_originals)
+    duplicates = {}
+    for group in duplicate_groups:
+        group.sort(key=lambda candidate: (candidate[0] not in preferred_originals, candidate[1].mtime,
+                                          len(candidate[0].name), candidate[0].name))
+        original_path = group[0][0]
+        for file_path, entry in group[1:]:
+            duplicates[file_path] = original_path
+    return duplicates
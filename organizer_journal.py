@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+JOURNAL_FILENAME = ".organizer_journal.jsonl"
+JOURNAL_FSYNC_EVERY = 64
+
+
+def new_run_id():
+    return datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+
+
+def relative_or_absolute_path(path, root_path):
+    try:
+        return str(path.relative_to(root_path))
+    except ValueError:
+        return str(path)
+
+
+class MoveJournal:
+    def __init__(self, journal_path, root_path, run_id=None, fsync_every=JOURNAL_FSYNC_EVERY):
+        self.journal_path = Path(journal_path)
+        self.root_path = Path(root_path)
+        self.run_id = run_id or new_run_id()
+        self.fsync_every = max(1, fsync_every)
+        self.move_count = 0
+        self._unsynced = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._observers = []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_observer(self, observer):
+        # Observers get record_move(source, target, action, reason, entry) for every move and close() with the journal.
+        self._observers.append(observer)
+
+    def open(self):
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+        self._write({"r": self.run_id, "e": "start", "t": round(time.time(), 3), "root": str(self.root_path)})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def record_move(self, source_path, target_path, action_type="", reason="", entry=None):
+        with self._lock:
+            if self._file is None:
+                return
+            self.move_count += 1
+            self._write({
+                "r": self.run_id,
+                "s": relative_or_absolute_path(source_path, self.root_path),
+                "d": relative_or_absolute_path(target_path, self.root_path),
+                "a": action_type,
+            })
+            for observer in self._observers:
+                observer.record_move(source_path, target_path, action_type, reason, entry)
+
+    def record_relocation(self, old_path, new_path):
+        # An item that is already archived changed its place (archive layout migration): earlier runs
+        # that moved it to old_path will look for it at new_path on rollback.
+        with self._lock:
+            if self._file is None:
+                return
+            self._write({
+                "r": self.run_id,
+                "e": "relocate",
+                "s": relative_or_absolute_path(old_path, self.root_path),
+                "d": relative_or_absolute_path(new_path, self.root_path),
+            })
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._write({"r": self.run_id, "e": "end", "t": round(time.time(), 3), "n": self.move_count})
+            self._sync()
+            self._file.close()
+            self._file = None
+            for observer in self._observers:
+                observer.close()
+
+
+def read_journal_runs_logic(journal_path, include_reverted=False):
+    runs = OrderedDict()
+    reverted = set()
+    move_by_target = {}
+    if not Path(journal_path).exists():
+        return runs
+
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            run_id = record.get("r")
+            event = record.get("e")
+            if event == "start":
+                runs[run_id] = dict(root=record.get("root", ""), started=record.get("t"), finished=None, moves=[])
+            elif event == "end":
+                if run_id in runs:
+                    runs[run_id]["finished"] = record.get("t")
+            elif event == "reverted":
+                reverted.add(run_id)
+            elif event == "relocate":
+                if run_id in runs:
+                    root_path = Path(runs[run_id]["root"])
+                    old_path, new_path = root_path / record["s"], root_path / record["d"]
+                    located = move_by_target.pop(old_path, None)
+                    if located is not None:
+                        moves, move_index = located
+                        source_path, _, action_type = moves[move_index]
+                        moves[move_index] = (source_path, new_path, action_type)
+                        move_by_target[new_path] = located
+            elif run_id in runs:
+                run = runs[run_id]
+                root_path = Path(run["root"])
+                run["moves"].append((root_path / record["s"], root_path / record["d"], record.get("a", "")))
+                move_by_target[root_path / record["d"]] = (run["moves"], len(run["moves"]) - 1)
+
+    if not include_reverted:
+        for run_id in reverted:
+            runs.pop(run_id, None)
+    return runs
+
+
+def mark_runs_reverted_logic(journal_path, run_ids):
+    with open(journal_path, "a", encoding="utf-8") as f:
+        for run_id in run_ids:
+            f.write(json.dumps({"r": run_id, "e": "reverted", "t": round(time.time(), 3)}, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def select_runs_to_revert_logic(runs, run_id=None, up_to_run_id=None, all_runs=False):
+    run_ids = list(runs)
+    if run_id is not None:
+        run_ids = [run_id] if run_id in runs else []
+    elif up_to_run_id is not None:
+        run_ids = run_ids[run_ids.index(up_to_run_id):] if up_to_run_id in runs else []
+
+    run_ids = [candidate_id for candidate_id in run_ids if runs[candidate_id]["moves"]]
+    if all_runs or run_id is not None or up_to_run_id is not None:
+        return list(reversed(run_ids))
+    return run_ids[-1:]
@@ -0,0 +1,1267 @@
+import json
+import os
+import re
+import shutil
+import stat
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from organizer_scanner import AGE_INDEX_FILENAME, DirectoryScanCache, FolderAgeIndex, ENTRY_FILE, ENTRY_DIR, find_fresh_item_logic, entry_from_stat
+from organizer_move import PARTIAL_COPY_SUFFIX, move_no_replace_logic
+from organizer_rules import WINDOWS_DUPLICATE_STEM_RE, compile_rules_logic
+from organizer_quarantine import QUARANTINE_INDEX_FILENAME, QuarantineIndex, QuarantineEntry
+from organizer_sizes import SIZE_INDEX_FILENAME, FolderSizeIndex
+from organizer_metrics import RunMetrics
+from organizer_budget import RUN_CURSOR_FILENAME, STOP_REASON_NAMES, RunBudget, RunCursor
+from organizer_volumes import (
+    VOLUME_INDEX_FILENAME, VOLUME_FORMAT_TAR_XZ, VolumeArchiver, VolumeIndex, extract_volume_item_logic, forget_volume_items_logic,
+)
+from organizer_journal import (
+    JOURNAL_FILENAME, MoveJournal, new_run_id, read_journal_runs_logic, mark_runs_reverted_logic, select_runs_to_revert_logic,
+)
+
+CONFIG_FILENAME = "organizer_config.json"
+LOG_FILENAME_APP_PREFIX = "Рекомендации_по_очистке_app"
+
+QUARANTINE_DIR_NAME = "_НА ПРОВЕРКУ (потенциальный мусор)"
+QUARANTINE_TRASH_DIR_NAME = ".organizer_trash"
+QUARANTINE_BULK_THREADS = 4
+
+DEFAULT_SETTINGS = {
+    "downloads_dir_name": "Downloads",
+    "archive_dir_name": "Downloads_Archive",
+    "days_older_to_archive": 7,
+    "folders_to_ignore": ["Важные_Проекты_Не_Трогать"],
+    "scan_threads": 4,
+    "move_threads": 2,
+    "content_dedup": True,
+    "content_sniffing": True,
+    "verify_copies": False,
+    "max_seconds": 0,
+    "max_items": 0,
+    "archive_mode": "folders",
+    "archive_layout": "flat",
+    "archive_volume_format": VOLUME_FORMAT_TAR_XZ,
+    "archive_volume_max_mb": 1024,
+    "archive_compress_threads": 4,
+    "custom_categories": {},
+    "custom_junk_extensions": [],
+    "custom_junk_keywords": [],
+}
+
+ARCHIVE_GENERAL_OLD_SUBDIR = "01_Общий_архив_старше_недели"
+ARCHIVE_SPECIFIC_ARCHIVES_OLD_SUBDIR = "02_Архивы_программ_старше_недели"
+ARCHIVED_OLD_FOLDERS_SUBDIR = "04_Архив_Старых_Папок"
+ARCHIVE_VOLUMES_SUBDIR = "05_Сжатые_тома"
+
+ARCHIVE_MODE_FOLDERS = "folders"
+ARCHIVE_MODE_VOLUMES = "volumes"
+
+# Layouts of the archive folders: everything in one folder, <year>/<month>/ by mtime, or <category>/<year>/<month>/.
+ARCHIVE_LAYOUT_FLAT = "flat"
+ARCHIVE_LAYOUT_MONTH = "month"
+ARCHIVE_LAYOUT_CATEGORY_MONTH = "category_month"
+ARCHIVE_LAYOUTS = (ARCHIVE_LAYOUT_FLAT, ARCHIVE_LAYOUT_MONTH, ARCHIVE_LAYOUT_CATEGORY_MONTH)
+ARCHIVE_YEAR_RE = re.compile(r"\d{4}")
+ARCHIVE_MONTH_RE = re.compile(r"0[1-9]|1[0-2]")
+
+JUNK_KEYWORDS = ["старая_версия", "old_version", "backup", "резервная_копия", "temp", "tmpfile"]
+JUNK_EXTENSIONS = [".tmp", ".log", ".bak", "._gstmp", ".crdownload"]
+
+FILE_TYPE_CATEGORIES = {
+    "01_Изображения": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp", ".heic", ".avif", ".tiff", ".tif"],
+    "02_Видео": [".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".wmv", ".mpeg", ".mpg"],
+    "03_Аудио": [".mp3", ".wav", ".aac", ".flac", ".ogg", ".wma", ".m4a"],
+    "04_Документы": [".pdf", ".doc", ".docx", ".txt", ".odt", ".rtf", ".csv", ".xls", ".xlsx", ".ppt", ".pptx", ".epub", ".djvu", ".md"],
+    "05_Архивы_и_образы": [".zip", ".rar", ".tar", ".gz", ".7z", ".bz2", ".iso", ".img", ".dmg"],
+    "06_Программы_и_установщики": [".exe", ".msi", ".bat", ".sh", ".jar", ".apk", ".app"],
+    "07_Шрифты": [".ttf", ".otf", ".woff", ".woff2"],
+    "08_Торренты": [".torrent"],
+    "09_Проекты_и_код": [".py", ".js", ".html", ".css", ".cpp", ".java", ".psd", ".ai", ".fig", ".sketch", ".xd", ".ipynb", ".json", ".xml", ".yml", ".yaml"],
+    "10_Другое": []
+}
+OTHER_CATEGORY_NAME = "10_Другое"
+PROGRAM_ARCHIVE_CATEGORY_NAME = "05_Архивы_и_образы"
+PROGRAM_ARCHIVE_EXTENSIONS = FILE_TYPE_CATEGORIES[PROGRAM_ARCHIVE_CATEGORY_NAME]
+
+DEFAULT_RULES = compile_rules_logic(FILE_TYPE_CATEGORIES, JUNK_EXTENSIONS, JUNK_KEYWORDS, OTHER_CATEGORY_NAME)
+
+PLAN_FORMAT_VERSION = 1
+PlanItem = namedtuple("PlanItem", ["source", "destination", "action", "reason", "entry"])
+BulkResult = namedtuple("BulkResult", ["done", "errors"])
+
+RECLAIM_KIND_QUARANTINE = "quarantine"
+RECLAIM_KIND_ARCHIVE = "archive"
+RECLAIM_KIND_CATEGORY = "category"
+RECLAIM_KINDS = (RECLAIM_KIND_QUARANTINE, RECLAIM_KIND_ARCHIVE, RECLAIM_KIND_CATEGORY)
+RECLAIM_PURGEABLE_KINDS = (RECLAIM_KIND_QUARANTINE, RECLAIM_KIND_ARCHIVE)
+RECLAIM_SORT_KEYS = ("bytes", "age")
+ReclaimEntry = namedtuple("ReclaimEntry", ["kind", "path", "bytes", "files", "newest_mtime", "subfolders"])
+
+ROLLBACK_ACTION_NAMES = {
+    "В КАРАНТИН": "ВОЗВРАТ ИЗ КАРАНТИНА",
+    "В АРХИВ (СТАРЫЙ)": "ВОЗВРАТ ИЗ АРХИВА",
+    "В АРХИВ (СТАРАЯ ПАПКА)": "ВОЗВРАТ ИЗ АРХИВА",
+    "В АРХИВ (ИЗ КАТЕГОРИИ)": "ВОЗВРАТ ИЗ АРХИВА",
+    "СОРТИРОВКА": "ВОЗВРАТ ИЗ КАТЕГОРИИ",
+}
+
+
+def load_settings_logic(config_path):
+    settings = DEFAULT_SETTINGS.copy()
+    with open(config_path, 'r', encoding='utf-8') as f:
+        settings.update(json.load(f))
+    return settings
+
+def save_settings_logic(settings, config_path):
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=4, ensure_ascii=False)
+
+def get_downloads_path_logic(settings):
+    return Path.home() / settings.get("downloads_dir_name", "Downloads")
+
+def get_journal_path_logic(settings):
+    return get_downloads_path_logic(settings) / settings["archive_dir_name"] / JOURNAL_FILENAME
+
+def get_quarantine_index_logic(settings):
+    downloads_path = get_downloads_path_logic(settings)
+    return QuarantineIndex(downloads_path / settings["archive_dir_name"] / QUARANTINE_INDEX_FILENAME,
+                           downloads_path / QUARANTINE_DIR_NAME, downloads_path)
+
+def get_volume_index_logic(settings):
+    downloads_path = get_downloads_path_logic(settings)
+    archive_base_path = downloads_path / settings["archive_dir_name"]
+    return VolumeIndex(archive_base_path / VOLUME_INDEX_FILENAME, archive_base_path / ARCHIVE_VOLUMES_SUBDIR, downloads_path)
+
+def get_size_index_logic(settings):
+    return FolderSizeIndex(get_downloads_path_logic(settings) / settings["archive_dir_name"] / SIZE_INDEX_FILENAME)
+
+def get_run_cursor_path_logic(settings):
+    return get_downloads_path_logic(settings) / settings["archive_dir_name"] / RUN_CURSOR_FILENAME
+
+def new_run_budget_logic(settings, cancel_event=None):
+    return RunBudget(cancel_event, settings.get("max_seconds", 0), settings.get("max_items", 0))
+
+def compact_quarantine_index_logic(settings):
+    # Called where this process holds no open handle on the index (start of a run, end of a purge); other
+    # processes that have it open keep the compaction off through the index lock.
+    try:
+        get_quarantine_index_logic(settings).compact_if_needed()
+    except OSError:
+        pass
+
+def open_run_journal_logic(settings):
+    compact_quarantine_index_logic(settings)
+    journal = MoveJournal(get_journal_path_logic(settings), get_downloads_path_logic(settings))
+    journal.add_observer(get_quarantine_index_logic(settings))
+    journal.add_observer(get_size_index_logic(settings).load())
+    journal.open()
+    return journal
+
+def get_classification_rules_logic(settings):
+    return compile_rules_logic(FILE_TYPE_CATEGORIES, JUNK_EXTENSIONS, JUNK_KEYWORDS, OTHER_CATEGORY_NAME, settings)
+
+def get_junk_reason_logic(file_path, rules=None, sibling_names=None):
+    rules = rules or DEFAULT_RULES
+    filename = file_path.name
+
+    junk_extension = rules.junk_extension(filename)
+    if junk_extension:
+        return f"Расширение ({junk_extension})"
+
+    keyword_found = rules.junk_keyword(filename)
+    if keyword_found:
+        return f"Ключевое слово ('{keyword_found}')"
+
+    if is_windows_duplicate_name_logic(filename):
+        try:
+            base_name_match = WINDOWS_DUPLICATE_STEM_RE.match(file_path.stem)
+            if base_name_match:
+                base_name = base_name_match.group(1) + file_path.suffix
+                if (base_name in sibling_names) if sibling_names is not None else (file_path.parent / base_name).exists():
+                    return "Дубликат Windows"
+                else:
+                    return "Возможный дубликат (оригинал не найден)"
+        except (AttributeError, IndexError):
+             return "Дубликат Windows (ошибка разбора имени)"
+
+    return "Неизвестно"
+
+
+def is_file_older_than_logic(file_path, days):
+    try:
+        return file_path.stat().st_mtime < (time.time() - (days * 24 * 60 * 60))
+    except FileNotFoundError:
+        return False
+
+def get_file_category_name_logic(file_path, rules=None):
+    return (rules or DEFAULT_RULES).category_for(file_path.name)
+    
+def is_windows_duplicate_name_logic(filename):
+    return DEFAULT_RULES.is_windows_duplicate(filename)
+
+
+def ensure_dir_exists_logic(dir_path, log_callback):
+    try:
+        dir_path.mkdir(parents=True, exist_ok=True)
+    except Exception as e:
+        log_callback("ОШИБКА СОЗДАНИЯ ПАПКИ", dir_path.name, reason=f"{e}")
+
+def move_item_safely_logic(source_path, target_dir_path, log_callback, action_type="Перемещение", reason="", scan_cache=None, source_entry=None, journal=None, verify_copy=False):
+    if source_entry is None and not source_path.exists():
+        log_callback("ПРЕДУПРЕЖДЕНИЕ", source_path.name, reason="Исходный элемент не найден.")
+        return
+    
+    if scan_cache is None or not scan_cache.is_known_dir(target_dir_path):
+        ensure_dir_exists_logic(target_dir_path, log_callback)
+    target_path = target_dir_path / source_path.name
+    if scan_cache is not None:
+        target_path = target_dir_path / scan_cache.reserve_free_name(target_dir_path, source_path.stem, source_path.suffix)
+
+    try:
+        while True:
+            try:
+                move_no_replace_logic(source_path, target_path, verify=verify_copy)
+                break
+            except FileExistsError:
+                # The name was taken behind our back (another program or a stale index): pick the next one.
+                if scan_cache is None:
+                    scan_cache = DirectoryScanCache()
+                target_path = target_dir_path / scan_cache.reserve_free_name(target_dir_path, source_path.stem, source_path.suffix)
+        if scan_cache is not None:
+            scan_cache.record_move(source_path, target_path, source_entry)
+        if journal is not None:
+            journal.record_move(source_path, target_path, action_type, reason, source_entry)
+        log_callback(action_type, source_path, target_dir_path, reason)
+        return target_path
+    except Exception as e:
+        if scan_cache is not None:
+            scan_cache.release_name(target_dir_path, target_path.name)
+        log_callback("ОШИБКА ПЕРЕМЕЩЕНИЯ", source_path.name, reason=f"{e}")
+
+def is_folder_content_old_logic(folder_to_check_path, days, ignored_folder_names_list, log_callback, age_index=None):
+    cutoff_time_ts = time.time() - (days * 24 * 60 * 60)
+    
+    if folder_to_check_path.name in ignored_folder_names_list:
+        return False
+
+    ignored_folder_names = set(ignored_folder_names_list)
+    if age_index is not None:
+        witness = age_index.lookup_fresh(folder_to_check_path, cutoff_time_ts, ignored_folder_names)
+        if witness is not None:
+            log_callback("ИНФО (ПРОВЕРКА СТАРОСТИ)", folder_to_check_path.name, reason=f"Найден свежий элемент: {witness.rsplit('/', 1)[-1]} (из индекса)")
+            return False
+
+    fresh_item = find_fresh_item_logic(folder_to_check_path, cutoff_time_ts, ignored_folder_names)
+    if fresh_item is not None:
+        fresh_item_path, fresh_item_mtime = fresh_item
+        if age_index is not None:
+            age_index.record(folder_to_check_path, fresh_item_mtime, fresh_item_path)
+        log_callback("ИНФО (ПРОВЕРКА СТАРОСТИ)", folder_to_check_path.name, reason=f"Найден свежий элемент: {os.path.basename(fresh_item_path)}")
+        return False
+    
+    return True
+
+def get_organization_paths_logic(current_settings):
+    downloads_path = get_downloads_path_logic(current_settings)
+    archive_base_path = downloads_path / current_settings["archive_dir_name"]
+    return {
+        "downloads": downloads_path,
+        "quarantine": downloads_path / QUARANTINE_DIR_NAME,
+        "archive_base": archive_base_path,
+        "archive_general_old": archive_base_path / ARCHIVE_GENERAL_OLD_SUBDIR,
+        "archive_specific_archives_old": archive_base_path / ARCHIVE_SPECIFIC_ARCHIVES_OLD_SUBDIR,
+        "archive_old_folders": archive_base_path / ARCHIVED_OLD_FOLDERS_SUBDIR,
+        "archive_volumes": archive_base_path / ARCHIVE_VOLUMES_SUBDIR,
+    }
+
+def prepare_organization_dirs_logic(current_settings, log_callback_gui):
+    paths = get_organization_paths_logic(current_settings)
+    ensure_dir_exists_logic(paths["quarantine"], log_callback_gui)
+    if current_settings.get("archive_mode") == ARCHIVE_MODE_VOLUMES:
+        ensure_dir_exists_logic(paths["archive_volumes"], log_callback_gui)
+    else:
+        ensure_dir_exists_logic(paths["archive_general_old"], log_callback_gui)
+        ensure_dir_exists_logic(paths["archive_specific_archives_old"], log_callback_gui)
+        ensure_dir_exists_logic(paths["archive_old_folders"], log_callback_gui)
+    for cat_name in get_classification_rules_logic(current_settings).category_names:
+        ensure_dir_exists_logic(paths["downloads"] / cat_name, log_callback_gui)
+
+def get_organization_context_logic(current_settings):
+    context = get_organization_paths_logic(current_settings)
+    days_older = current_settings["days_older_to_archive"]
+    folders_to_ignore = current_settings["folders_to_ignore"]
+    rules = get_classification_rules_logic(current_settings)
+    category_folder_names = list(rules.category_names)
+    archive_layout = current_settings.get("archive_layout", ARCHIVE_LAYOUT_FLAT)
+    if archive_layout not in ARCHIVE_LAYOUTS:
+        raise ValueError(f"Неизвестная раскладка архива: {archive_layout}")
+    context.update(
+        days_older=days_older,
+        folders_to_ignore=folders_to_ignore,
+        category_folder_names=category_folder_names,
+        folders_to_skip=set(folders_to_ignore + [current_settings["archive_dir_name"], QUARANTINE_DIR_NAME] + category_folder_names),
+        cutoff_time_ts=time.time() - (days_older * 24 * 60 * 60),
+        content_dedup=current_settings.get("content_dedup", False),
+        content_sniffing=current_settings.get("content_sniffing", False),
+        verify_copies=current_settings.get("verify_copies", False),
+        archive_mode=current_settings.get("archive_mode", ARCHIVE_MODE_FOLDERS),
+        archive_layout=archive_layout,
+        content_duplicates={},
+        sniffed_types={},
+        rules=rules,
+    )
+    return context
+
+def detect_content_duplicates_logic(context, scan_cache, log_callback_gui, hash_threads=1, persist_hash_cache=True, budget=None):
+    if not context["content_dedup"]:
+        return {}
+    from organizer_dedup import HASH_CACHE_FILENAME, HashCache, find_content_duplicates_logic
+
+    downloads_path = context["downloads"]
+    # Partial copies left for a later run to resume are not files of their own.
+    candidates = [(downloads_path / entry.name, entry) for entry in scan_cache.scan(downloads_path)
+                  if entry.kind == ENTRY_FILE and entry.name not in context["folders_to_skip"] and not entry.name.endswith(PARTIAL_COPY_SUFFIX)]
+    category_files = []
+    for cat_name in context["category_folder_names"]:
+        category_path = downloads_path / cat_name
+        category_files += [(category_path / entry.name, entry) for entry in scan_cache.scan(category_path)
+                           if entry.kind == ENTRY_FILE and not entry.name.endswith(PARTIAL_COPY_SUFFIX)]
+    candidates += category_files
+
+    log_callback_gui("ПОИСК ДУБЛИКАТОВ", "Сравнение файлов по содержимому", reason=f"файлов: {len(candidates)}")
+    hash_cache = HashCache(context["archive_base"] / HASH_CACHE_FILENAME).load()
+    duplicates = find_content_duplicates_logic(candidates, hash_cache, log_callback_gui, hash_threads,
+                                               preferred_originals=[file_path for file_path, entry in category_files], budget=budget)
+    # A stopped run still saves the hashes it computed, so the next run does not read those files again.
+    if persist_hash_cache:
+        try:
+            hash_cache.save()
+        except OSError as e:
+            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", HASH_CACHE_FILENAME, reason=f"Не удалось сохранить кэш хешей: {e}")
+    context["content_duplicates"] = duplicates
+    return duplicates
+
+def detect_content_types_logic(context, scan_cache, log_callback_gui, sniff_threads=1, persist_sniff_cache=True, budget=None):
+    # Files at the top level whose name says nothing (no extension, or one the rules do not know, like
+    # "download" or "report.php") are classified by their first bytes instead of landing in the default category.
+    if not context["content_sniffing"]:
+        return {}
+    from organizer_sniff import SNIFF_CACHE_FILENAME, sniff_file_types_logic
+    from organizer_dedup import HashCache
+
+    rules = context["rules"]
+    downloads_path = context["downloads"]
+    candidates = []
+    for entry in scan_cache.scan(downloads_path):
+        if entry.kind != ENTRY_FILE or entry.name in context["folders_to_skip"] or entry.name.endswith(PARTIAL_COPY_SUFFIX):
+            continue
+        junk_extension, keyword, category_name = rules.classify(entry.name)
+        if not junk_extension and not keyword and category_name == rules.default_category:
+            candidates.append((downloads_path / entry.name, entry))
+    if not candidates:
+        return {}
+
+    log_callback_gui("ОПРЕДЕЛЕНИЕ ТИПА", "Проверка содержимого файлов без известного расширения", reason=f"файлов: {len(candidates)}")
+    sniff_cache = HashCache(context["archive_base"] / SNIFF_CACHE_FILENAME).load()
+    sniffed_types = sniff_file_types_logic(candidates, sniff_cache, log_callback_gui, sniff_threads, budget)
+    if persist_sniff_cache:
+        try:
+            sniff_cache.save()
+        except OSError as e:
+            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", SNIFF_CACHE_FILENAME, reason=f"Не удалось сохранить кэш типов файлов: {e}")
+    context["sniffed_types"] = sniffed_types
+    return sniffed_types
+
+def get_item_category_logic(item_path, context):
+    sniffed_suffix = context["sniffed_types"].get(item_path)
+    if sniffed_suffix:
+        return context["rules"].category_for_suffix(sniffed_suffix)
+    return context["rules"].category_for(item_path.name)
+
+def get_archive_bucket_path_logic(archive_path, mtime, context, category_name=None):
+    # Keeps every archive folder small: a bucket holds what aged out in one month (of one category).
+    layout = context["archive_layout"]
+    if layout == ARCHIVE_LAYOUT_FLAT:
+        return archive_path
+    if layout == ARCHIVE_LAYOUT_CATEGORY_MONTH and category_name:
+        archive_path = archive_path / category_name
+    month = time.localtime(mtime)
+    return archive_path / f"{month.tm_year:04d}" / f"{month.tm_mon:02d}"
+
+def get_old_file_archive_path_logic(item_path, entry, context):
+    if context["archive_mode"] == ARCHIVE_MODE_VOLUMES:
+        return context["archive_volumes"]
+    category_name = get_item_category_logic(item_path, context)
+    if category_name == PROGRAM_ARCHIVE_CATEGORY_NAME:
+        archive_path = context["archive_specific_archives_old"]
+    else:
+        archive_path = context["archive_general_old"]
+    return get_archive_bucket_path_logic(archive_path, entry.mtime, context, category_name)
+
+def get_old_folder_archive_path_logic(entry, context):
+    if context["archive_mode"] == ARCHIVE_MODE_VOLUMES:
+        return context["archive_volumes"]
+    return get_archive_bucket_path_logic(context["archive_old_folders"], entry.mtime, context)
+
+def _is_year_bucket(dir_path, require_months=True):
+    if ARCHIVE_YEAR_RE.fullmatch(dir_path.name) is None or not dir_path.is_dir() or dir_path.is_symlink():
+        return False
+    # An archived folder that happens to be called "2023" is not a bucket: buckets hold month folders only.
+    return not require_months or all(ARCHIVE_MONTH_RE.fullmatch(child.name) and child.is_dir() for child in dir_path.iterdir())
+
+def iter_archived_items_logic(archive_path, category_names=()):
+    # Archived files and folders of one archive folder in any layout, old flat items included.
+    for item_path in archive_path.iterdir():
+        if item_path.name in category_names and item_path.is_dir() and not item_path.is_symlink():
+            yield from iter_archived_items_logic(item_path)
+        elif _is_year_bucket(item_path):
+            for month_path in item_path.iterdir():
+                yield from month_path.iterdir()
+        else:
+            yield item_path
+
+def remove_empty_archive_buckets_logic(archive_path, category_names=()):
+    for parent_path in [archive_path] + [archive_path / category_name for category_name in category_names]:
+        try:
+            year_paths = [item_path for item_path in parent_path.iterdir() if _is_year_bucket(item_path, require_months=False)]
+        except OSError:
+            continue
+        for year_path in year_paths:
+            month_paths = [month_path for month_path in year_path.iterdir() if ARCHIVE_MONTH_RE.fullmatch(month_path.name)]
+            for month_path in month_paths:
+                try:
+                    month_path.rmdir()
+                except OSError:
+                    pass
+            if month_paths:
+                try:
+                    year_path.rmdir()
+                except OSError:
+                    pass
+        if parent_path != archive_path:
+            try:
+                parent_path.rmdir()
+            except OSError:
+                pass
+
+def classify_top_level_file_logic(item_path, entry, context):
+    filename = entry.name
+    rules = context["rules"]
+    
+    junk_reason = ""
+    junk_extension, keyword, category_name = rules.classify(filename)
+    if junk_extension:
+        junk_reason = f"расширение ({junk_extension})"
+    elif keyword:
+        junk_reason = f"ключевое слово ('{keyword}')"
+    elif item_path in context["content_duplicates"]:
+        junk_reason = f"дубликат по содержимому: {context['content_duplicates'][item_path].name}"
+    elif not context["content_dedup"] and rules.is_windows_duplicate(filename):
+        junk_reason = "похож на дубликат Windows"
+
+    if junk_reason:
+        return PlanItem(item_path, context["quarantine"], "В КАРАНТИН", junk_reason, entry)
+
+    if entry.mtime < context["cutoff_time_ts"]:
+        return PlanItem(item_path, get_old_file_archive_path_logic(item_path, entry, context), "В АРХИВ (СТАРЫЙ)", f"старше {context['days_older']} дней", entry)
+
+    reason = f"категория '{category_name}'"
+    sniffed_suffix = context["sniffed_types"].get(item_path)
+    if sniffed_suffix:
+        category_name = rules.category_for_suffix(sniffed_suffix)
+        reason = f"категория '{category_name}' (по содержимому: {sniffed_suffix})"
+    return PlanItem(item_path, context["downloads"] / category_name, "СОРТИРОВКА", reason, entry)
+
+def load_folder_age_index_logic(context):
+    context["age_index"] = FolderAgeIndex(str(context["archive_base"] / AGE_INDEX_FILENAME)).load()
+    return context["age_index"]
+
+def save_folder_age_index_logic(context, log_callback_gui):
+    if context.get("age_index") is None:
+        return
+    try:
+        context["age_index"].save()
+    except OSError as e:
+        log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", AGE_INDEX_FILENAME, reason=f"Не удалось сохранить индекс возраста папок: {e}")
+
+def record_category_sizes_logic(context, scan_cache, log_callback_gui):
+    # The category folders were just listed for the plan; their sizes go to the size index at no extra cost.
+    size_index = FolderSizeIndex(context["archive_base"] / SIZE_INDEX_FILENAME).load()
+    for cat_name in context["category_folder_names"]:
+        category_path = context["downloads"] / cat_name
+        if scan_cache.is_known_dir(category_path):
+            size_index.record_listing(category_path, scan_cache.scan(category_path))
+    try:
+        size_index.save()
+    except OSError as e:
+        log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", SIZE_INDEX_FILENAME, reason=f"Не удалось сохранить индекс размеров: {e}")
+
+def classify_top_level_dir_logic(item_path, entry, context, log_callback_gui):
+    if is_folder_content_old_logic(item_path, context["days_older"], context["folders_to_ignore"], log_callback_gui, context.get("age_index")):
+        return PlanItem(item_path, get_old_folder_archive_path_logic(entry, context), "В АРХИВ (СТАРАЯ ПАПКА)", f"все содержимое старше {context['days_older']} дней", entry)
+    return None
+
+def iter_category_plan_items_logic(context, scan_cache, metrics, budget, cursor):
+    # Yielded items are begun in the cursor and counted against the budget; the caller marks them done once moved.
+    for category_name in sorted(context["category_folder_names"]):
+        category_path = context["downloads"] / category_name
+
+        for entry in sorted(scan_cache.scan(category_path), key=lambda entry: entry.name):
+            if entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                continue
+            item_in_category_path = category_path / entry.name
+            cursor_key = cursor.key_for(item_in_category_path)
+            if cursor.should_skip(cursor_key):
+                continue
+            if budget.check_planning() is not None:
+                cursor.stop_at(cursor_key)
+                return
+            metrics.count("items_scanned")
+            if item_in_category_path in context["content_duplicates"]:
+                original_path = context["content_duplicates"][item_in_category_path]
+                plan_item = PlanItem(item_in_category_path, context["quarantine"], "В КАРАНТИН", f"дубликат по содержимому: {original_path.name}", entry)
+            elif entry.kind == ENTRY_FILE and entry.mtime < context["cutoff_time_ts"]:
+                plan_item = PlanItem(item_in_category_path, get_old_file_archive_path_logic(item_in_category_path, entry, context), "В АРХИВ (ИЗ КАТЕГОРИИ)", "", entry)
+            else:
+                continue
+            cursor.begin(cursor_key)
+            budget.take_item()
+            yield plan_item
+
+def scan_organization_dirs_logic(context, scan_cache, metrics):
+    # Lists the category folders and the top level of Downloads once; later stages read the cache.
+    downloads_path = context["downloads"]
+    with metrics.stage("scan"), metrics.timed("scan"):
+        for cat_name in context["category_folder_names"]:
+            scan_cache.scan(downloads_path / cat_name)
+        return scan_cache.scan(downloads_path)
+
+def build_organization_plan_logic(current_settings, log_callback_gui, scan_cache=None, persist_caches=True, metrics=None, budget=None, cursor=None):
+    context = get_organization_context_logic(current_settings)
+    downloads_path = context["downloads"]
+    if metrics is None:
+        metrics = RunMetrics("plan")
+    if budget is None:
+        budget = RunBudget()
+    if cursor is None:
+        cursor = RunCursor(None, downloads_path)
+
+    if not downloads_path.is_dir():
+        log_callback_gui("КРИТИЧЕСКАЯ ОШИБКА", downloads_path.name, reason="Папка Загрузок не найдена.")
+        return None
+
+    if scan_cache is None:
+        scan_cache = DirectoryScanCache()
+    top_level_entries = scan_organization_dirs_logic(context, scan_cache, metrics)
+    if persist_caches:
+        record_category_sizes_logic(context, scan_cache, log_callback_gui)
+    with metrics.stage("content_dedup"), metrics.timed("hash"):
+        detect_content_duplicates_logic(context, scan_cache, log_callback_gui, persist_hash_cache=persist_caches, budget=budget)
+    with metrics.stage("content_sniffing"), metrics.timed("sniff"):
+        detect_content_types_logic(context, scan_cache, log_callback_gui, persist_sniff_cache=persist_caches, budget=budget)
+    load_folder_age_index_logic(context)
+    plan = []
+
+    log_callback_gui("ЭТАП 1", "Обработка элементов на верхнем уровне Загрузок")
+    with metrics.stage("top_level"):
+        for entry in sorted(top_level_entries, key=lambda entry: entry.name):
+            if entry.name in context["folders_to_skip"] or entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                continue
+
+            item_path = downloads_path / entry.name
+            cursor_key = cursor.key_for(item_path)
+            if cursor.should_skip(cursor_key):
+                continue
+            if budget.check_planning() is not None:
+                cursor.stop_at(cursor_key)
+                break
+            metrics.count("items_scanned")
+            plan_item = None
+            if entry.kind == ENTRY_FILE:
+                plan_item = classify_top_level_file_logic(item_path, entry, context)
+            elif entry.kind == ENTRY_DIR:
+                with metrics.timed("age_check"):
+                    plan_item = classify_top_level_dir_logic(item_path, entry, context, log_callback_gui)
+            if plan_item is not None:
+                cursor.begin(cursor_key)
+                budget.take_item()
+                plan.append(plan_item)
+
+        if persist_caches:
+            save_folder_age_index_logic(context, log_callback_gui)
+
+    if budget.stop_reason is None:
+        log_callback_gui("ЭТАП 2", "Проверка на старость файлов внутри папок категорий")
+        with metrics.stage("categories"):
+            plan.extend(iter_category_plan_items_logic(context, scan_cache, metrics, budget, cursor))
+
+    return plan
+
+def execute_plan_item_logic(plan_item, log_callback_gui, scan_cache, journal, metrics, verify_copy=False, archiver=None):
+    if archiver is not None and plan_item.destination == archiver.volumes_path:
+        # Packed on the archiver's thread; it journals, logs and advances the progress once the item is committed.
+        archiver.submit(plan_item)
+        return None
+    with metrics.timed("move"):
+        target_path = move_item_safely_logic(plan_item.source, plan_item.destination, log_callback_gui,
+                                             plan_item.action, plan_item.reason, scan_cache, plan_item.entry, journal, verify_copy)
+    if target_path is not None:
+        # Folders are moved as a whole and not walked, so only file sizes add up to bytes_moved.
+        entry = plan_item.entry
+        metrics.count_move(entry.size if entry is not None and entry.kind == ENTRY_FILE else 0)
+    metrics.advance()
+    return target_path
+
+def execute_plan_logic(plan, log_callback_gui, scan_cache=None, group_by_destination=True, journal=None, metrics=None, verify_copy=False,
+                       archiver=None, budget=None, cursor=None):
+    plan_items = sorted(plan, key=lambda plan_item: str(plan_item.destination)) if group_by_destination else plan
+    if metrics is None:
+        metrics = RunMetrics("apply_plan")
+    log_callback_gui("ВЫПОЛНЕНИЕ ПЛАНА", f"Перемещений: {len(plan_items)}")
+    metrics.set_progress_total(len(plan_items))
+    with metrics.stage("moves"):
+        for plan_item in plan_items:
+            if budget is not None and budget.check() is not None:
+                break
+            execute_plan_item_logic(plan_item, log_callback_gui, scan_cache, journal, metrics, verify_copy, archiver)
+            if cursor is not None:
+                cursor.done(cursor.key_for(plan_item.source))
+
+def finish_run_cursor_logic(cursor, budget, log_callback_gui, metrics, save=True):
+    # Remembers where a stopped run left off (or forgets it after a complete run) and reports the stop.
+    resume_key = cursor.save() if save else cursor.next_resume_key()
+    metrics.stop_reason = budget.stop_reason
+    if budget.stop_reason is None:
+        return
+    reason = STOP_REASON_NAMES.get(budget.stop_reason, budget.stop_reason)
+    if resume_key is not None:
+        log_callback_gui("ОСТАНОВКА", f"Запуск остановлен: {reason}", reason=f"следующий запуск продолжит с '{resume_key[2]}'")
+    else:
+        log_callback_gui("ОСТАНОВКА", f"Запуск остановлен: {reason}")
+
+def save_plan_logic(plan, plan_path):
+    items = []
+    for plan_item in plan:
+        item = {
+            "source": str(plan_item.source),
+            "destination": str(plan_item.destination),
+            "action": plan_item.action,
+            "reason": plan_item.reason,
+        }
+        if plan_item.entry is not None:
+            item.update(kind=plan_item.entry.kind, size=plan_item.entry.size, mtime=plan_item.entry.mtime)
+        items.append(item)
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": PLAN_FORMAT_VERSION, "created_at": datetime.now().isoformat(timespec="seconds"), "items": items},
+                  f, indent=1, ensure_ascii=False)
+
+def load_plan_logic(plan_path):
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get("version") != PLAN_FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия плана: {data.get('version')}")
+    return [PlanItem(Path(item["source"]), Path(item["destination"]), item["action"], item["reason"], None)
+            for item in data["items"]]
+
+def new_volume_archiver_logic(current_settings, log_callback_gui, journal, metrics):
+    # None in the default folders mode: archived items are then moved like any other item.
+    if current_settings.get("archive_mode") != ARCHIVE_MODE_VOLUMES:
+        return None
+    return VolumeArchiver(get_organization_paths_logic(current_settings)["archive_volumes"], get_volume_index_logic(current_settings).load(),
+                          journal.run_id, log_callback_gui, journal, metrics,
+                          current_settings.get("archive_volume_format", VOLUME_FORMAT_TAR_XZ),
+                          int(current_settings.get("archive_volume_max_mb", 1024)) * 1024 * 1024,
+                          current_settings.get("archive_compress_threads", 4))
+
+def run_organization_logic(current_settings, log_callback_gui, dry_run=False, metrics=None, budget=None):
+    # budget: RunBudget to cancel the run or bound it in time/items; by default from max_seconds/max_items of the settings.
+    # A stopped run saves a cursor and the next one resumes from it; dry runs read the cursor but never write it.
+    if metrics is None:
+        metrics = RunMetrics("dry_run" if dry_run else "organize")
+    if budget is None:
+        budget = new_run_budget_logic(current_settings)
+    log_callback_gui = metrics.wrap_log_callback(log_callback_gui)
+    try:
+        if not get_downloads_path_logic(current_settings).is_dir():
+            log_callback_gui("КРИТИЧЕСКАЯ ОШИБКА", get_downloads_path_logic(current_settings).name, reason="Папка Загрузок не найдена.")
+            return None
+        cursor = RunCursor.load(get_run_cursor_path_logic(current_settings), get_downloads_path_logic(current_settings))
+        if cursor.resume_from is not None:
+            log_callback_gui("ПРОДОЛЖЕНИЕ", "Продолжение остановленного запуска", reason=f"начиная с '{cursor.resume_from[2]}'")
+        try:
+            scan_threads = current_settings.get("scan_threads", 1)
+            move_threads = current_settings.get("move_threads", 1)
+            if not dry_run and (scan_threads > 1 or move_threads > 1):
+                from organizer_pipeline import run_organization_pipelined_logic
+                return run_organization_pipelined_logic(current_settings, log_callback_gui, scan_threads, move_threads, metrics, budget, cursor)
+
+            scan_cache = DirectoryScanCache()
+            plan = build_organization_plan_logic(current_settings, log_callback_gui, scan_cache, persist_caches=not dry_run, metrics=metrics,
+                                                 budget=budget, cursor=cursor)
+            if plan is None or dry_run:
+                return plan
+
+            prepare_organization_dirs_logic(current_settings, log_callback_gui)
+            with open_run_journal_logic(current_settings) as journal:
+                metrics.run_id = journal.run_id
+                archiver = new_volume_archiver_logic(current_settings, log_callback_gui, journal, metrics)
+                try:
+                    execute_plan_logic(plan, log_callback_gui, scan_cache, journal=journal, metrics=metrics,
+                                       verify_copy=current_settings.get("verify_copies", False), archiver=archiver,
+                                       budget=budget, cursor=cursor)
+                finally:
+                    if archiver is not None:
+                        with metrics.stage("compress"):
+                            archiver.close()
+            return plan
+        finally:
+            finish_run_cursor_logic(cursor, budget, log_callback_gui, metrics, save=not dry_run)
+    finally:
+        metrics.finish()
+
+def remove_empty_organization_dirs_logic(current_settings, log_callback_gui):
+    paths = get_organization_paths_logic(current_settings)
+    category_names = get_classification_rules_logic(current_settings).category_names
+    remove_empty_archive_buckets_logic(paths["archive_general_old"], category_names)
+    remove_empty_archive_buckets_logic(paths["archive_specific_archives_old"], category_names)
+    remove_empty_archive_buckets_logic(paths["archive_old_folders"])
+    dirs_to_remove = [paths["quarantine"], paths["archive_general_old"], paths["archive_specific_archives_old"], paths["archive_old_folders"],
+                      paths["archive_volumes"]]
+    dirs_to_remove += [paths["downloads"] / cat_name for cat_name in category_names]
+    for dir_path in dirs_to_remove:
+        try:
+            dir_path.rmdir()
+            log_callback_gui("УДАЛЕНИЕ ПАПКИ", dir_path.name)
+        except OSError:
+            pass
+
+def move_back_logic(current_path, original_path, log_callback_gui, action_type, reason=""):
+    # Puts an item back under its original name, or next to it under a free name if that one is taken.
+    ensure_dir_exists_logic(original_path.parent, log_callback_gui)
+    try:
+        move_no_replace_logic(current_path, original_path)
+        log_callback_gui(action_type, current_path, original_path.parent, reason)
+        return original_path
+    except FileExistsError:
+        return move_item_safely_logic(current_path, original_path.parent, log_callback_gui, action_type, "исходное имя занято")
+    except Exception as e:
+        log_callback_gui("ОШИБКА ПЕРЕМЕЩЕНИЯ", current_path.name, reason=f"{e}")
+        return None
+
+def restore_volume_item_logic(volume_index, record, original_path, log_callback_gui, action_type, reason=""):
+    # Unpacks an item from its volume to original_path, or next to it under a free name if that one is taken.
+    ensure_dir_exists_logic(original_path.parent, log_callback_gui)
+    try:
+        try:
+            extract_volume_item_logic(volume_index, record, original_path)
+        except FileExistsError:
+            scan_cache = DirectoryScanCache()
+            while True:
+                free_path = original_path.parent / scan_cache.reserve_free_name(original_path.parent, original_path.stem, original_path.suffix)
+                try:
+                    extract_volume_item_logic(volume_index, record, free_path)
+                    break
+                except FileExistsError:
+                    continue
+            original_path, reason = free_path, "исходное имя занято"
+    except Exception as e:
+        log_callback_gui("ОШИБКА РАСПАКОВКИ", original_path.name, reason=f"{record.volume}: {e}")
+        return None
+    forget_volume_items_logic(volume_index, [record])
+    log_callback_gui(action_type, original_path, original_path.parent, reason)
+    return original_path
+
+def revert_journal_run_logic(run, log_callback_gui, metrics=None, volume_index=None):
+    if metrics is None:
+        metrics = RunMetrics("rollback")
+    for source_path, target_path, action_type in reversed(run["moves"]):
+        rollback_action = ROLLBACK_ACTION_NAMES.get(action_type, "ВОЗВРАТ")
+        record = volume_index.lookup_member_path(target_path) if volume_index is not None else None
+        if record is not None:
+            with metrics.timed("extract"):
+                restored_path = restore_volume_item_logic(volume_index, record, source_path, log_callback_gui, rollback_action)
+            if restored_path is not None:
+                metrics.count_move(record.size)
+            metrics.advance()
+            continue
+        try:
+            st = os.lstat(target_path)
+        except OSError:
+            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", target_path.name, reason="Элемент из журнала не найден.")
+            metrics.advance()
+            continue
+        with metrics.timed("move"):
+            restored_path = move_back_logic(target_path, source_path, log_callback_gui, rollback_action)
+        if restored_path is not None:
+            metrics.count_move(st.st_size if stat.S_ISREG(st.st_mode) else 0)
+        metrics.advance()
+
+def move_items_to_downloads_logic(item_paths, downloads_path, log_callback_gui, action_type, metrics):
+    # Legacy reset: puts every item straight into Downloads and returns the names that left their folder.
+    moved_names = []
+    metrics.add_to_progress_total(len(item_paths))
+    for item_path in item_paths:
+        try:
+            entry = entry_from_stat(item_path.name, os.lstat(item_path))
+        except OSError:
+            entry = None
+        with metrics.timed("move"):
+            target_path = move_item_safely_logic(item_path, downloads_path, log_callback_gui, action_type, source_entry=entry)
+        if target_path is not None:
+            metrics.count_move(entry.size if entry is not None and entry.kind == ENTRY_FILE else 0)
+            moved_names.append(item_path.name)
+        metrics.advance()
+    return moved_names
+
+def perform_rollback_logic(current_settings, log_callback_gui, run_id=None, up_to_run_id=None, all_runs=False, full_reset=False, metrics=None):
+    if metrics is None:
+        metrics = RunMetrics("rollback")
+    log_callback_gui = metrics.wrap_log_callback(log_callback_gui)
+    try:
+        return _perform_rollback_logic(current_settings, log_callback_gui, run_id, up_to_run_id, all_runs, full_reset, metrics)
+    finally:
+        metrics.finish()
+
+def _perform_rollback_logic(current_settings, log_callback_gui, run_id, up_to_run_id, all_runs, full_reset, metrics):
+    journal_path = get_journal_path_logic(current_settings)
+    if not full_reset and journal_path.exists():
+        with metrics.stage("read_journal"):
+            runs = read_journal_runs_logic(journal_path)
+            run_ids = select_runs_to_revert_logic(runs, run_id, up_to_run_id, all_runs)
+        if not run_ids:
+            log_callback_gui("СБРОС", "В журнале нет запусков для отката.")
+            return []
+
+        log_callback_gui("СБРОС", "Начало отката по журналу перемещений.", reason=f"запусков: {len(run_ids)}")
+        metrics.run_id = ",".join(run_ids)
+        metrics.set_progress_total(sum(len(runs[reverted_run_id]["moves"]) for reverted_run_id in run_ids))
+        quarantine_index = get_quarantine_index_logic(current_settings)
+        volume_index = get_volume_index_logic(current_settings).load()
+        with metrics.stage("revert"):
+            for reverted_run_id in run_ids:
+                run = runs[reverted_run_id]
+                log_callback_gui("СБРОС", f"Откат запуска {reverted_run_id}", reason=f"перемещений: {len(run['moves'])}")
+                revert_journal_run_logic(run, log_callback_gui, metrics, volume_index)
+                mark_runs_reverted_logic(journal_path, [reverted_run_id])
+                quarantine_index.forget([target_path.name for _, target_path, _ in run["moves"]
+                                         if target_path.parent == quarantine_index.quarantine_path and not os.path.lexists(target_path)])
+            quarantine_index.close()
+        with metrics.stage("cleanup"):
+            remove_empty_organization_dirs_logic(current_settings, log_callback_gui)
+        log_callback_gui("СБРОС", "Операция сброса организации завершена.")
+        return run_ids
+
+    downloads_path = get_downloads_path_logic(current_settings)
+    archive_base_path = downloads_path / current_settings["archive_dir_name"]
+    quarantine_path = downloads_path / QUARANTINE_DIR_NAME
+
+    log_callback_gui("СБРОС", "Начало операции сброса организации.")
+
+    if quarantine_path.is_dir():
+        log_callback_gui("СБРОС", quarantine_path.name, reason="Возврат содержимого.")
+        quarantine_index = get_quarantine_index_logic(current_settings)
+        with metrics.stage("quarantine"):
+            items = [item for item in quarantine_path.iterdir() if item.name != QUARANTINE_TRASH_DIR_NAME]
+            quarantine_index.forget(move_items_to_downloads_logic(items, downloads_path, log_callback_gui, "ВОЗВРАТ ИЗ КАРАНТИНА", metrics))
+        quarantine_index.close()
+        try:
+            quarantine_path.rmdir()
+            log_callback_gui("УДАЛЕНИЕ ПАПКИ", quarantine_path.name)
+        except OSError:
+            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", quarantine_path.name, reason="Папка не пуста, не удалена.")
+
+    if archive_base_path.is_dir():
+        log_callback_gui("СБРОС", archive_base_path.name, reason="Обработка папки архива.")
+        
+        volume_index = get_volume_index_logic(current_settings).load()
+        volume_records = volume_index.records()
+        if volume_records:
+            metrics.add_to_progress_total(len(volume_records))
+            with metrics.stage("volumes"):
+                for record in volume_records:
+                    with metrics.timed("extract"):
+                        restored_path = restore_volume_item_logic(volume_index, record, downloads_path / Path(record.original).name,
+                                                                  log_callback_gui, "ВОЗВРАТ ИЗ АРХИВА")
+                    if restored_path is not None:
+                        metrics.count_move(record.size)
+                    metrics.advance()
+        if not volume_index.records():
+            # Every volume was unpacked and deleted: the index goes too, so the archive folder can be removed.
+            try:
+                volume_index.index_path.unlink()
+                volume_index.volumes_path.rmdir()
+            except OSError:
+                pass
+
+        archive_subfolders_to_empty = [
+            archive_base_path / ARCHIVE_GENERAL_OLD_SUBDIR,
+            archive_base_path / ARCHIVE_SPECIFIC_ARCHIVES_OLD_SUBDIR,
+            archive_base_path / ARCHIVED_OLD_FOLDERS_SUBDIR,
+        ]
+        
+        category_names = get_classification_rules_logic(current_settings).category_names
+        for archive_subfolder_path in archive_subfolders_to_empty:
+            if archive_subfolder_path.is_dir():
+                with metrics.stage("archive"):
+                    items = list(iter_archived_items_logic(archive_subfolder_path, category_names))
+                    move_items_to_downloads_logic(items, downloads_path, log_callback_gui, "ВОЗВРАТ ИЗ АРХИВА", metrics)
+                    remove_empty_archive_buckets_logic(archive_subfolder_path, category_names)
+                try:
+                    archive_subfolder_path.rmdir()
+                    log_callback_gui("УДАЛЕНИЕ ПАПКИ", archive_subfolder_path.name)
+                except OSError:
+                    log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", archive_subfolder_path.name, reason="Не удалось удалить (возможно, не пуста).")
+        try:
+            archive_base_path.rmdir()
+            log_callback_gui("УДАЛЕНИЕ ПАПКИ", archive_base_path.name)
+        except OSError:
+            log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", archive_base_path.name, reason="Не удалось удалить (возможно, не пуста).")
+
+    category_folder_names = get_classification_rules_logic(current_settings).category_names
+    for cat_name in category_folder_names:
+        category_path = downloads_path / cat_name
+        if category_path.is_dir():
+            with metrics.stage("categories"):
+                move_items_to_downloads_logic(list(category_path.iterdir()), downloads_path, log_callback_gui, "ВОЗВРАТ ИЗ КАТЕГОРИИ", metrics)
+            try:
+                category_path.rmdir()
+                log_callback_gui("УДАЛЕНИЕ ПАПКИ", category_path.name)
+            except OSError:
+                log_callback_gui("ПРЕДУПРЕЖДЕНИЕ", category_path.name, reason="Папка не пуста, не удалена.")
+
+    metrics.finalize_progress_total()
+    log_callback_gui("СБРОС", "Операция сброса организации завершена.")
+
+def migrate_archive_layout_logic(current_settings, log_callback_gui, metrics=None):
+    # One-time move of items that still lie flat in the archive folders into the buckets of archive_layout.
+    # The moves are journaled as relocations, so rolling back the runs that archived them still finds them.
+    if metrics is None:
+        metrics = RunMetrics("migrate_archive")
+    log_callback_gui = metrics.wrap_log_callback(log_callback_gui)
+    try:
+        context = get_organization_context_logic(current_settings)
+        if context["archive_layout"] == ARCHIVE_LAYOUT_FLAT:
+            log_callback_gui("ПЕРЕНОС В АРХИВЕ", "Раскладка архива 'flat': переносить нечего.")
+            return 0
+        scan_cache = DirectoryScanCache()
+        category_names = context["category_folder_names"]
+        archive_folders = [(context["archive_general_old"], category_names), (context["archive_specific_archives_old"], category_names),
+                           (context["archive_old_folders"], ())]
+        moved_count = 0
+        with open_run_journal_logic(current_settings) as journal:
+            metrics.run_id = journal.run_id
+            for archive_path, bucket_category_names in archive_folders:
+                with metrics.stage("scan"):
+                    entries = [entry for entry in scan_cache.scan(archive_path)
+                               if not entry.name.endswith(PARTIAL_COPY_SUFFIX) and entry.name not in bucket_category_names
+                               and not (entry.kind == ENTRY_DIR and _is_year_bucket(archive_path / entry.name))]
+                metrics.add_to_progress_total(len(entries))
+                with metrics.stage("moves"):
+                    for entry in entries:
+                        metrics.count("items_scanned")
+                        item_path = archive_path / entry.name
+                        bucket_path = get_archive_bucket_path_logic(archive_path, entry.mtime, context,
+                                                                    context["rules"].category_for(entry.name) if bucket_category_names else None)
+                        with metrics.timed("move"):
+                            target_path = move_item_safely_logic(item_path, bucket_path, log_callback_gui, "ПЕРЕНОС В АРХИВЕ",
+                                                                 str(bucket_path.relative_to(archive_path)), scan_cache, entry)
+                        if target_path is not None:
+                            journal.record_relocation(item_path, target_path)
+                            metrics.count_move(entry.size if entry.kind == ENTRY_FILE else 0)
+                            moved_count += 1
+                        metrics.advance()
+        metrics.finalize_progress_total()
+        log_callback_gui("ПЕРЕНОС В АРХИВЕ", "Перенос завершён.", reason=f"перемещено: {moved_count}")
+        return moved_count
+    finally:
+        metrics.finish()
+
+def list_quarantine_logic(current_settings):
+    quarantine_path = get_downloads_path_logic(current_settings) / QUARANTINE_DIR_NAME
+    try:
+        names = [name for name in os.listdir(quarantine_path) if name != QUARANTINE_TRASH_DIR_NAME]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+    quarantine_index = get_quarantine_index_logic(current_settings).load()
+    sibling_names = set(names)
+    rules = None
+    entries = []
+    for name in names:
+        item_path = quarantine_path / name
+        record = quarantine_index.get(name)
+        if record is not None:
+            entries.append(QuarantineEntry(item_path, record.reason, record.mtime, quarantine_index.original_path(record), record.quarantined_at))
+            continue
+
+        # Put there by hand or by a version without the index: fall back to stat and re-classification.
+        try:
+            mtime = item_path.lstat().st_mtime
+        except FileNotFoundError:
+            continue
+        rules = rules or get_classification_rules_logic(current_settings)
+        entries.append(QuarantineEntry(item_path, get_junk_reason_logic(item_path, rules, sibling_names), mtime, None, None))
+    return entries
+
+def _run_bulk_quarantine_logic(item_paths, process_item, progress_callback, threads):
+    # process_item returns None on success or an error message; errors are collected instead of reported one by one.
+    from concurrent.futures import ThreadPoolExecutor
+
+    errors = []
+    done_count = 0
+    total = len(item_paths)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        for item_path, error in zip(item_paths, pool.map(process_item, item_paths)):
+            if error is None:
+                done_count += 1
+            else:
+                errors.append((item_path.name, error))
+            if progress_callback is not None:
+                progress_callback(done_count + len(errors), total)
+    return BulkResult(done_count, errors)
+
+def restore_quarantine_items_logic(current_settings, item_paths, log_callback, progress_callback=None, threads=QUARANTINE_BULK_THREADS):
+    downloads_path = get_downloads_path_logic(current_settings)
+    quarantine_index = get_quarantine_index_logic(current_settings).load()
+
+    def restore_item(item_path):
+        if not os.path.lexists(item_path):
+            return "Элемент не найден."
+        item_errors = []
+
+        def capturing_log_callback(action_type, item_path_obj_or_name, destination_parent_path_obj=None, reason=""):
+            if action_type.startswith("ОШИБКА"):
+                item_errors.append(reason)
+            log_callback(action_type, item_path_obj_or_name, destination_parent_path_obj, reason)
+
+        record = quarantine_index.get(item_path.name)
+        original_path = quarantine_index.original_path(record) if record is not None else None
+        if original_path is not None:
+            target_path = move_back_logic(item_path, original_path, capturing_log_callback, "ВОССТАНОВЛЕНИЕ ИЗ КАРАНТИНА")
+        else:
+            target_path = move_item_safely_logic(item_path, downloads_path, capturing_log_callback, "ВОССТАНОВЛЕНИЕ ИЗ КАРАНТИНА")
+        if target_path is None:
+            return "; ".join(item_errors) or "Не удалось вернуть."
+        quarantine_index.forget([item_path.name])
+        return None
+
+    try:
+        return _run_bulk_quarantine_logic(list(item_paths), restore_item, progress_callback, threads)
+    finally:
+        quarantine_index.close()
+
+def _reclaim_path_logic(path):
+    try:
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        return None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        return str(e)
+
+def reclaim_quarantine_trash_logic(current_settings, log_callback, threads=QUARANTINE_BULK_THREADS):
+    # Frees the space of items staged by earlier deletes, including ones interrupted before reclamation finished.
+    trash_path = get_downloads_path_logic(current_settings) / QUARANTINE_DIR_NAME / QUARANTINE_TRASH_DIR_NAME
+    try:
+        staged_paths = [trash_path / name for name in os.listdir(trash_path)]
+    except FileNotFoundError:
+        return BulkResult(0, [])
+    result = _run_bulk_quarantine_logic(staged_paths, _reclaim_path_logic, None, threads)
+    for name, error in result.errors:
+        log_callback("ОШИБКА УДАЛЕНИЯ", name, reason=error)
+    try:
+        trash_path.rmdir()
+    except OSError:
+        pass
+    return result
+
+def _delete_items_via_trash_logic(current_settings, item_paths, log_callback, action_type, on_staged=None, progress_callback=None,
+                                  threads=QUARANTINE_BULK_THREADS):
+    # Renames the selection into a hidden staging folder first (one rename per item, so the items leave
+    # their folders at once), then reclaims the space on a thread pool. on_staged gets the original paths
+    # of the staged items before the space is reclaimed.
+    reclaim_quarantine_trash_logic(current_settings, log_callback, threads)
+    trash_path = get_downloads_path_logic(current_settings) / QUARANTINE_DIR_NAME / QUARANTINE_TRASH_DIR_NAME
+    batch_path = trash_path / new_run_id()
+    item_paths = list(item_paths)
+    staged_paths = []
+    staged_item_paths = []
+    errors = []
+    batch_path.mkdir(parents=True, exist_ok=True)
+    staged_names = set()
+    for item_path in item_paths:
+        # Items from different folders may share a name, and a numbered name may be taken by an item too.
+        staged_name = item_path.name
+        copy_number = len(staged_names)
+        while staged_name in staged_names:
+            staged_name = f"{copy_number}_{item_path.name}"
+            copy_number += 1
+        staged_path = batch_path / staged_name
+        try:
+            move_no_replace_logic(item_path, staged_path)
+        except Exception as e:
+            log_callback("ОШИБКА УДАЛЕНИЯ", item_path.name, reason=str(e))
+            errors.append((item_path.name, str(e)))
+            continue
+        staged_names.add(staged_name)
+        staged_paths.append(staged_path)
+        staged_item_paths.append(item_path)
+        log_callback(action_type, item_path.name)
+    if on_staged is not None:
+        on_staged(staged_item_paths)
+
+    def reclaim_progress_callback(done_count, total):
+        if progress_callback is not None:
+            progress_callback(len(errors) + done_count, len(item_paths))
+
+    reclaim_progress_callback(0, len(staged_paths))
+    reclaim_result = _run_bulk_quarantine_logic(staged_paths, _reclaim_path_logic, reclaim_progress_callback, threads)
+    for name, error in reclaim_result.errors:
+        log_callback("ОШИБКА УДАЛЕНИЯ", name, reason=f"не удалось освободить место: {error}")
+    for dir_path in (batch_path, trash_path):
+        try:
+            dir_path.rmdir()
+        except OSError:
+            pass
+    return BulkResult(len(staged_paths) - len(reclaim_result.errors), errors + reclaim_result.errors)
+
+def delete_quarantine_items_logic(current_settings, item_paths, log_callback, progress_callback=None, threads=QUARANTINE_BULK_THREADS):
+    quarantine_index = get_quarantine_index_logic(current_settings)
+    try:
+        return _delete_items_via_trash_logic(
+            current_settings, item_paths, log_callback, "УДАЛЕНИЕ ИЗ КАРАНТИНА",
+            lambda staged_item_paths: quarantine_index.forget([item_path.name for item_path in staged_item_paths]),
+            progress_callback, threads)
+    finally:
+        quarantine_index.close()
+        compact_quarantine_index_logic(current_settings)
+
+def purge_quarantine_logic(current_settings, log_callback, older_than_days=None, names=None):
+    item_paths = []
+    for entry in list_quarantine_logic(current_settings):
+        if names is not None and entry.path.name not in names:
+            continue
+        # Age in the quarantine: when the item was put there, its own mtime only for items without a record.
+        if older_than_days is not None and (entry.quarantined_at or entry.mtime) >= time.time() - (older_than_days * 24 * 60 * 60):
+            continue
+        item_paths.append(entry.path)
+    return delete_quarantine_items_logic(current_settings, item_paths, log_callback).done
+
+def _archive_subfolder_level_logic(level, name, category_names, folder_rows):
+    # Buckets of the archive layouts: category folders, then years, then months. With folder_rows every other
+    # folder is a row of its own too (archived old folders); otherwise it counts as an item of its bucket.
+    if level == "section" and name in category_names:
+        return "category"
+    if level in ("section", "category") and ARCHIVE_YEAR_RE.fullmatch(name):
+        return "year"
+    if level == "year" and ARCHIVE_MONTH_RE.fullmatch(name):
+        return "month"
+    return "folder" if folder_rows and level != "folder" else None
+
+def _collect_archive_reclaim_entries_logic(size_index, dir_path, level, category_names, folder_rows, entries, rescan):
+    is_subfolder = lambda name: _archive_subfolder_level_logic(level, name, category_names, folder_rows) is not None
+    result = size_index.container_totals(dir_path, is_subfolder, rescan)
+    if result is None:
+        return
+    totals, subfolder_names = result
+    entries.append(ReclaimEntry(RECLAIM_KIND_ARCHIVE, dir_path, totals.bytes, totals.files, totals.newest_mtime, tuple(subfolder_names)))
+    for name in subfolder_names:
+        _collect_archive_reclaim_entries_logic(size_index, dir_path / name, _archive_subfolder_level_logic(level, name, category_names, folder_rows),
+                                               category_names, folder_rows, entries, rescan)
+
+def _collect_item_reclaim_entries_logic(size_index, dir_path, kind, entries, rescan):
+    # One row per item of dir_path: quarantine entries, compressed volumes.
+    try:
+        with os.scandir(dir_path) as it:
+            items = [(Path(dir_entry.path), dir_entry.stat(follow_symlinks=False)) for dir_entry in it
+                     if dir_entry.name != QUARANTINE_TRASH_DIR_NAME and not dir_entry.name.endswith(PARTIAL_COPY_SUFFIX)]
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for item_path, st in items:
+        totals = size_index.item_totals(item_path, st, rescan)
+        entries.append(ReclaimEntry(kind, item_path, totals.bytes, totals.files, totals.newest_mtime, ()))
+
+def build_reclaim_report_logic(current_settings, kinds=RECLAIM_KINDS, sort_by="bytes", rescan=False):
+    # Rows: every quarantine entry, archived old folder and compressed volume, every archive bucket (with only
+    # its own items) and every category folder. Totals come from the size index, so only folders changed since
+    # the last report or run are listed again; rescan=True walks everything and rebuilds the index.
+    if sort_by not in RECLAIM_SORT_KEYS:
+        raise ValueError(f"Неизвестный порядок сортировки: {sort_by}")
+    paths = get_organization_paths_logic(current_settings)
+    category_names = set(get_classification_rules_logic(current_settings).category_names)
+    size_index = get_size_index_logic(current_settings).load()
+    entries = []
+
+    if RECLAIM_KIND_QUARANTINE in kinds:
+        _collect_item_reclaim_entries_logic(size_index, paths["quarantine"], RECLAIM_KIND_QUARANTINE, entries, rescan)
+
+    if RECLAIM_KIND_ARCHIVE in kinds:
+        for path_key in ("archive_general_old", "archive_specific_archives_old", "archive_old_folders"):
+            _collect_archive_reclaim_entries_logic(size_index, paths[path_key], "section", category_names,
+                                                   path_key == "archive_old_folders", entries, rescan)
+        _collect_item_reclaim_entries_logic(size_index, paths["archive_volumes"], RECLAIM_KIND_ARCHIVE, entries, rescan)
+
+    if RECLAIM_KIND_CATEGORY in kinds:
+        for cat_name in sorted(category_names):
+            result = size_index.container_totals(paths["downloads"] / cat_name, None, rescan)
+            if result is not None:
+                totals = result[0]
+                entries.append(ReclaimEntry(RECLAIM_KIND_CATEGORY, paths["downloads"] / cat_name, totals.bytes, totals.files, totals.newest_mtime, ()))
+
+    try:
+        size_index.save(prune_unused=True)
+    except OSError:
+        pass
+    # Buckets that only hold sub-buckets and empty folders have nothing of their own to reclaim.
+    entries = [entry for entry in entries if entry.files or entry.kind == RECLAIM_KIND_QUARANTINE]
+    if sort_by == "age":
+        entries.sort(key=lambda entry: (entry.newest_mtime, -entry.bytes))
+    else:
+        entries.sort(key=lambda entry: (-entry.bytes, entry.newest_mtime))
+    return entries
+
+def purge_reclaim_entries_logic(current_settings, entries, log_callback, progress_callback=None, threads=QUARANTINE_BULK_THREADS):
+    # Deletes report rows through the quarantine trash. An archive bucket loses only its own items, its
+    # sub-buckets stay; category folders hold sorted, live files and are never purged from here.
+    paths = get_organization_paths_logic(current_settings)
+    item_paths = []
+    for entry in entries:
+        if entry.kind not in RECLAIM_PURGEABLE_KINDS:
+            log_callback("ПРЕДУПРЕЖДЕНИЕ", entry.path.name, reason="папки категорий не удаляются при освобождении места")
+            continue
+        if not entry.subfolders:
+            item_paths.append(entry.path)
+            continue
+        try:
+            item_paths.extend(item_path for item_path in entry.path.iterdir()
+                              if item_path.name not in entry.subfolders and not item_path.name.endswith(PARTIAL_COPY_SUFFIX))
+        except FileNotFoundError:
+            continue
+
+    quarantine_index = get_quarantine_index_logic(current_settings)
+    size_index = get_size_index_logic(current_settings).load()
+
+    def forget_staged(staged_item_paths):
+        quarantine_index.forget([item_path.name for item_path in staged_item_paths if item_path.parent == paths["quarantine"]])
+        purged_volumes = {item_path.name for item_path in staged_item_paths if item_path.parent == paths["archive_volumes"]}
+        if purged_volumes:
+            volume_index = get_volume_index_logic(current_settings).load()
+            volume_index.forget([record.key for record in volume_index.records() if record.volume in purged_volumes])
+        size_index.forget(staged_item_paths)
+
+    try:
+        return _delete_items_via_trash_logic(current_settings, item_paths, log_callback, "ОСВОБОЖДЕНИЕ МЕСТА", forget_staged,
+                                             progress_callback, threads)
+    finally:
+        quarantine_index.close()
+        compact_quarantine_index_logic(current_settings)
+        try:
+            size_index.save()
+        except OSError:
+            pass
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FORMAT_VERSION = 1
+METRICS_FILE_SUFFIX = ".metrics.json"
+
+
+def get_metrics_path_logic(log_path):
+    # "Рекомендации_по_очистке_app_<время>.txt" -> "Рекомендации_по_очистке_app_<время>.metrics.json"
+    return log_path.with_name(log_path.stem + METRICS_FILE_SUFFIX)
+
+
+class RunMetrics:
+    # Counters and timers of one organize/rollback run, safe to update from scan and mover threads.
+    # Stages are wall-clock sections of the run; timings add up the time every thread spent on an activity
+    # (scan, age_check, move, ...), so with several threads they can exceed the wall time.
+    def __init__(self, operation, progress_callback=None):
+        self.operation = operation
+        self.progress_callback = progress_callback
+        self.run_id = None
+        self.stop_reason = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.stages = {}
+        self.timings = {}
+        self.counters = {"items_scanned": 0, "moves": 0, "bytes_moved": 0, "errors": 0, "warnings": 0}
+        self.progress_done = 0
+        self.progress_total = 0
+        self.progress_total_final = False
+        self._progress_started = None
+        self._started = time.perf_counter()
+        self._elapsed = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, stage_name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stages[stage_name] = self.stages.get(stage_name, 0.0) + elapsed
+
+    @contextmanager
+    def timed(self, activity):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(activity, time.perf_counter() - started)
+
+    def add_time(self, activity, seconds):
+        with self._lock:
+            self.timings[activity] = self.timings.get(activity, 0.0) + seconds
+
+    def count(self, counter_name, amount=1):
+        with self._lock:
+            self.counters[counter_name] = self.counters.get(counter_name, 0) + amount
+
+    def count_move(self, size):
+        with self._lock:
+            self.counters["moves"] += 1
+            self.counters["bytes_moved"] += size
+
+    def wrap_log_callback(self, log_callback):
+        def counting_log_callback(action_type, *args, **kwargs):
+            if action_type.startswith(("ОШИБКА", "КРИТИЧЕСКАЯ ОШИБКА")):
+                self.count("errors")
+            elif action_type == "ПРЕДУПРЕЖДЕНИЕ":
+                self.count("warnings")
+            log_callback(action_type, *args, **kwargs)
+        return counting_log_callback
+
+    def add_to_progress_total(self, count=1):
+        # For runs that discover their work as they go; the ETA appears once the total is final.
+        with self._lock:
+            self.progress_total += count
+            if self._progress_started is None:
+                self._progress_started = time.perf_counter()
+        self._notify_progress()
+
+    def set_progress_total(self, total):
+        with self._lock:
+            self.progress_total = total
+            self.progress_total_final = True
+            if self._progress_started is None:
+                self._progress_started = time.perf_counter()
+        self._notify_progress()
+
+    def finalize_progress_total(self):
+        with self._lock:
+            self.progress_total_final = True
+        self._notify_progress()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.progress_done += count
+        self._notify_progress()
+
+    def eta_seconds(self):
+        with self._lock:
+            return self._eta_seconds_locked()
+
+    def _eta_seconds_locked(self):
+        if not self.progress_total_final or not self.progress_done or self._progress_started is None:
+            return None
+        rate = self.progress_done / max(1e-6, time.perf_counter() - self._progress_started)
+        return max(0, self.progress_total - self.progress_done) / rate
+
+    def _notify_progress(self):
+        if self.progress_callback is None:
+            return
+        with self._lock:
+            done_count, total, eta = self.progress_done, self.progress_total, self._eta_seconds_locked()
+        self.progress_callback(done_count, total, eta)
+
+    def finish(self):
+        with self._lock:
+            if self._elapsed is None:
+                self._elapsed = time.perf_counter() - self._started
+                self.finished_at = time.time()
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+            result = {
+                "version": METRICS_FORMAT_VERSION,
+                "operation": self.operation,
+                "run_id": self.run_id,
+                "stopped": self.stop_reason,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "finished_at": datetime.fromtimestamp(self.finished_at).isoformat(timespec="seconds") if self.finished_at else None,
+                "elapsed_s": round(elapsed, 3),
+                "stages_s": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                "timings_s": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+                "progress": {"done": self.progress_done, "total": self.progress_total},
+            }
+            result.update(self.counters)
+        result["moves_per_second"] = round(result["moves"] / elapsed, 1) if elapsed else 0.0
+        result["bytes_per_second"] = round(result["bytes_moved"] / elapsed) if elapsed else 0
+        return result
+
+    def save(self, metrics_path):
+        tmp_path = metrics_path.with_name(metrics_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, metrics_path)
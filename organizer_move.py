@@ -0,0 +1,289 @@
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import sys
+import threading
+from pathlib import Path
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+VERIFY_HASH_CHUNK = 1024 * 1024
+RESUME_CHECK_SIZE = 64 * 1024
+PARTIAL_COPY_SUFFIX = ".organizer_part"
+DIR_DEVICE_CACHE_SIZE = 4096
+
+_renameat2 = None
+_renameat2_loaded = False
+_renameat2_lock = threading.Lock()
+_dir_devices = {}
+
+
+def _load_renameat2():
+    global _renameat2, _renameat2_loaded
+    with _renameat2_lock:
+        if not _renameat2_loaded and sys.platform.startswith("linux"):
+            import ctypes
+            try:
+                # Symbols of the already loaded C library; find_library() would spawn ldconfig and take ~100 ms.
+                renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+                renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                renameat2.restype = ctypes.c_int
+                _renameat2 = renameat2
+            except (OSError, AttributeError):
+                _renameat2 = None
+        _renameat2_loaded = True
+        return _renameat2
+
+
+def _rename_noreplace_syscall(source_path, target_path):
+    # True when renameat2 did the job, False when the kernel or filesystem does not support it.
+    renameat2 = _load_renameat2()
+    if renameat2 is None:
+        return False
+    import ctypes
+    if renameat2(AT_FDCWD, os.fsencode(str(source_path)), AT_FDCWD, os.fsencode(str(target_path)), RENAME_NOREPLACE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+        return False
+    raise OSError(error, os.strerror(error), str(source_path), None, str(target_path))
+
+
+def _rename_noreplace_fallback(source_path, target_path):
+    if sys.platform == "win32":
+        # os.rename never replaces an existing target on Windows.
+        os.rename(source_path, target_path)
+    elif os.path.isdir(source_path) and not os.path.islink(source_path):
+        # Claim the name with an exclusive mkdir; rename() may then replace our own empty placeholder.
+        os.mkdir(target_path)
+        try:
+            os.rename(source_path, target_path)
+        except OSError:
+            os.rmdir(target_path)
+            raise
+    else:
+        try:
+            os.link(source_path, target_path, follow_symlinks=False)
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            # No hard links on this filesystem: the best we can do is a check right before the rename.
+            if os.path.lexists(target_path):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(target_path))
+            os.rename(source_path, target_path)
+            return
+        os.unlink(source_path)
+
+
+def _rename_noreplace(source_path, target_path):
+    try:
+        if not _rename_noreplace_syscall(source_path, target_path):
+            _rename_noreplace_fallback(source_path, target_path)
+    except OSError as e:
+        if e.errno == errno.EEXIST or isinstance(e, FileExistsError):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(target_path)) from None
+        raise
+
+
+def get_partial_copy_path_logic(target_path):
+    # Hidden name next to the target; an interrupted cross-device copy is picked up from here on the next run.
+    return target_path.with_name(f".{target_path.name}{PARTIAL_COPY_SUFFIX}")
+
+
+def _device_of_dir(dir_path, refresh=False):
+    # Mount points rarely change under a running organizer; a long-lived process (watch, GUI) still re-stats
+    # when the cached answer leads to a copy or a failed rename. Cleared when full, like a run-scoped cache.
+    key = os.fspath(dir_path)
+    device = None if refresh else _dir_devices.get(key)
+    if device is None:
+        device = os.stat(key).st_dev
+        if len(_dir_devices) >= DIR_DEVICE_CACHE_SIZE:
+            _dir_devices.clear()
+        _dir_devices[key] = device
+    return device
+
+
+def _read_at(fd, size, offset):
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _write_at(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def _resume_offset(source_fd, target_fd, size):
+    # Keeps what an earlier run copied if its tail still matches the source; otherwise starts over.
+    copied = os.fstat(target_fd).st_size
+    if copied == 0 or copied > size:
+        return 0
+    check_size = min(RESUME_CHECK_SIZE, copied)
+    if _read_at(source_fd, check_size, copied - check_size) != _read_at(target_fd, check_size, copied - check_size):
+        return 0
+    return copied
+
+
+def _copy_range(source_fd, target_fd, offset, size):
+    # Zero-copy where the kernel allows it: copy_file_range (same filesystem type on newer kernels),
+    # then sendfile (Linux accepts a regular file as the output), then plain reads and writes.
+    copy_file_range = getattr(os, "copy_file_range", None)
+    sendfile = getattr(os, "sendfile", None) if sys.platform.startswith("linux") else None
+    while offset < size:
+        count = min(COPY_CHUNK_SIZE, size - offset)
+        if copy_file_range is not None:
+            try:
+                copied = copy_file_range(source_fd, target_fd, count, offset, offset)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EPERM):
+                    raise
+                copy_file_range = None
+                continue
+        elif sendfile is not None:
+            os.lseek(target_fd, offset, os.SEEK_SET)
+            try:
+                copied = sendfile(target_fd, source_fd, offset, count)
+            except OSError as e:
+                if e.errno not in (errno.ENOSYS, errno.EINVAL):
+                    raise
+                sendfile = None
+                continue
+        else:
+            data = _read_at(source_fd, count, offset)
+            _write_at(target_fd, data, offset)
+            copied = len(data)
+        if copied == 0:
+            raise OSError(errno.EIO, "Исходный файл стал короче во время копирования")
+        offset += copied
+
+
+def _file_digest(file_path):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(VERIFY_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _copy_file_data(source_path, target_path, verify):
+    binary_flag = getattr(os, "O_BINARY", 0)
+    source_fd = os.open(source_path, os.O_RDONLY | binary_flag)
+    try:
+        size = os.fstat(source_fd).st_size
+        target_fd = os.open(target_path, os.O_RDWR | os.O_CREAT | binary_flag, 0o600)
+        try:
+            offset = _resume_offset(source_fd, target_fd, size)
+            os.ftruncate(target_fd, offset)
+            _copy_range(source_fd, target_fd, offset, size)
+            os.fsync(target_fd)
+        finally:
+            os.close(target_fd)
+    finally:
+        os.close(source_fd)
+    if verify and _file_digest(source_path) != _file_digest(target_path):
+        os.unlink(target_path)
+        raise OSError(errno.EIO, "Контрольная сумма копии не совпала с исходным файлом", str(source_path))
+    # Archive decisions read mtime, so the copy must keep it.
+    shutil.copystat(source_path, target_path, follow_symlinks=False)
+
+
+def _copy_tree_data(source_dir, target_dir, verify):
+    os.makedirs(target_dir, exist_ok=True)
+    with os.scandir(source_dir) as it:
+        dir_entries = list(it)
+    for dir_entry in dir_entries:
+        source_path = os.path.join(source_dir, dir_entry.name)
+        target_path = os.path.join(target_dir, dir_entry.name)
+        if dir_entry.is_dir(follow_symlinks=False):
+            _copy_tree_data(source_path, target_path, verify)
+        elif dir_entry.is_symlink():
+            if not os.path.lexists(target_path):
+                os.symlink(os.readlink(source_path), target_path)
+        elif dir_entry.is_file(follow_symlinks=False):
+            source_st = dir_entry.stat(follow_symlinks=False)
+            try:
+                target_st = os.lstat(target_path)
+                if target_st.st_size == source_st.st_size and target_st.st_mtime_ns == source_st.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            _copy_file_data(source_path, target_path, verify)
+        else:
+            shutil.copy2(source_path, target_path, follow_symlinks=False)
+    shutil.copystat(source_dir, target_dir, follow_symlinks=False)
+
+
+def _fsync_dir(dir_path):
+    if sys.platform == "win32":
+        return
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _move_across_devices(source_path, target_path, verify):
+    if os.path.lexists(target_path):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(target_path))
+    source_st = os.lstat(source_path)
+    if stat.S_ISLNK(source_st.st_mode):
+        os.symlink(os.readlink(source_path), target_path)
+        os.unlink(source_path)
+        return
+
+    partial_path = get_partial_copy_path_logic(target_path)
+    if stat.S_ISDIR(source_st.st_mode):
+        _copy_tree_data(source_path, partial_path, verify)
+    elif stat.S_ISREG(source_st.st_mode):
+        _copy_file_data(source_path, partial_path, verify)
+    else:
+        shutil.copy2(source_path, partial_path, follow_symlinks=False)
+    try:
+        _rename_noreplace(partial_path, target_path)
+    except FileExistsError:
+        # Taken while we copied: the caller retries under the next free name, which has its own partial copy.
+        if stat.S_ISDIR(source_st.st_mode):
+            shutil.rmtree(partial_path)
+        else:
+            os.unlink(partial_path)
+        raise
+    _fsync_dir(target_path.parent)
+    if stat.S_ISDIR(source_st.st_mode):
+        shutil.rmtree(source_path)
+    else:
+        os.unlink(source_path)
+
+
+def move_no_replace_logic(source_path, target_path, verify=False):
+    # Moves source_path to target_path, raising FileExistsError instead of overwriting an existing target.
+    # Same device: one atomic rename. Another device: chunked copy to a hidden partial name, fsync,
+    # optional checksum, then rename into place and remove the source; an interrupted copy resumes on the next run.
+    # Devices of the parent folders are compared: on overlayfs a file may report another st_dev than its folder.
+    source_path, target_path = Path(source_path), Path(target_path)
+    if _device_of_dir(source_path.parent) != _device_of_dir(target_path.parent) and (
+            _device_of_dir(source_path.parent, refresh=True) != _device_of_dir(target_path.parent, refresh=True)):
+        _move_across_devices(source_path, target_path, verify)
+        return
+    try:
+        _rename_noreplace(source_path, target_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Same st_dev but still another mount (bind mounts, btrfs subvolumes), or a stale cached device.
+        _device_of_dir(source_path.parent, refresh=True)
+        _device_of_dir(target_path.parent, refresh=True)
+        _move_across_devices(source_path, target_path, verify)
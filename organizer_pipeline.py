@@ -0,0 +1,151 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from organizer_logic import (
+    get_organization_context_logic, prepare_organization_dirs_logic, classify_top_level_file_logic,
+    classify_top_level_dir_logic, iter_category_plan_items_logic, detect_content_duplicates_logic,
+    execute_plan_item_logic, open_run_journal_logic, load_folder_age_index_logic, save_folder_age_index_logic,
+    scan_organization_dirs_logic, new_volume_archiver_logic, detect_content_types_logic, record_category_sizes_logic,
+)
+from organizer_metrics import RunMetrics
+from organizer_budget import RunBudget, RunCursor
+from organizer_move import PARTIAL_COPY_SUFFIX
+from organizer_scanner import DirectoryScanCache, ENTRY_FILE, ENTRY_DIR
+
+MOVE_QUEUE_SIZE_PER_MOVER = 64
+
+
+def make_thread_safe_log_callback(log_callback):
+    lock = threading.Lock()
+
+    def locked_log_callback(*args, **kwargs):
+        with lock:
+            log_callback(*args, **kwargs)
+    return locked_log_callback
+
+
+def _mover_loop(move_queue, log_callback, scan_cache, journal, metrics, verify_copy, archiver, budget, cursor):
+    while True:
+        plan_item = move_queue.get()
+        if plan_item is None:
+            return
+        if budget.check() is not None:
+            # Stopped: drain the queue without moving; the cursor keeps these items pending for the next run.
+            continue
+        try:
+            execute_plan_item_logic(plan_item, log_callback, scan_cache, journal, metrics, verify_copy, archiver)
+        except Exception as e:
+            log_callback("ОШИБКА ПЕРЕМЕЩЕНИЯ", plan_item.source.name, reason=f"{e}")
+        cursor.done(cursor.key_for(plan_item.source))
+
+
+def _enqueue_plan_item(plan_item, plan, move_queue, metrics, cursor):
+    cursor.begin(cursor.key_for(plan_item.source))
+    plan.append(plan_item)
+    metrics.add_to_progress_total()
+    move_queue.put(plan_item)
+
+
+def _classify_dir_task(item_path, entry, context, log_callback, move_queue, plan, metrics, budget, cursor):
+    # The folder is begun in the cursor and takes a budget item before the task is queued, so max_items holds
+    # while checks are in flight; a folder that is not old gives the item back, a task skipped after a stop
+    # leaves the folder pending for the next run.
+    cursor_key = cursor.key_for(item_path)
+    if budget.check() is not None:
+        return
+    try:
+        with metrics.timed("age_check"):
+            plan_item = classify_top_level_dir_logic(item_path, entry, context, log_callback)
+    except Exception as e:
+        log_callback("ОШИБКА СКАНИРОВАНИЯ", item_path.name, reason=f"{e}")
+        plan_item = None
+    if plan_item is not None:
+        _enqueue_plan_item(plan_item, plan, move_queue, metrics, cursor)
+    else:
+        budget.release_item()
+        cursor.done(cursor_key)
+
+
+def run_organization_pipelined_logic(current_settings, log_callback_gui, scan_threads, move_threads, metrics=None, budget=None, cursor=None):
+    log_callback = make_thread_safe_log_callback(log_callback_gui)
+    context = get_organization_context_logic(current_settings)
+    downloads_path = context["downloads"]
+    if metrics is None:
+        metrics = RunMetrics("organize")
+    if budget is None:
+        budget = RunBudget()
+    if cursor is None:
+        cursor = RunCursor(None, downloads_path)
+
+    if not downloads_path.is_dir():
+        log_callback("КРИТИЧЕСКАЯ ОШИБКА", downloads_path.name, reason="Папка Загрузок не найдена.")
+        return None
+
+    scan_cache = DirectoryScanCache()
+    top_level_entries = scan_organization_dirs_logic(context, scan_cache, metrics)
+    record_category_sizes_logic(context, scan_cache, log_callback)
+    with metrics.stage("content_dedup"), metrics.timed("hash"):
+        detect_content_duplicates_logic(context, scan_cache, log_callback, hash_threads=scan_threads, budget=budget)
+    with metrics.stage("content_sniffing"), metrics.timed("sniff"):
+        detect_content_types_logic(context, scan_cache, log_callback, sniff_threads=scan_threads, budget=budget)
+    load_folder_age_index_logic(context)
+    prepare_organization_dirs_logic(current_settings, log_callback)
+    journal = open_run_journal_logic(current_settings)
+    metrics.run_id = journal.run_id
+    archiver = new_volume_archiver_logic(current_settings, log_callback, journal, metrics)
+
+    move_threads = max(1, move_threads)
+    move_queue = queue.Queue(maxsize=move_threads * MOVE_QUEUE_SIZE_PER_MOVER)
+    movers = [threading.Thread(target=_mover_loop,
+                               args=(move_queue, log_callback, scan_cache, journal, metrics, context["verify_copies"], archiver, budget, cursor),
+                               daemon=True)
+              for _ in range(move_threads)]
+    for mover in movers:
+        mover.start()
+
+    plan = []
+    try:
+        log_callback("ЭТАП 1", "Обработка элементов на верхнем уровне Загрузок",
+                     reason=f"потоков сканирования: {scan_threads}, перемещения: {move_threads}")
+        with metrics.stage("top_level"):
+            with ThreadPoolExecutor(max_workers=max(1, scan_threads)) as scan_pool:
+                for entry in sorted(top_level_entries, key=lambda entry: entry.name):
+                    if entry.name in context["folders_to_skip"] or entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                        continue
+
+                    item_path = downloads_path / entry.name
+                    cursor_key = cursor.key_for(item_path)
+                    if cursor.should_skip(cursor_key):
+                        continue
+                    if budget.check_planning() is not None:
+                        cursor.stop_at(cursor_key)
+                        break
+                    metrics.count("items_scanned")
+                    if entry.kind == ENTRY_FILE:
+                        budget.take_item()
+                        _enqueue_plan_item(classify_top_level_file_logic(item_path, entry, context), plan, move_queue, metrics, cursor)
+                    elif entry.kind == ENTRY_DIR:
+                        cursor.begin(cursor_key)
+                        budget.take_item()
+                        scan_pool.submit(_classify_dir_task, item_path, entry, context, log_callback, move_queue, plan, metrics, budget, cursor)
+            save_folder_age_index_logic(context, log_callback)
+
+        if budget.stop_reason is None:
+            log_callback("ЭТАП 2", "Проверка на старость файлов внутри папок категорий")
+            with metrics.stage("categories"):
+                for plan_item in iter_category_plan_items_logic(context, scan_cache, metrics, budget, cursor):
+                    _enqueue_plan_item(plan_item, plan, move_queue, metrics, cursor)
+        metrics.finalize_progress_total()
+    finally:
+        # Moves overlap the stages above; this stage is only the tail the movers need after planning ends.
+        with metrics.stage("moves"):
+            for _ in movers:
+                move_queue.put(None)
+            for mover in movers:
+                mover.join()
+            if archiver is not None:
+                archiver.close()
+            journal.close()
+
+    return plan
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from organizer_journal import relative_or_absolute_path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+QUARANTINE_INDEX_FILENAME = ".organizer_quarantine_index.jsonl"
+QUARANTINE_INDEX_MIN_COMPACT_LINES = 256
+QUARANTINE_INDEX_LOCK_SUFFIX = ".lock"
+QUARANTINE_INDEX_LOCK_SLOTS = 256
+
+QuarantineRecord = namedtuple("QuarantineRecord", ["name", "original", "reason", "size", "mtime", "quarantined_at"])
+QuarantineEntry = namedtuple("QuarantineEntry", ["path", "reason", "mtime", "original_path", "quarantined_at"])
+
+
+def _lock_bytes(lock_file, offset, count, mode):
+    lock_file.seek(offset)
+    msvcrt.locking(lock_file.fileno(), mode, count)
+
+
+class QuarantineIndex:
+    # Append-only JSON Lines: {"n", "o", "why", "s", "m", "t"} when an item enters the quarantine,
+    # {"n", "e": "removed"} when it leaves. The last line for a name wins.
+    def __init__(self, index_path, quarantine_path, root_path):
+        self.index_path = Path(index_path)
+        self.quarantine_path = Path(quarantine_path)
+        self.root_path = Path(root_path)
+        self._records = {}
+        self._loaded = False
+        self._line_count = 0
+        self._file = None
+        self._lock_file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        self._records = {}
+        self._loaded = True
+        self._line_count = 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._line_count += 1
+                    if record.get("e") == "removed":
+                        self._records.pop(record.get("n"), None)
+                    elif "n" in record:
+                        self._records[record["n"]] = QuarantineRecord(
+                            record["n"], record.get("o"), record.get("why", ""), record.get("s", 0),
+                            record.get("m", 0.0), record.get("t", 0.0))
+        except FileNotFoundError:
+            pass
+        return self
+
+    def get(self, name):
+        return self._records.get(name)
+
+    def original_path(self, record):
+        if not record.original:
+            return None
+        return self.root_path / record.original
+
+    def _open_lock_file(self, exclusive=False):
+        # Writers of any process hold a shared lock while the index is open for appending; compaction takes it
+        # exclusively without waiting, so it never replaces the file under an open append handle. Without flock
+        # (Windows) the shared lock is one of the slot bytes of the lock file: a writer takes a free slot while
+        # holding the gate byte, compaction needs the gate and every slot at once. None where neither exists.
+        if fcntl is None and msvcrt is None:
+            return None
+        lock_file = open(self.index_path.with_name(self.index_path.name + QUARANTINE_INDEX_LOCK_SUFFIX), "ab")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+            elif exclusive:
+                _lock_bytes(lock_file, 0, 1 + QUARANTINE_INDEX_LOCK_SLOTS, msvcrt.LK_NBLCK)
+            else:
+                _lock_bytes(lock_file, 0, 1, msvcrt.LK_LOCK)
+                try:
+                    for slot in range(1, 1 + QUARANTINE_INDEX_LOCK_SLOTS):
+                        try:
+                            _lock_bytes(lock_file, slot, 1, msvcrt.LK_NBLCK)
+                            break
+                        except OSError:
+                            continue
+                    else:
+                        raise OSError(f"Нет свободного места в блокировке индекса карантина: {lock_file.name}")
+                finally:
+                    _lock_bytes(lock_file, 0, 1, msvcrt.LK_UNLCK)
+        except OSError:
+            lock_file.close()
+            raise
+        return lock_file
+
+    def _append(self, record):
+        if self._file is None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_file = self._open_lock_file()
+            self._file = open(self.index_path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._line_count += 1
+
+    def record_move(self, source_path, target_path, action_type="", reason="", entry=None):
+        if target_path.parent != self.quarantine_path:
+            return
+        if entry is not None:
+            size, mtime = entry.size, entry.mtime
+        else:
+            try:
+                st = os.lstat(target_path)
+                size, mtime = st.st_size, st.st_mtime
+            except OSError:
+                size, mtime = 0, 0.0
+        record = QuarantineRecord(target_path.name, relative_or_absolute_path(source_path, self.root_path), reason,
+                                  size, mtime, round(time.time(), 3))
+        with self._lock:
+            # A journal observer never loads the index and only appends, so memory does not grow with the run.
+            if self._loaded:
+                self._records[record.name] = record
+            self._append({"n": record.name, "o": record.original, "why": record.reason, "s": record.size,
+                          "m": record.mtime, "t": record.quarantined_at})
+
+    def forget(self, names):
+        with self._lock:
+            for name in names:
+                self._records.pop(name, None)
+                self._append({"n": name, "e": "removed"})
+
+    def compact_if_needed(self):
+        # Rewrites the file with the records of items still in the quarantine once removed/stale lines dominate
+        # it. Re-reads the file under the exclusive lock and gives up if another writer has it open.
+        with self._lock:
+            self._close_locked()
+            try:
+                lock_file = self._open_lock_file(exclusive=True)
+            except OSError:
+                return False
+            if lock_file is None:
+                return False
+        try:
+            self.load()
+            with self._lock:
+                if self._line_count < max(QUARANTINE_INDEX_MIN_COMPACT_LINES, 2 * len(self._records)):
+                    return False
+                try:
+                    existing_names = set(os.listdir(self.quarantine_path))
+                except FileNotFoundError:
+                    existing_names = set()
+                self._records = {name: record for name, record in self._records.items() if name in existing_names}
+                tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for record in self._records.values():
+                        f.write(json.dumps({"n": record.name, "o": record.original, "why": record.reason, "s": record.size,
+                                            "m": record.mtime, "t": record.quarantined_at},
+                                           ensure_ascii=False, separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.index_path)
+                self._line_count = len(self._records)
+                return True
+        finally:
+            lock_file.close()
+
+    def _close_locked(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
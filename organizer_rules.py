@@ -0,0 +1,119 @@
+import re
+
+WINDOWS_DUPLICATE_NAME_RE = re.compile(r"(.+)\s\(\d+\)(\.[^.]+)?$")
+WINDOWS_DUPLICATE_STEM_RE = re.compile(r"(.+)\s\(\d+\)")
+
+
+def normalize_suffix(suffix):
+    if not isinstance(suffix, str) or not suffix.strip("."):
+        raise ValueError(f"Некорректное расширение в правилах: {suffix!r}")
+    suffix = suffix.lower()
+    return suffix if suffix.startswith(".") else "." + suffix
+
+
+class ClassificationRules:
+    def __init__(self, categories, junk_extensions, junk_keywords, default_category, custom_categories=None):
+        self.default_category = default_category
+        self.category_names = list(categories)
+        self._category_by_suffix = {}
+        for cat_name, suffixes in categories.items():
+            for suffix in suffixes:
+                self._category_by_suffix.setdefault(normalize_suffix(suffix), cat_name)
+        custom_categories = custom_categories or {}
+        if not isinstance(custom_categories, dict):
+            raise ValueError("custom_categories должен быть словарём 'категория: [расширения]'.")
+        for cat_name, suffixes in custom_categories.items():
+            if not cat_name or cat_name in (".", "..") or "/" in cat_name or "\\" in cat_name:
+                raise ValueError(f"Некорректное имя категории: {cat_name!r}")
+            if not isinstance(suffixes, (list, tuple)):
+                raise ValueError(f"Расширения категории '{cat_name}' должны быть списком.")
+            if cat_name not in self.category_names:
+                self.category_names.append(cat_name)
+            for suffix in suffixes:
+                self._category_by_suffix[normalize_suffix(suffix)] = cat_name
+        if default_category not in self.category_names:
+            self.category_names.append(default_category)
+
+        self._junk_suffixes = {normalize_suffix(suffix) for suffix in junk_extensions}
+        all_suffixes = list(self._category_by_suffix) + list(self._junk_suffixes)
+        self._max_suffix_parts = max([suffix.count(".") for suffix in all_suffixes] or [1])
+
+        self._keywords = {}
+        for keyword in junk_keywords:
+            if not isinstance(keyword, str) or not keyword:
+                raise ValueError(f"Некорректное ключевое слово в правилах: {keyword!r}")
+            self._keywords.setdefault(keyword.lower(), keyword)
+        self._keyword_re = None
+        if self._keywords:
+            alternatives = sorted(self._keywords, key=len, reverse=True)
+            self._keyword_re = re.compile("|".join(re.escape(keyword) for keyword in alternatives))
+
+    def _suffixes(self, lower_name):
+        # Same rule as Path.suffix: a leading dot or a trailing dot does not start a suffix.
+        end = lower_name.rfind(".")
+        if end <= 0 or end == len(lower_name) - 1:
+            return ()
+        if self._max_suffix_parts == 1:
+            return (lower_name[end:],)
+        suffixes = [lower_name[end:]]
+        for _ in range(self._max_suffix_parts - 1):
+            end = lower_name.rfind(".", 0, end)
+            if end <= 0:
+                break
+            suffixes.append(lower_name[end:])
+        suffixes.reverse()
+        return suffixes
+
+    # (junk_extension, junk_keyword, category) for one name, lowercasing and splitting suffixes only once.
+    def classify(self, filename):
+        lower_name = filename.lower()
+        suffixes = self._suffixes(lower_name)
+        junk_extension = None
+        category = None
+        for suffix in suffixes:
+            if junk_extension is None and suffix in self._junk_suffixes:
+                junk_extension = suffix
+            if category is None:
+                category = self._category_by_suffix.get(suffix)
+        junk_keyword = None
+        if junk_extension is None and self._keyword_re is not None:
+            match = self._keyword_re.search(lower_name)
+            if match:
+                junk_keyword = self._keywords[match.group(0)]
+        return junk_extension, junk_keyword, category or self.default_category
+
+    def category_for(self, filename):
+        for suffix in self._suffixes(filename.lower()):
+            if suffix in self._category_by_suffix:
+                return self._category_by_suffix[suffix]
+        return self.default_category
+
+    def category_for_suffix(self, suffix):
+        return self._category_by_suffix.get(suffix.lower(), self.default_category)
+
+    def junk_extension(self, filename):
+        return next((suffix for suffix in self._suffixes(filename.lower()) if suffix in self._junk_suffixes), None)
+
+    def junk_keyword(self, filename):
+        if self._keyword_re is None:
+            return None
+        match = self._keyword_re.search(filename.lower())
+        return self._keywords[match.group(0)] if match else None
+
+    def is_windows_duplicate(self, filename):
+        return ")" in filename and WINDOWS_DUPLICATE_NAME_RE.match(filename) is not None
+
+
+def compile_rules_logic(categories, junk_extensions, junk_keywords, default_category, settings=None):
+    settings = settings or {}
+    custom_junk_extensions = settings.get("custom_junk_extensions", [])
+    custom_junk_keywords = settings.get("custom_junk_keywords", [])
+    if not isinstance(custom_junk_extensions, list) or not isinstance(custom_junk_keywords, list):
+        raise ValueError("custom_junk_extensions и custom_junk_keywords должны быть списками.")
+    return ClassificationRules(
+        categories,
+        list(junk_extensions) + custom_junk_extensions,
+        list(junk_keywords) + custom_junk_keywords,
+        default_category,
+        settings.get("custom_categories", {}),
+    )
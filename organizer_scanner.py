@@ -0,0 +1,242 @@
+import json
+import os
+import stat
+import threading
+from collections import namedtuple
+
+ENTRY_FILE = "file"
+ENTRY_DIR = "dir"
+ENTRY_OTHER = "other"
+
+ScanEntry = namedtuple("ScanEntry", ["name", "kind", "size", "mtime", "dev", "inode"])
+
+
+def entry_from_stat(name, st):
+    if stat.S_ISREG(st.st_mode):
+        kind = ENTRY_FILE
+    elif stat.S_ISDIR(st.st_mode):
+        kind = ENTRY_DIR
+    else:
+        kind = ENTRY_OTHER
+    return ScanEntry(name, kind, st.st_size, st.st_mtime, st.st_dev, st.st_ino)
+
+
+def iter_scan_logic(dir_path):
+    with os.scandir(dir_path) as it:
+        for dir_entry in it:
+            try:
+                st = dir_entry.stat()
+            except OSError:
+                yield ScanEntry(dir_entry.name, ENTRY_OTHER, 0, 0.0, 0, 0)
+                continue
+            yield entry_from_stat(dir_entry.name, st)
+
+
+def scan_directory_logic(dir_path):
+    return list(iter_scan_logic(dir_path))
+
+
+class DirectoryScanCache:
+    def __init__(self):
+        self._entries = {}
+        self._names = {}
+        self._next_counters = {}
+        self.lock = threading.RLock()
+
+    def scan(self, dir_path):
+        with self.lock:
+            return self._scan_locked(dir_path)
+
+    def _scan_locked(self, dir_path):
+        listing = self._entries.get(dir_path)
+        if listing is None:
+            try:
+                listing = {entry.name: entry for entry in iter_scan_logic(dir_path)}
+            except FileNotFoundError:
+                return []
+            self._entries[dir_path] = listing
+            # Names reserved before the listing was made stay reserved.
+            self._names.setdefault(dir_path, set()).update(listing)
+        return list(listing.values())
+
+    def names(self, dir_path):
+        with self.lock:
+            return self._names_locked(dir_path)
+
+    def _names_locked(self, dir_path):
+        names = self._names.get(dir_path)
+        if names is None:
+            try:
+                with os.scandir(dir_path) as it:
+                    names = {dir_entry.name for dir_entry in it}
+            except FileNotFoundError:
+                return set()
+            self._names[dir_path] = names
+        return names
+
+    def is_known_dir(self, dir_path):
+        return dir_path in self._names
+
+    def contains(self, dir_path, name):
+        with self.lock:
+            return name in self._names_locked(dir_path)
+
+    def reserve_name(self, dir_path, name):
+        with self.lock:
+            names = self._names_locked(dir_path)
+            if name in names:
+                return False
+            names.add(name)
+            return True
+
+    def reserve_free_name(self, dir_path, stem, suffix):
+        # Picks "stem suffix" or the first free "stem_N suffix", remembering N per stem so that a folder
+        # already holding file_1 ... file_50000 is not probed from 1 again on every move.
+        with self.lock:
+            names = self._names_locked(dir_path)
+            name = f"{stem}{suffix}"
+            if name not in names:
+                names.add(name)
+                return name
+            counters = self._next_counters.setdefault(dir_path, {})
+            counter = counters.get((stem, suffix), 1)
+            while f"{stem}_{counter}{suffix}" in names:
+                counter += 1
+            name = f"{stem}_{counter}{suffix}"
+            counters[(stem, suffix)] = counter + 1
+            names.add(name)
+            return name
+
+    def release_name(self, dir_path, name):
+        with self.lock:
+            if dir_path in self._names:
+                self._names[dir_path].discard(name)
+
+    def get(self, dir_path, name):
+        with self.lock:
+            listing = self._entries.get(dir_path)
+            return listing.get(name) if listing is not None else None
+
+    def record_move(self, source_path, target_path, source_entry=None):
+        source_dir, target_dir = source_path.parent, target_path.parent
+        with self.lock:
+            entry = source_entry or self.get(source_dir, source_path.name)
+
+            if source_dir in self._entries:
+                self._entries[source_dir].pop(source_path.name, None)
+            if source_dir in self._names:
+                self._names[source_dir].discard(source_path.name)
+
+            if target_dir in self._names:
+                self._names[target_dir].add(target_path.name)
+            if target_dir in self._entries and entry is not None:
+                self._entries[target_dir][target_path.name] = entry._replace(name=target_path.name)
+
+    def invalidate(self, dir_path):
+        with self.lock:
+            self._entries.pop(dir_path, None)
+            self._names.pop(dir_path, None)
+            self._next_counters.pop(dir_path, None)
+
+
+class NameProbingCache:
+    # Stands in for DirectoryScanCache when moving from a stream: no listings are kept, free names are probed
+    # on disk instead, so memory does not grow with the size of the destination folders.
+    def __init__(self):
+        self._known_dirs = set()
+
+    def is_known_dir(self, dir_path):
+        # False the first time a destination is seen, so the caller creates it once; destinations are few.
+        if dir_path in self._known_dirs:
+            return True
+        self._known_dirs.add(dir_path)
+        return False
+
+    def reserve_free_name(self, dir_path, stem, suffix):
+        name = f"{stem}{suffix}"
+        counter = 1
+        while os.path.lexists(os.path.join(dir_path, name)):
+            name = f"{stem}_{counter}{suffix}"
+            counter += 1
+        return name
+
+    def release_name(self, dir_path, name):
+        pass
+
+    def record_move(self, source_path, target_path, source_entry=None):
+        pass
+
+
+AGE_INDEX_FILENAME = ".organizer_age_index.json"
+
+
+def find_fresh_item_logic(folder_path, cutoff_time_ts, ignored_folder_names):
+    pending_dirs = [folder_path]
+    while pending_dirs:
+        dir_path = pending_dirs.pop()
+        try:
+            it = os.scandir(dir_path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with it:
+            for dir_entry in it:
+                if dir_entry.name in ignored_folder_names:
+                    continue
+                try:
+                    mtime = dir_entry.stat().st_mtime
+                    is_dir = dir_entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if mtime >= cutoff_time_ts:
+                    return dir_entry.path, mtime
+                if is_dir:
+                    pending_dirs.append(dir_entry.path)
+    return None
+
+
+class FolderAgeIndex:
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._records = {}
+        self._used_keys = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._records = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._records = {}
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with self._lock:
+            used_records = {key: value for key, value in self._records.items() if key in self._used_keys}
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(used_records, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def lookup_fresh(self, folder_path, cutoff_time_ts, ignored_folder_names):
+        key = str(folder_path)
+        with self._lock:
+            self._used_keys.add(key)
+            record = self._records.get(key)
+        if record is None:
+            return None
+        max_mtime, witness = record
+        if max_mtime < cutoff_time_ts or any(part in ignored_folder_names for part in witness.split("/")):
+            return None
+        try:
+            witness_mtime = os.stat(os.path.join(key, witness)).st_mtime
+        except OSError:
+            return None
+        return witness if witness_mtime >= cutoff_time_ts else None
+
+    def record(self, folder_path, max_mtime, witness_path):
+        key = str(folder_path)
+        witness = os.path.relpath(witness_path, key).replace(os.sep, "/")
+        with self._lock:
+            self._used_keys.add(key)
+            self._records[key] = [max_mtime, witness]
@@ -0,0 +1,243 @@
+import json
+import os
+import stat
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from organizer_move import PARTIAL_COPY_SUFFIX
+from organizer_scanner import ENTRY_FILE, ENTRY_DIR
+
+SIZE_INDEX_FILENAME = ".organizer_size_index.json"
+
+SizeTotals = namedtuple("SizeTotals", ["bytes", "files", "newest_mtime"])
+
+
+def _identity(st):
+    return f"{st.st_dev}:{st.st_ino}"
+
+
+def walk_folder_totals_logic(folder_path):
+    # Bytes and count of the regular files under folder_path and the newest of their mtimes (the folder's own
+    # mtime if it holds no files). Symlinks are not followed; partial copies waiting to be resumed are not counted.
+    total_bytes = file_count = 0
+    newest_mtime = None
+    pending_dirs = [folder_path]
+    while pending_dirs:
+        try:
+            it = os.scandir(pending_dirs.pop())
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with it:
+            for dir_entry in it:
+                if dir_entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                    continue
+                try:
+                    st = dir_entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    pending_dirs.append(dir_entry.path)
+                elif stat.S_ISREG(st.st_mode):
+                    total_bytes += st.st_size
+                    file_count += 1
+                    if newest_mtime is None or st.st_mtime > newest_mtime:
+                        newest_mtime = st.st_mtime
+    if newest_mtime is None:
+        newest_mtime = os.lstat(folder_path).st_mtime
+    return SizeTotals(total_bytes, file_count, newest_mtime)
+
+
+def add_totals(totals, other):
+    if totals is None:
+        return other
+    if not totals.files:
+        newest_mtime = other.newest_mtime if other.files else max(totals.newest_mtime, other.newest_mtime)
+    else:
+        newest_mtime = max(totals.newest_mtime, other.newest_mtime) if other.files else totals.newest_mtime
+    return SizeTotals(totals.bytes + other.bytes, totals.files + other.files, newest_mtime)
+
+
+class FolderSizeIndex:
+    # Cumulative bytes, file count and newest file mtime per folder: {path: [bytes, files, newest_mtime,
+    # "dev:ino", folder mtime, [subfolder names]]}. A record is trusted while the folder keeps its inode and
+    # mtime, so only folders whose direct entries changed are listed again, and a folder moved as a whole keeps
+    # its record under the new path. Subfolders are the report's own rows (archive buckets) and are not
+    # included in the record of their parent. Changes deep inside a folder that do not touch the folder itself
+    # are only picked up by a rescan.
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        self._records = {}
+        self._used_keys = set()
+        self._listed_keys = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._records = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._records = {}
+        return self
+
+    def save(self, prune_unused=False):
+        # prune_unused drops the records not used since load (the report touches every row), except those of
+        # items inside a folder whose cached record was trusted and which therefore were not looked at.
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            records = dict(self._records)
+            if prune_unused:
+                records = {key: record for key, record in records.items() if key in self._used_keys or (
+                    os.path.dirname(key) in self._used_keys and os.path.dirname(key) not in self._listed_keys)}
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def _lookup(self, key, identity, mtime):
+        with self._lock:
+            self._used_keys.add(key)
+            record = self._records.get(key)
+        if record is None or record[3] != identity or record[4] != mtime:
+            return None
+        return SizeTotals(*record[:3]), record[5]
+
+    def _store(self, key, identity, mtime, totals, subfolder_names=()):
+        with self._lock:
+            self._used_keys.add(key)
+            self._records[key] = [totals.bytes, totals.files, totals.newest_mtime, identity, mtime, list(subfolder_names)]
+
+    def folder_totals(self, folder_path, st, rescan=False):
+        key = str(folder_path)
+        cached = None if rescan else self._lookup(key, _identity(st), st.st_mtime)
+        if cached is not None and not cached[1]:
+            return cached[0]
+        totals = walk_folder_totals_logic(folder_path)
+        self._store(key, _identity(st), st.st_mtime, totals)
+        return totals
+
+    def item_totals(self, item_path, st, rescan=False):
+        if stat.S_ISDIR(st.st_mode):
+            return self.folder_totals(item_path, st, rescan)
+        if stat.S_ISREG(st.st_mode):
+            return SizeTotals(st.st_size, 1, st.st_mtime)
+        return SizeTotals(0, 0, st.st_mtime)
+
+    def container_totals(self, dir_path, is_subfolder=None, rescan=False):
+        # Totals of dir_path without the subfolders that is_subfolder(name) picks out, and the names of those.
+        # Returns None if dir_path is missing.
+        try:
+            st = os.lstat(dir_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        key = str(dir_path)
+        cached = None if rescan else self._lookup(key, _identity(st), st.st_mtime)
+        if cached is not None:
+            return cached
+        totals = None
+        subfolder_names = []
+        with self._lock:
+            self._listed_keys.add(key)
+        with os.scandir(dir_path) as it:
+            for dir_entry in it:
+                if dir_entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                    continue
+                try:
+                    child_st = dir_entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.S_ISDIR(child_st.st_mode) and is_subfolder is not None and is_subfolder(dir_entry.name):
+                    subfolder_names.append(dir_entry.name)
+                    continue
+                totals = add_totals(totals, self.item_totals(Path(dir_entry.path), child_st, rescan))
+        totals = totals or SizeTotals(0, 0, st.st_mtime)
+        self._store(key, _identity(st), st.st_mtime, totals, sorted(subfolder_names))
+        return totals, sorted(subfolder_names)
+
+    def record_listing(self, dir_path, entries):
+        # Feeds a listing the scanner already made (ScanEntry carries size, mtime and identity), so a category
+        # folder is indexed without another pass. Skipped if a subfolder has no valid record yet.
+        totals = None
+        with self._lock:
+            for entry in entries:
+                if entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                    continue
+                if entry.kind == ENTRY_DIR:
+                    record = self._records.get(str(Path(dir_path) / entry.name))
+                    if record is None or record[3] != f"{entry.dev}:{entry.inode}" or record[4] != entry.mtime or record[5]:
+                        return
+                    other = SizeTotals(*record[:3])
+                elif entry.kind == ENTRY_FILE:
+                    other = SizeTotals(entry.size, 1, entry.mtime)
+                else:
+                    continue
+                totals = add_totals(totals, other)
+        try:
+            st = os.lstat(dir_path)
+        except OSError:
+            return
+        self._store(str(dir_path), _identity(st), st.st_mtime, totals or SizeTotals(0, 0, st.st_mtime))
+
+    def _adjust_locked(self, dir_path, totals, sign):
+        key = str(dir_path)
+        record = self._records.get(key)
+        if record is None:
+            return
+        try:
+            st = os.lstat(dir_path)
+        except OSError:
+            del self._records[key]
+            return
+        if record[3] != _identity(st):
+            del self._records[key]
+            return
+        newest_mtime = record[2]
+        if sign > 0 and totals.files:
+            newest_mtime = max(newest_mtime, totals.newest_mtime) if record[1] else totals.newest_mtime
+        record[0] = max(0, record[0] + sign * totals.bytes)
+        record[1] = max(0, record[1] + sign * totals.files)
+        record[2] = newest_mtime
+        record[4] = st.st_mtime
+
+    def record_move(self, source_path, target_path, action_type="", reason="", entry=None):
+        # Journal observer: the moved item's totals leave the record of its old folder and join the new one,
+        # so neither folder has to be listed again.
+        with self._lock:
+            moved_record = self._records.pop(str(source_path), None)
+        if entry is not None and entry.kind == ENTRY_FILE:
+            totals = SizeTotals(entry.size, 1, entry.mtime)
+        else:
+            try:
+                st = os.lstat(target_path)
+            except OSError:
+                st = None
+            if st is None or stat.S_ISDIR(st.st_mode):
+                totals = None
+                if moved_record is not None and st is not None and moved_record[3] == _identity(st) and not moved_record[5]:
+                    # A rename keeps the folder's inode and mtime.
+                    totals = SizeTotals(*moved_record[:3])
+                    self._store(str(target_path), moved_record[3], moved_record[4], totals)
+            else:
+                totals = SizeTotals(st.st_size, 1, st.st_mtime) if stat.S_ISREG(st.st_mode) else SizeTotals(0, 0, st.st_mtime)
+        with self._lock:
+            if totals is None:
+                # A folder that was never measured: both folders are listed again on the next report.
+                self._records.pop(str(source_path.parent), None)
+                self._records.pop(str(target_path.parent), None)
+                return
+            self._adjust_locked(source_path.parent, totals, -1)
+            self._adjust_locked(target_path.parent, totals, +1)
+
+    def forget(self, paths):
+        # Drops the records of the given folders and everything below them.
+        prefixes = [str(path) for path in paths]
+        with self._lock:
+            for key in list(self._records):
+                if any(key == prefix or key.startswith(prefix + os.sep) for prefix in prefixes):
+                    del self._records[key]
+
+    def close(self):
+        try:
+            self.save()
+        except OSError:
+            pass
@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+SNIFF_CACHE_FILENAME = ".organizer_sniff_cache.json"
+SNIFF_HEADER_SIZE = 512
+# ISO 9660 keeps its signature in the first volume descriptor, past the 32 KiB system area.
+ISO_SIGNATURE_OFFSET = 0x8001
+ISO_SIGNATURE = b"CD001"
+
+# (offset, magic, suffix) checked in order against the first SNIFF_HEADER_SIZE bytes.
+MAGIC_SIGNATURES = [
+    (0, b"%PDF-", ".pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", ".png"),
+    (0, b"\xff\xd8\xff", ".jpg"),
+    (0, b"GIF87a", ".gif"),
+    (0, b"GIF89a", ".gif"),
+    (0, b"\x1a\x45\xdf\xa3", ".mkv"),
+    (0, b"ID3", ".mp3"),
+    (0, b"OggS", ".ogg"),
+    (0, b"fLaC", ".flac"),
+    (0, b"\x7fELF", ".exe"),
+    (0, b"MZ", ".exe"),
+    (0, b"\x1f\x8b", ".gz"),
+    (0, b"7z\xbc\xaf\x27\x1c", ".7z"),
+    (0, b"Rar!\x1a\x07", ".rar"),
+    (0, b"BZh", ".bz2"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc"),
+    (257, b"ustar", ".tar"),
+]
+RIFF_SUFFIXES = {b"WEBP": ".webp", b"AVI ": ".avi", b"WAVE": ".wav"}
+FTYP_SUFFIXES = {b"M4A ": ".m4a", b"qt  ": ".mov", b"heic": ".heic", b"heix": ".heic", b"mif1": ".heic", b"avif": ".avif"}
+ZIP_MIMETYPE_SUFFIXES = {b"application/epub+zip": ".epub", b"application/vnd.oasis.opendocument.text": ".odt"}
+# First member of the archive -> suffix; OOXML writes [Content_Types].xml first, APK and JAR start with their manifests.
+ZIP_FIRST_MEMBER_SUFFIXES = [
+    (b"[Content_Types].xml", ".docx"),
+    (b"word/", ".docx"),
+    (b"xl/", ".xlsx"),
+    (b"ppt/", ".pptx"),
+    (b"AndroidManifest.xml", ".apk"),
+    (b"META-INF/", ".jar"),
+]
+
+
+def _read_at(fd, size, offset):
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _zip_suffix(header):
+    # Looks at the first local file header only: its name, and for ODF/EPUB the stored "mimetype" member.
+    name_length = int.from_bytes(header[26:28], "little")
+    extra_length = int.from_bytes(header[28:30], "little")
+    name = header[30:30 + name_length]
+    if name == b"mimetype":
+        data_start = 30 + name_length + extra_length
+        mimetype = header[data_start:data_start + 64]
+        for known_mimetype, suffix in ZIP_MIMETYPE_SUFFIXES.items():
+            if mimetype.startswith(known_mimetype):
+                return suffix
+    for prefix, suffix in ZIP_FIRST_MEMBER_SUFFIXES:
+        if name.startswith(prefix):
+            return suffix
+    return ".zip"
+
+
+def sniff_header_logic(header):
+    if header.startswith(b"PK\x03\x04"):
+        return _zip_suffix(header)
+    if header.startswith(b"RIFF"):
+        return RIFF_SUFFIXES.get(header[8:12])
+    if header[4:8] == b"ftyp":
+        return FTYP_SUFFIXES.get(header[8:12], ".mp4")
+    for offset, magic, suffix in MAGIC_SIGNATURES:
+        if header.startswith(magic, offset):
+            return suffix
+    return None
+
+
+def sniff_file_type_logic(file_path, size):
+    # One positioned read of the header; disk images need a second small read at the ISO descriptor.
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        suffix = sniff_header_logic(_read_at(fd, SNIFF_HEADER_SIZE, 0))
+        if suffix is None and size >= ISO_SIGNATURE_OFFSET + len(ISO_SIGNATURE):
+            if _read_at(fd, len(ISO_SIGNATURE), ISO_SIGNATURE_OFFSET) == ISO_SIGNATURE:
+                suffix = ".iso"
+    finally:
+        os.close(fd)
+    return suffix
+
+
+def sniff_file_types_logic(candidates, sniff_cache, log_callback, sniff_threads=1, budget=None):
+    # {path: suffix} for the candidates whose content matched a signature. Unknown content is cached as ""
+    # so the same unrecognised file is not read again on the next run.
+    suffixes = {}
+    to_sniff = []
+    for file_path, entry in candidates:
+        cached = sniff_cache.get(entry, "t")
+        if cached is not None:
+            if cached:
+                suffixes[file_path] = cached
+        else:
+            to_sniff.append((file_path, entry))
+
+    def sniff(candidate):
+        file_path, entry = candidate
+        if budget is not None and budget.check_planning() is not None:
+            return candidate, None
+        try:
+            return candidate, sniff_file_type_logic(file_path, entry.size) or ""
+        except OSError as e:
+            log_callback("ОШИБКА ЧТЕНИЯ", file_path.name, reason=f"{e}")
+            return candidate, None
+
+    with ThreadPoolExecutor(max_workers=max(1, sniff_threads)) as pool:
+        for (file_path, entry), suffix in pool.map(sniff, to_sniff):
+            if suffix is not None:
+                sniff_cache.put(entry, "t", suffix)
+                if suffix:
+                    suffixes[file_path] = suffix
+    return suffixes
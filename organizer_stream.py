@@ -0,0 +1,128 @@
+from itertools import chain
+
+from organizer_logic import (
+    get_organization_context_logic, prepare_organization_dirs_logic, classify_top_level_file_logic, classify_top_level_dir_logic,
+    get_old_file_archive_path_logic, execute_plan_item_logic, open_run_journal_logic, new_volume_archiver_logic,
+    new_run_budget_logic, PlanItem,
+)
+from organizer_budget import STOP_REASON_NAMES
+from organizer_metrics import RunMetrics
+from organizer_move import PARTIAL_COPY_SUFFIX
+from organizer_scanner import ENTRY_FILE, ENTRY_DIR, NameProbingCache, iter_scan_logic
+from organizer_sniff import sniff_file_type_logic
+
+# Streaming mode for folders with millions of entries: scanning, classification and moves are chained generators
+# over os.scandir, so only the item being moved is held in memory. What it gives up for that:
+# - no content dedup (it needs every file size at once); copies are found by the " (N)" name suffix instead;
+# - no hash, sniff or folder age caches, which grow with the folder;
+# - items come in directory order, not name order, and there is no resume cursor: moved items leave the
+#   folder, so a stopped run is resumed simply by running again.
+
+
+def _sniff_stream_file_logic(item_path, entry, context, log_callback):
+    context["sniffed_types"] = {}
+    if not context["content_sniffing"]:
+        return
+    rules = context["rules"]
+    junk_extension, keyword, category_name = rules.classify(entry.name)
+    if junk_extension or keyword or category_name != rules.default_category:
+        return
+    try:
+        suffix = sniff_file_type_logic(item_path, entry.size)
+    except OSError as e:
+        log_callback("ОШИБКА ЧТЕНИЯ", item_path.name, reason=f"{e}")
+        return
+    if suffix:
+        context["sniffed_types"] = {item_path: suffix}
+
+
+def iter_top_level_plan_items_logic(context, log_callback, metrics, budget):
+    downloads_path = context["downloads"]
+    for entry in iter_scan_logic(downloads_path):
+        if entry.name in context["folders_to_skip"] or entry.name.endswith(PARTIAL_COPY_SUFFIX):
+            continue
+        if budget.check_planning() is not None:
+            return
+        metrics.count("items_scanned")
+        item_path = downloads_path / entry.name
+        plan_item = None
+        if entry.kind == ENTRY_FILE:
+            with metrics.timed("sniff"):
+                _sniff_stream_file_logic(item_path, entry, context, log_callback)
+            plan_item = classify_top_level_file_logic(item_path, entry, context)
+        elif entry.kind == ENTRY_DIR:
+            with metrics.timed("age_check"):
+                plan_item = classify_top_level_dir_logic(item_path, entry, context, log_callback)
+        if plan_item is not None:
+            budget.take_item()
+            yield plan_item
+
+
+def iter_category_stream_plan_items_logic(context, metrics, budget):
+    for category_name in context["category_folder_names"]:
+        category_path = context["downloads"] / category_name
+        try:
+            for entry in iter_scan_logic(category_path):
+                if budget.check_planning() is not None:
+                    return
+                metrics.count("items_scanned")
+                if entry.kind != ENTRY_FILE or entry.mtime >= context["cutoff_time_ts"] or entry.name.endswith(PARTIAL_COPY_SUFFIX):
+                    continue
+                item_path = category_path / entry.name
+                budget.take_item()
+                yield PlanItem(item_path, get_old_file_archive_path_logic(item_path, entry, context), "В АРХИВ (ИЗ КАТЕГОРИИ)", "", entry)
+        except FileNotFoundError:
+            continue
+
+
+def run_organization_streaming_logic(current_settings, log_callback_gui, dry_run=False, metrics=None, budget=None):
+    # Returns the number of planned items (None if Downloads is missing); a dry run logs each item as "ПЛАН (...)".
+    if metrics is None:
+        metrics = RunMetrics("dry_run" if dry_run else "organize")
+    if budget is None:
+        budget = new_run_budget_logic(current_settings)
+    log_callback_gui = metrics.wrap_log_callback(log_callback_gui)
+    try:
+        context = get_organization_context_logic(current_settings)
+        context["content_dedup"] = False
+        downloads_path = context["downloads"]
+        if not downloads_path.is_dir():
+            log_callback_gui("КРИТИЧЕСКАЯ ОШИБКА", downloads_path.name, reason="Папка Загрузок не найдена.")
+            return None
+
+        log_callback_gui("ПОТОКОВЫЙ РЕЖИМ", downloads_path.name, reason="сканирование, классификация и перемещение по одному элементу")
+        plan_items = chain(iter_top_level_plan_items_logic(context, log_callback_gui, metrics, budget),
+                           iter_category_stream_plan_items_logic(context, metrics, budget))
+        planned_count = 0
+        if dry_run:
+            with metrics.stage("stream"):
+                for plan_item in plan_items:
+                    planned_count += 1
+                    log_callback_gui(f"ПЛАН ({plan_item.action})", plan_item.source, plan_item.destination, plan_item.reason)
+            return planned_count
+
+        prepare_organization_dirs_logic(current_settings, log_callback_gui)
+        name_cache = NameProbingCache()
+        with open_run_journal_logic(current_settings) as journal:
+            metrics.run_id = journal.run_id
+            archiver = new_volume_archiver_logic(current_settings, log_callback_gui, journal, metrics)
+            try:
+                with metrics.stage("stream"):
+                    for plan_item in plan_items:
+                        if budget.check() is not None:
+                            break
+                        planned_count += 1
+                        metrics.add_to_progress_total()
+                        execute_plan_item_logic(plan_item, log_callback_gui, name_cache, journal, metrics,
+                                                context["verify_copies"], archiver)
+            finally:
+                if archiver is not None:
+                    with metrics.stage("compress"):
+                        archiver.close()
+        return planned_count
+    finally:
+        metrics.stop_reason = budget.stop_reason
+        if budget.stop_reason is not None:
+            log_callback_gui("ОСТАНОВКА", f"Запуск остановлен: {STOP_REASON_NAMES.get(budget.stop_reason, budget.stop_reason)}",
+                             reason="следующий запуск продолжит с оставшихся элементов")
+        metrics.finish()
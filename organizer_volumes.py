@@ -0,0 +1,631 @@
+import io
+import json
+import lzma
+import os
+import queue
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque, namedtuple
+from pathlib import Path
+
+from organizer_journal import relative_or_absolute_path
+from organizer_move import get_partial_copy_path_logic, move_no_replace_logic
+
+VOLUME_INDEX_FILENAME = ".organizer_volume_index.jsonl"
+VOLUME_FORMAT_TAR_XZ = "tar.xz"
+VOLUME_FORMAT_ZIP = "zip"
+DEFAULT_VOLUME_MAX_BYTES = 1024 * 1024 * 1024
+XZ_PRESET = 6
+READ_CHUNK = 1024 * 1024
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+COMMIT_EVERY_BYTES = 64 * 1024 * 1024
+COMMIT_EVERY_ITEMS = 256
+ARCHIVER_QUEUE_SIZE = 64
+
+MEMBER_FILE = "file"
+MEMBER_DIR = "dir"
+MEMBER_SYMLINK = "symlink"
+
+VolumeMemberSource = namedtuple("VolumeMemberSource", ["path", "name", "kind", "size", "mtime", "mode", "linkname"])
+VolumeRecord = namedtuple("VolumeRecord", ["key", "volume", "original", "action", "reason", "size", "archived_at", "members"])
+
+
+def iter_volume_members_logic(source_path, key):
+    # Folder first, then its contents depth-first, so extraction can create parents before children.
+    source_path = Path(source_path)
+    st = os.lstat(source_path)
+    yield _member_from_stat(source_path, key, st)
+    if stat.S_ISDIR(st.st_mode):
+        yield from _iter_dir_members(source_path, key)
+
+
+def _iter_dir_members(dir_path, name):
+    with os.scandir(dir_path) as it:
+        dir_entries = sorted(it, key=lambda dir_entry: dir_entry.name)
+    for dir_entry in dir_entries:
+        member = _member_from_stat(Path(dir_entry.path), f"{name}/{dir_entry.name}", dir_entry.stat(follow_symlinks=False))
+        yield member
+        if member.kind == MEMBER_DIR:
+            yield from _iter_dir_members(dir_entry.path, member.name)
+
+
+def _member_from_stat(path, name, st):
+    if stat.S_ISREG(st.st_mode):
+        return VolumeMemberSource(path, name, MEMBER_FILE, st.st_size, st.st_mtime, st.st_mode, "")
+    if stat.S_ISDIR(st.st_mode):
+        return VolumeMemberSource(path, name, MEMBER_DIR, 0, st.st_mtime, st.st_mode, "")
+    if stat.S_ISLNK(st.st_mode):
+        return VolumeMemberSource(path, name, MEMBER_SYMLINK, 0, st.st_mtime, st.st_mode, os.readlink(path))
+    raise OSError(f"Неподдерживаемый тип файла для сжатого архива: {path}")
+
+
+def _tar_header(member):
+    info = tarfile.TarInfo(member.name)
+    info.mtime = int(member.mtime)
+    info.mode = stat.S_IMODE(member.mode)
+    if member.kind == MEMBER_DIR:
+        info.type = tarfile.DIRTYPE
+    elif member.kind == MEMBER_SYMLINK:
+        info.type = tarfile.SYMTYPE
+        info.linkname = member.linkname
+    else:
+        info.size = member.size
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+class TarXzVolume:
+    # Every member is its own xz stream holding a tar header and data. Concatenated streams are still one valid
+    # .tar.xz for tar/xz, and the index keeps each stream's offset, so one member is read without the rest.
+    suffix = ".tar.xz"
+    commits_mid_volume = True
+
+    def __init__(self, volume_path):
+        self.path = volume_path
+        self._file = open(volume_path, "xb")
+
+    @property
+    def size(self):
+        return self._file.tell()
+
+    @staticmethod
+    def prepare(member):
+        # Runs on the compression pool; lzma releases the GIL, so members compress in parallel.
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=XZ_PRESET)
+        spool.write(compressor.compress(_tar_header(member)))
+        if member.kind == MEMBER_FILE:
+            remaining = member.size
+            with open(member.path, "rb") as f:
+                while remaining:
+                    chunk = f.read(min(READ_CHUNK, remaining))
+                    if not chunk:
+                        spool.close()
+                        raise OSError(f"Файл стал короче во время сжатия: {member.path}")
+                    spool.write(compressor.compress(chunk))
+                    remaining -= len(chunk)
+            spool.write(compressor.compress(b"\0" * (-member.size % tarfile.BLOCKSIZE)))
+        spool.write(compressor.flush())
+        spool.seek(0)
+        return spool
+
+    def write(self, member, prepared):
+        offset = self._file.tell()
+        with prepared:
+            shutil.copyfileobj(prepared, self._file, READ_CHUNK)
+        return offset, self._file.tell() - offset
+
+    def mark(self):
+        return self._file.tell()
+
+    def truncate(self, mark):
+        # Cuts off everything written after mark (the members of an item that failed halfway).
+        self._file.seek(mark)
+        self._file.truncate()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        # End-of-archive marker (two zero blocks) as a last stream of its own.
+        self._file.write(lzma.compress(b"\0" * (2 * tarfile.BLOCKSIZE), format=lzma.FORMAT_XZ, preset=XZ_PRESET))
+        self.sync()
+        self._file.close()
+
+
+class _DeflatedMember:
+    # Raw deflate data of one zip member with the CRC and sizes its headers need.
+    def __init__(self, data, crc, compress_size):
+        self.data = data
+        self.crc = crc
+        self.compress_size = compress_size
+
+    def close(self):
+        self.data.close()
+
+
+def _zip_info(member, name):
+    zip_info = zipfile.ZipInfo(name, time.localtime(max(member.mtime, 315532800))[:6])
+    zip_info.external_attr = member.mode << 16
+    return zip_info
+
+
+class ZipVolume:
+    # File members are deflated on the compression pool like xz streams; the writer thread only copies the
+    # compressed bytes behind a local header. The central directory gives random access, but it is only written
+    # on close, so items of a zip volume are committed when the volume is closed.
+    suffix = ".zip"
+    commits_mid_volume = False
+
+    def __init__(self, volume_path):
+        self.path = volume_path
+        self._file = open(volume_path, "xb")
+        self._zip = zipfile.ZipFile(self._file, "w", compression=zipfile.ZIP_DEFLATED, strict_timestamps=False)
+
+    @property
+    def size(self):
+        return self._file.tell()
+
+    @staticmethod
+    def prepare(member):
+        # zlib releases the GIL, so members compress in parallel.
+        if member.kind != MEMBER_FILE:
+            return None
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        crc = 0
+        remaining = member.size
+        with open(member.path, "rb") as f:
+            while remaining:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    spool.close()
+                    raise OSError(f"Файл стал короче во время сжатия: {member.path}")
+                crc = zlib.crc32(chunk, crc)
+                spool.write(compressor.compress(chunk))
+                remaining -= len(chunk)
+        spool.write(compressor.flush())
+        compress_size = spool.tell()
+        spool.seek(0)
+        return _DeflatedMember(spool, crc, compress_size)
+
+    def write(self, member, prepared):
+        if member.kind != MEMBER_FILE:
+            name = member.name + "/" if member.kind == MEMBER_DIR else member.name
+            self._zip.writestr(_zip_info(member, name), member.linkname)
+            return None, None
+        # What ZipFile.write does after compressing, with the data deflated beforehand: local header, data,
+        # then the entry is registered for the central directory and the next member starts after it.
+        zip_info = _zip_info(member, member.name)
+        zip_info.compress_type = zipfile.ZIP_DEFLATED
+        zip_info.file_size = member.size
+        zip_info.compress_size = prepared.compress_size
+        zip_info.CRC = prepared.crc
+        zip_info.header_offset = self._zip.start_dir
+        self._file.seek(self._zip.start_dir)
+        try:
+            self._file.write(zip_info.FileHeader())
+            shutil.copyfileobj(prepared.data, self._file, READ_CHUNK)
+        finally:
+            prepared.close()
+        self._zip.start_dir = self._file.tell()
+        self._zip.filelist.append(zip_info)
+        self._zip.NameToInfo[zip_info.filename] = zip_info
+        self._zip._didModify = True
+        return None, None
+
+    def mark(self):
+        return self._zip.start_dir, len(self._zip.filelist)
+
+    def truncate(self, mark):
+        start_dir, member_count = mark
+        for zip_info in self._zip.filelist[member_count:]:
+            self._zip.NameToInfo.pop(zip_info.filename, None)
+        del self._zip.filelist[member_count:]
+        self._zip.start_dir = start_dir
+        self._file.seek(start_dir)
+        self._file.truncate()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._zip.close()
+        self.sync()
+        self._file.close()
+
+
+VOLUME_FORMATS = {VOLUME_FORMAT_TAR_XZ: TarXzVolume, VOLUME_FORMAT_ZIP: ZipVolume}
+
+
+class VolumeIndex:
+    # Append-only JSON Lines like the quarantine index: {"k", "v", "o", "a", "why", "s", "t", "m": [[name, offset, length,
+    # kind, mtime], ...]} when an item is packed, {"k", "e": "removed"} when it is restored. The last line for a key wins.
+    def __init__(self, index_path, volumes_path, root_path):
+        self.index_path = Path(index_path)
+        self.volumes_path = Path(volumes_path)
+        self.root_path = Path(root_path)
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        self._records = {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("e") == "removed":
+                        self._records.pop(record.get("k"), None)
+                    elif "k" in record:
+                        self._records[record["k"]] = VolumeRecord(
+                            record["k"], record["v"], record.get("o"), record.get("a", ""), record.get("why", ""),
+                            record.get("s", 0), record.get("t", 0.0), record.get("m", []))
+        except FileNotFoundError:
+            pass
+        return self
+
+    def records(self):
+        with self._lock:
+            return list(self._records.values())
+
+    def get(self, key):
+        return self._records.get(key)
+
+    def original_path(self, record):
+        return self.root_path / record.original
+
+    def member_path(self, record):
+        # The "target" of a packed item in the move journal: <volume>/<key>.
+        return self.volumes_path / record.volume / record.key
+
+    def lookup_member_path(self, target_path):
+        try:
+            relative_parts = Path(target_path).relative_to(self.volumes_path).parts
+        except ValueError:
+            return None
+        if len(relative_parts) < 2:
+            return None
+        record = self._records.get("/".join(relative_parts[1:]))
+        return record if record is not None and record.volume == relative_parts[0] else None
+
+    def _append(self, lines):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_items(self, records):
+        with self._lock:
+            self._append([{"k": record.key, "v": record.volume, "o": record.original, "a": record.action,
+                           "why": record.reason, "s": record.size, "t": record.archived_at, "m": record.members}
+                          for record in records])
+            for record in records:
+                self._records[record.key] = record
+
+    def forget(self, keys):
+        with self._lock:
+            self._append([{"k": key, "e": "removed"} for key in keys])
+            for key in keys:
+                self._records.pop(key, None)
+
+    def volume_in_use(self, volume_name):
+        with self._lock:
+            return any(record.volume == volume_name for record in self._records.values())
+
+
+class _XzRangeReader(io.RawIOBase):
+    # Decompresses one xz stream located at [offset, offset + length) of a volume.
+    def __init__(self, volume_file, offset, length):
+        volume_file.seek(offset)
+        self._file = volume_file
+        self._remaining = length
+        self._decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            if self._decompressor.eof:
+                return 0
+            data = b""
+            if self._decompressor.needs_input:
+                if not self._remaining:
+                    raise EOFError("Поток xz в томе оборван")
+                data = self._file.read(min(READ_CHUNK, self._remaining))
+                self._remaining -= len(data)
+            self._buffer = self._decompressor.decompress(data, max_length=READ_CHUNK)
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+
+def _member_target_path(record, member_name, target_path):
+    relative_name = member_name[len(record.key):].lstrip("/")
+    if ".." in Path(relative_name).parts:
+        raise OSError(f"Недопустимое имя в томе: {member_name}")
+    return target_path / relative_name if relative_name else target_path
+
+
+def _extract_members(record, volume_path, target_path):
+    dir_times = []
+    if record.volume.endswith(ZipVolume.suffix):
+        with zipfile.ZipFile(volume_path) as zip_file:
+            for member_name, _, _, kind, mtime in record.members:
+                member_path = _member_target_path(record, member_name, target_path)
+                if kind == MEMBER_DIR:
+                    member_path.mkdir(exist_ok=True)
+                    dir_times.append((member_path, mtime))
+                    continue
+                with zip_file.open(member_name) as source:
+                    if kind == MEMBER_SYMLINK:
+                        os.symlink(source.read().decode("utf-8", "surrogateescape"), member_path)
+                        continue
+                    with open(member_path, "xb") as target:
+                        shutil.copyfileobj(source, target, READ_CHUNK)
+                os.utime(member_path, (mtime, mtime))
+    else:
+        with open(volume_path, "rb") as volume_file:
+            for member_name, offset, length, kind, mtime in record.members:
+                member_path = _member_target_path(record, member_name, target_path)
+                reader = io.BufferedReader(_XzRangeReader(volume_file, offset, length), READ_CHUNK)
+                with tarfile.open(fileobj=reader, mode="r|") as tar_file:
+                    tar_info = tar_file.next()
+                    if kind == MEMBER_DIR:
+                        member_path.mkdir(exist_ok=True)
+                        dir_times.append((member_path, mtime))
+                    elif kind == MEMBER_SYMLINK:
+                        os.symlink(tar_info.linkname, member_path)
+                    else:
+                        with tar_file.extractfile(tar_info) as source, open(member_path, "xb") as target:
+                            shutil.copyfileobj(source, target, READ_CHUNK)
+                        os.chmod(member_path, tar_info.mode)
+                        os.utime(member_path, (mtime, mtime))
+    # Children change their folder's mtime, so folders get theirs back last, innermost first.
+    for dir_path, mtime in reversed(dir_times):
+        os.utime(dir_path, (mtime, mtime))
+
+
+def extract_volume_item_logic(volume_index, record, target_path):
+    # Unpacks one item next to target_path under a partial name, then renames it into place without replacing
+    # anything (FileExistsError if the name is taken). The volume itself is not changed.
+    target_path = Path(target_path)
+    partial_path = get_partial_copy_path_logic(target_path)
+    if os.path.lexists(partial_path):
+        if os.path.isdir(partial_path) and not os.path.islink(partial_path):
+            shutil.rmtree(partial_path)
+        else:
+            os.unlink(partial_path)
+    try:
+        _extract_members(record, volume_index.volumes_path / record.volume, partial_path)
+        move_no_replace_logic(partial_path, target_path)
+    except BaseException:
+        if os.path.isdir(partial_path) and not os.path.islink(partial_path):
+            shutil.rmtree(partial_path, ignore_errors=True)
+        elif os.path.lexists(partial_path):
+            os.unlink(partial_path)
+        raise
+    return target_path
+
+
+def forget_volume_items_logic(volume_index, records):
+    # Drops restored items from the index and deletes volumes that no longer hold a live item.
+    volume_index.forget([record.key for record in records])
+    for volume_name in {record.volume for record in records}:
+        if not volume_index.volume_in_use(volume_name):
+            try:
+                os.unlink(volume_index.volumes_path / volume_name)
+            except FileNotFoundError:
+                pass
+
+
+class _PackedItem:
+    def __init__(self, plan_item, key):
+        self.plan_item = plan_item
+        self.key = key
+        self.sources = []
+        self.members = []
+        self.volume = None
+        self.volume_mark = None
+        self.size = 0
+        self.error = None
+
+
+class VolumeArchiver:
+    # Packs archive plan items into rolling volumes on a background writer thread. Members are compressed on a pool
+    # and written in order; a batch of items is committed (volume fsync, index fsync) before its sources are deleted,
+    # moved into the journal and logged, so a crash never loses an item that is not yet safely in a volume.
+    def __init__(self, volumes_path, volume_index, run_id, log_callback, journal=None, metrics=None,
+                 volume_format=VOLUME_FORMAT_TAR_XZ, max_volume_bytes=DEFAULT_VOLUME_MAX_BYTES, threads=4):
+        if volume_format not in VOLUME_FORMATS:
+            raise ValueError(f"Неизвестный формат тома: {volume_format}")
+        self.volumes_path = Path(volumes_path)
+        self.volume_index = volume_index
+        self.run_id = run_id
+        self.log_callback = log_callback
+        self.journal = journal
+        self.metrics = metrics
+        self.volume_class = VOLUME_FORMATS[volume_format]
+        self.max_volume_bytes = max_volume_bytes
+        self.threads = max(1, threads)
+        self.archived_count = 0
+        self._window = 2 * self.threads
+        self._queue = queue.Queue(maxsize=ARCHIVER_QUEUE_SIZE)
+        self._thread = None
+        self._volume = None
+        self._volume_count = 0
+        self._uncommitted = []
+        self._uncommitted_bytes = 0
+
+    def submit(self, plan_item):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self._thread.start()
+        self._queue.put(plan_item)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _writer_loop(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            while True:
+                plan_item = self._queue.get()
+                if plan_item is None:
+                    break
+                item = _PackedItem(plan_item, f"{self.run_id}/{Path(relative_or_absolute_path(plan_item.source, self.volume_index.root_path)).as_posix()}")
+                try:
+                    item.sources = list(iter_volume_members_logic(plan_item.source, item.key))
+                except OSError as e:
+                    item.error = e
+                for member in item.sources if item.error is None else []:
+                    pending.append((item, member, pool.submit(self.volume_class.prepare, member)))
+                    while len(pending) > self._window:
+                        self._write_next(pending)
+                pending.append((item, None, None))
+                while len(pending) > self._window:
+                    self._write_next(pending)
+            while pending:
+                self._write_next(pending)
+        try:
+            self._finish_volume()
+        except Exception as e:
+            self._fail_items(self._uncommitted, e)
+
+    def _write_next(self, pending):
+        item, member, future = pending.popleft()
+        if member is None:
+            self._finish_item(item)
+            return
+        try:
+            prepared = future.result()
+        except Exception as e:
+            item.error = item.error or e
+            return
+        if item.error is not None:
+            if prepared is not None:
+                prepared.close()
+            return
+        try:
+            if self._volume is None:
+                self._open_volume()
+            if item.volume_mark is None:
+                item.volume_mark = self._volume.mark()
+            offset, length = self._volume.write(member, prepared)
+        except Exception as e:
+            item.error = e
+            return
+        item.volume = self._volume.path.name
+        item.size += member.size
+        item.members.append([member.name, offset, length, member.kind, member.mtime])
+
+    def _open_volume(self):
+        self.volumes_path.mkdir(parents=True, exist_ok=True)
+        while True:
+            self._volume_count += 1
+            volume_path = self.volumes_path / f"archive_{self.run_id}_{self._volume_count:03d}{self.volume_class.suffix}"
+            try:
+                self._volume = self.volume_class(volume_path)
+                return
+            except FileExistsError:
+                continue
+
+    def _finish_item(self, item):
+        if item.error is not None:
+            self._fail_items([item], item.error)
+            self._drop_partial_item(item)
+            return
+        self._uncommitted.append(item)
+        self._uncommitted_bytes += item.size
+        try:
+            if self._volume.size >= self.max_volume_bytes:
+                self._finish_volume()
+            elif self.volume_class.commits_mid_volume and (self._uncommitted_bytes >= COMMIT_EVERY_BYTES or
+                                                           len(self._uncommitted) >= COMMIT_EVERY_ITEMS):
+                self._volume.sync()
+                self._commit()
+        except Exception as e:
+            self._fail_items(self._uncommitted, e)
+            self._uncommitted, self._uncommitted_bytes = [], 0
+
+    def _drop_partial_item(self, item):
+        # Members written before the failure would stay in the volume without an index entry.
+        if item.volume_mark is None or self._volume is None:
+            return
+        try:
+            self._volume.truncate(item.volume_mark)
+        except Exception as e:
+            self._fail_items(self._uncommitted, e)
+            self._uncommitted, self._uncommitted_bytes = [], 0
+
+    def _finish_volume(self):
+        if self._volume is None:
+            return
+        volume, self._volume = self._volume, None
+        volume.close()
+        self._commit()
+
+    def _fail_items(self, items, error):
+        for item in items:
+            self.log_callback("ОШИБКА СЖАТИЯ", item.plan_item.source.name, reason=f"{error}")
+            if self.metrics is not None:
+                self.metrics.advance()
+
+    def _commit(self):
+        items, self._uncommitted, self._uncommitted_bytes = self._uncommitted, [], 0
+        if not items:
+            return
+        archived_at = round(time.time(), 3)
+        records = [VolumeRecord(item.key, item.volume, relative_or_absolute_path(item.plan_item.source, self.volume_index.root_path),
+                                item.plan_item.action, item.plan_item.reason, item.size, archived_at, item.members)
+                   for item in items]
+        self.volume_index.record_items(records)
+        for item, record in zip(items, records):
+            self._remove_source(item, record)
+
+    def _remove_source(self, item, record):
+        plan_item = item.plan_item
+        try:
+            current = list(iter_volume_members_logic(plan_item.source, item.key))
+        except OSError:
+            current = None
+        if current is None or [(m.name, m.kind, m.size, m.mtime) for m in current] != [(m.name, m.kind, m.size, m.mtime) for m in item.sources]:
+            # Changed while it was being packed: keep the original, drop the stale copy from the index.
+            forget_volume_items_logic(self.volume_index, [record])
+            self.log_callback("ПРЕДУПРЕЖДЕНИЕ", plan_item.source.name, reason="Изменился во время сжатия, оставлен на месте.")
+        else:
+            try:
+                if item.sources[0].kind == MEMBER_DIR:
+                    shutil.rmtree(plan_item.source)
+                else:
+                    os.unlink(plan_item.source)
+            except OSError as e:
+                self.log_callback("ОШИБКА УДАЛЕНИЯ", plan_item.source.name, reason=f"Сжато в {record.volume}, но исходный элемент не удалён: {e}")
+            else:
+                self.archived_count += 1
+                if self.journal is not None:
+                    self.journal.record_move(plan_item.source, self.volume_index.member_path(record), plan_item.action, plan_item.reason, plan_item.entry)
+                self.log_callback(plan_item.action, plan_item.source, self.volumes_path / record.volume, plan_item.reason)
+                if self.metrics is not None:
+                    self.metrics.count_move(item.size)
+        if self.metrics is not None:
+            self.metrics.advance()
@@ -0,0 +1,290 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from organizer_logic import (
+    get_organization_context_logic, prepare_organization_dirs_logic, classify_top_level_file_logic,
+    move_item_safely_logic, open_run_journal_logic, get_downloads_path_logic, ARCHIVE_MODE_FOLDERS,
+)
+from organizer_move import PARTIAL_COPY_SUFFIX
+from organizer_scanner import ENTRY_FILE, entry_from_stat, iter_scan_logic
+
+PARTIAL_DOWNLOAD_EXTENSIONS = (".crdownload", "._gstmp", ".part", PARTIAL_COPY_SUFFIX)
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL_SECONDS = 5.0
+WATCH_JOURNAL_WINDOW_SECONDS = 600.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+INOTIFY_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+RESCAN_ALL = object()
+
+
+class InotifyWatcher:
+    def __init__(self, dir_path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(str(dir_path)), INOTIFY_WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {dir_path}")
+
+    def poll(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, name_len = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                names.append(RESCAN_ALL)
+            elif name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, dir_path, interval=DEFAULT_POLL_INTERVAL_SECONDS):
+        self.dir_path = dir_path
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        try:
+            return {entry.name: (entry.size, entry.mtime) for entry in iter_scan_logic(self.dir_path)}
+        except FileNotFoundError:
+            return {}
+
+    def poll(self, timeout):
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        self._next_poll = time.monotonic() + self.interval
+
+        snapshot = self._take_snapshot()
+        changed_names = [name for name, state in snapshot.items() if self._snapshot.get(name) != state]
+        self._snapshot = snapshot
+        return changed_names
+
+    def close(self):
+        pass
+
+
+def create_watcher_logic(dir_path, poll_interval=DEFAULT_POLL_INTERVAL_SECONDS, force_polling=False):
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dir_path)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(dir_path, poll_interval)
+
+
+class DebouncedNames:
+    def __init__(self, debounce_seconds):
+        self.debounce_seconds = debounce_seconds
+        self._deadlines = {}
+
+    def touch(self, name, now):
+        self._deadlines[name] = now + self.debounce_seconds
+
+    def pop_ready(self, now):
+        ready = [name for name, deadline in self._deadlines.items() if deadline <= now]
+        for name in ready:
+            del self._deadlines[name]
+        return ready
+
+    def __len__(self):
+        return len(self._deadlines)
+
+
+def is_partial_download_logic(filename):
+    return filename.lower().endswith(PARTIAL_DOWNLOAD_EXTENSIONS)
+
+
+class CategorySizeIndex:
+    def __init__(self, context):
+        self._paths_by_size = {}
+        for cat_name in context["category_folder_names"]:
+            category_path = context["downloads"] / cat_name
+            try:
+                for entry in iter_scan_logic(category_path):
+                    if entry.kind == ENTRY_FILE:
+                        self.add(category_path / entry.name, entry)
+            except FileNotFoundError:
+                continue
+
+    def add(self, file_path, entry):
+        if entry.size > 0:
+            self._paths_by_size.setdefault(entry.size, {})[file_path] = entry
+
+    def candidates(self, size):
+        return list(self._paths_by_size.get(size, {}).items())
+
+    def entries(self):
+        return [entry for paths in self._paths_by_size.values() for entry in paths.values()]
+
+
+def find_new_file_duplicate_logic(item_path, entry, size_index, hash_cache, log_callback):
+    from organizer_dedup import find_content_duplicates_logic
+
+    same_size = [(file_path, candidate_entry) for file_path, candidate_entry in size_index.candidates(entry.size)
+                 if os.path.lexists(file_path)]
+    if not same_size:
+        return None
+    duplicates = find_content_duplicates_logic([(item_path, entry)] + same_size, hash_cache, log_callback,
+                                               preferred_originals=[file_path for file_path, _ in same_size])
+    return duplicates.get(item_path)
+
+
+def sniff_new_file_type_logic(item_path, entry, context, sniff_cache, log_callback):
+    from organizer_sniff import sniff_file_types_logic
+
+    junk_extension, keyword, category_name = context["rules"].classify(entry.name)
+    if junk_extension or keyword or category_name != context["rules"].default_category:
+        return {}
+    return sniff_file_types_logic([(item_path, entry)], sniff_cache, log_callback)
+
+
+def process_new_item_logic(name, context, size_index, hash_cache, journal, log_callback, sniff_cache=None):
+    if name in context["folders_to_skip"] or is_partial_download_logic(name):
+        return False
+
+    item_path = context["downloads"] / name
+    try:
+        entry = entry_from_stat(name, os.stat(item_path))
+    except FileNotFoundError:
+        return False
+    if entry.kind != ENTRY_FILE:
+        return False
+
+    context["cutoff_time_ts"] = time.time() - (context["days_older"] * 24 * 60 * 60)
+    context["content_duplicates"] = {}
+    if hash_cache is not None:
+        original_path = find_new_file_duplicate_logic(item_path, entry, size_index, hash_cache, log_callback)
+        if original_path is not None:
+            context["content_duplicates"] = {item_path: original_path}
+    context["sniffed_types"] = {}
+    if sniff_cache is not None:
+        context["sniffed_types"] = sniff_new_file_type_logic(item_path, entry, context, sniff_cache, log_callback)
+
+    plan_item = classify_top_level_file_logic(item_path, entry, context)
+    target_path = move_item_safely_logic(plan_item.source, plan_item.destination, log_callback, plan_item.action,
+                                         plan_item.reason, source_entry=entry, journal=journal, verify_copy=context["verify_copies"])
+    if target_path is not None and plan_item.destination.name in context["category_folder_names"]:
+        size_index.add(target_path, entry)
+    return target_path is not None
+
+
+def watch_downloads_logic(current_settings, log_callback, stop_event=None, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                          poll_interval=DEFAULT_POLL_INTERVAL_SECONDS, force_polling=False):
+    downloads_path = get_downloads_path_logic(current_settings)
+    if not downloads_path.is_dir():
+        log_callback("КРИТИЧЕСКАЯ ОШИБКА", downloads_path.name, reason="Папка Загрузок не найдена.")
+        return 0
+
+    stop_event = stop_event or threading.Event()
+    context = get_organization_context_logic(current_settings)
+    # Single files arriving one by one would each make a tiny volume; the watcher archives into folders.
+    context["archive_mode"] = ARCHIVE_MODE_FOLDERS
+    prepare_organization_dirs_logic(current_settings, log_callback)
+    size_index = CategorySizeIndex(context)
+    hash_cache = None
+    if context["content_dedup"]:
+        from organizer_dedup import HASH_CACHE_FILENAME, HashCache
+        hash_cache = HashCache(context["archive_base"] / HASH_CACHE_FILENAME).load()
+    sniff_cache = None
+    if context["content_sniffing"]:
+        from organizer_dedup import HashCache
+        from organizer_sniff import SNIFF_CACHE_FILENAME
+        sniff_cache = HashCache(context["archive_base"] / SNIFF_CACHE_FILENAME).load()
+
+    watcher = create_watcher_logic(downloads_path, poll_interval, force_polling)
+    pending = DebouncedNames(debounce_seconds)
+    log_callback("НАБЛЮДЕНИЕ", downloads_path.name,
+                 reason=f"режим: {'inotify' if isinstance(watcher, InotifyWatcher) else 'опрос'}")
+
+    processed_count = 0
+    journal = None
+    journal_deadline = 0.0
+    try:
+        while not stop_event.is_set():
+            now = time.monotonic()
+            for name in watcher.poll(timeout=min(0.5, debounce_seconds)):
+                if name is RESCAN_ALL:
+                    log_callback("НАБЛЮДЕНИЕ", downloads_path.name, reason="Очередь событий переполнена, полное сканирование.")
+                    for entry in iter_scan_logic(downloads_path):
+                        pending.touch(entry.name, now)
+                else:
+                    pending.touch(name, now)
+
+            if journal is not None and time.monotonic() >= journal_deadline:
+                journal.close()
+                journal = None
+
+            ready_names = [name for name in pending.pop_ready(time.monotonic())
+                           if name not in context["folders_to_skip"] and not is_partial_download_logic(name)]
+            if not ready_names:
+                continue
+
+            if journal is None:
+                # Batches within a window share one journal: one run to roll back, one index compaction.
+                journal = open_run_journal_logic(current_settings)
+                journal_deadline = time.monotonic() + WATCH_JOURNAL_WINDOW_SECONDS
+            for name in ready_names:
+                if process_new_item_logic(name, context, size_index, hash_cache, journal, log_callback, sniff_cache):
+                    processed_count += 1
+    finally:
+        watcher.close()
+        if journal is not None:
+            journal.close()
+        # Pruned like after an organize run: only files still at the top level or, for hashes, in the categories.
+        try:
+            top_level_entries = [entry for entry in iter_scan_logic(downloads_path) if entry.kind == ENTRY_FILE]
+        except OSError:
+            top_level_entries = None
+        if hash_cache is not None:
+            try:
+                if top_level_entries is not None:
+                    hash_cache.keep(top_level_entries + size_index.entries())
+                hash_cache.save(prune_unused=top_level_entries is not None)
+            except OSError:
+                pass
+        if sniff_cache is not None:
+            try:
+                if top_level_entries is not None:
+                    sniff_cache.keep(top_level_entries)
+                sniff_cache.save(prune_unused=top_level_entries is not None)
+            except OSError:
+                pass
+        log_callback("НАБЛЮДЕНИЕ", downloads_path.name, reason=f"остановлено, обработано элементов: {processed_count}")
+    return processed_count